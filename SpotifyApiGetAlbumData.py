@@ -1,9 +1,10 @@
-import requests
 import time
 import os
 import json
 import random
 from dotenv import load_dotenv
+from temporalGraph import LiveCollabGraph
+from crawlTelemetry import CrawlTelemetry
 
 # Load environment variables
 load_dotenv(override=True)
@@ -12,22 +13,27 @@ ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
 BASE_URL = "https://api.spotify.com/v1/"
 MIN_DELAY = 1  # Min request delay
 MAX_DELAY = 1.5  # Max request delay
+LIVE_SNAPSHOT_FILE = "data/live_graph_snapshot.json"  # Graph and metrics so far, refreshed during the crawl
+TELEMETRY = CrawlTelemetry("spotify", "data/crawl_metrics_spotify")  # Exported to .json and .prom during the crawl
 
-def respectful_request(url, headers):
-    """Handles rate limits and delays requests"""
+def respectful_request(url, headers, endpoint="other"):
+    """Handles rate limits and delays requests; endpoint names the request in the telemetry"""
     delay = random.uniform(MIN_DELAY, MAX_DELAY)
     time.sleep(delay)
+    TELEMETRY.record_sleep(delay)
     
-    response = requests.get(url, headers=headers)
+    response = TELEMETRY.get(endpoint, url, headers=headers)
     
     if response.status_code == 429:
         retry_after = int(response.headers.get('Retry-After', 30))
         if retry_after > 300:  # If bigger than 5 minutes, exit
             print(f"Rate limit is too long: {retry_after} seconds. Exit.")
+            TELEMETRY.export()
             exit()
-        print(f"Rate limited. Waiting {retry_after} seconds...")
+        print(f"Rate limited on {endpoint}. Waiting {retry_after} seconds...")
         time.sleep(retry_after + 1)
-        return respectful_request(url, headers)
+        TELEMETRY.record_retry(endpoint, retry_after + 1)
+        return respectful_request(url, headers, endpoint)
 
     if response.status_code != 200:
         print(f"Error {response.status_code}: {response.text}")
@@ -45,7 +51,7 @@ def search_artist_id(artist_name):
     }
     
     url = f"{BASE_URL}search?q={artist_name}&type=artist&limit=1"
-    response = respectful_request(url, headers)
+    response = respectful_request(url, headers, "search")
     
     if not response:
         print(f"Failed to find artist: {artist_name}")
@@ -74,7 +80,7 @@ def get_latest_album(artist_id):
     
     # Get up to 50 albums to ensure we have the latest
     url = f"{BASE_URL}artists/{artist_id}/albums?include_groups=album&limit=50"
-    response = respectful_request(url, headers)
+    response = respectful_request(url, headers, "artists/{id}/albums")
     
     if not response:
         print(f"Failed to get albums for artist ID: {artist_id}")
@@ -96,7 +102,7 @@ def get_latest_album(artist_id):
     
     # Get additional album details including label
     album_url = f"{BASE_URL}albums/{album_id}"
-    album_response = respectful_request(album_url, headers)
+    album_response = respectful_request(album_url, headers, "albums/{id}")
     
     if not album_response:
         print(f"Failed to get details for album ID: {album_id}")
@@ -117,7 +123,7 @@ def get_album_tracks(album_id, main_artist_id):
     }
     
     url = f"{BASE_URL}albums/{album_id}/tracks?limit=50"
-    response = respectful_request(url, headers)
+    response = respectful_request(url, headers, "albums/{id}/tracks")
     
     if not response:
         print(f"Failed to get tracks for album ID: {album_id}")
@@ -208,6 +214,11 @@ def main():
 
     # Create dictionary of existing artists for quick lookup
     existing_artists = {entry["artist"]: True for entry in existing_data}
+
+    # Live graph, updated with every new album so it can be inspected mid-crawl
+    live_graph = LiveCollabGraph("main_genre")
+    for entry in existing_data:
+        live_graph.add_album(entry)
     
     # Find artists that need to be processed
     artists_to_process = [artist for artist in input_artists if artist["name"] not in existing_artists]
@@ -222,23 +233,36 @@ def main():
         
         artist_data = build_artist_summary(artist_name, artist_genre)
         if artist_data:
-            # Include original listener count
+            # Include original listener count and Last.fm genre weights
             artist_data["listeners"] = artist_entry.get("listeners", "")
+            artist_data["genre_weights"] = artist_entry.get("genre_weights", {})
             
             # Add to existing data
             existing_data.append(artist_data)
+            live_graph.add_album(artist_data)
             
             # Save after each successful processing
             save_data(existing_data, output_file)
             print(f"Added {artist_name} to output file")
         else:
             print(f"Failed to process {artist_name}")
+        TELEMETRY.record_item(ok=bool(artist_data))
+        TELEMETRY.maybe_export()
         
         # Optional: Save progress to a different file periodically
         if (i + 1) % 10 == 0:
             save_data(existing_data, "data/latest_albums_details_backup.json")
             print(f"Backup saved after processing {i+1} artists")
 
+            live_graph.dump(LIVE_SNAPSHOT_FILE)
+            metrics = live_graph.metrics()
+            print(f"Live graph: {metrics['nodes']} nodes, {metrics['edges']} edges, "
+                  f"homophily {metrics['homophily_ratio']:.3f}, {metrics['components']} components")
+
+    live_graph.dump(LIVE_SNAPSHOT_FILE)
+    TELEMETRY.export()
+    print(TELEMETRY.summary_line())
+
     print(f"\nAll done! Processed {len(artists_to_process)} new artists.")
     print(f"Total artists in output: {len(existing_data)}")
 
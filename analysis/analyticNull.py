@@ -0,0 +1,221 @@
+"""
+Analytic Null Models - Closed-form expectations instead of simulation
+
+The attribute-shuffling null is an exact permutation model: node attribute
+values are permuted over a fixed graph, so the expectation and variance of
+any edge-count statistic follow from the attribute class sizes and from how
+many pairs of edges share a node. The degree-preserving null is approximated
+by the configuration model, whose expected mixing only depends on the sum of
+degrees in each attribute class.
+"""
+import numpy as np
+from swapEngine import assortativity_from_counts
+
+
+def _falling(x, k):
+    """Falling factorial x (x-1) ... (x-k+1), vectorised over x."""
+    x = np.asarray(x, dtype=float)
+    result = np.ones_like(x)
+    for i in range(k):
+        result = result * (x - i)
+    return result
+
+
+def _safe_ratio(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.zeros_like(np.asarray(numerator, dtype=float)),
+                     where=denominator != 0)
+
+
+def _edge_count_variance(num_edges, adjacent_pairs, disjoint_pairs, p_single, p_adjacent, p_disjoint):
+    """
+    Variance of a sum of edge indicators under a node-label permutation.
+
+    Ordered pairs of distinct edges either share one node (adjacent_pairs)
+    or none (disjoint_pairs); each case has its own joint probability.
+    """
+    variance = (num_edges * p_single * (1 - p_single)
+                + adjacent_pairs * (p_adjacent - p_single ** 2)
+                + disjoint_pairs * (p_disjoint - p_single ** 2))
+    return np.maximum(variance, 0.0)
+
+
+def shuffling_homophily(class_sizes, num_edges, adjacent_pairs):
+    """
+    Exact mean and standard deviation of the same-attribute edge ratio under
+    attribute shuffling, batched over any leading axes (e.g. one row per stratum).
+
+    Args:
+        class_sizes (numpy.ndarray): (..., num_values) number of nodes per attribute value
+        num_edges (numpy.ndarray): (...) number of edges
+        adjacent_pairs (numpy.ndarray): (...) ordered pairs of distinct edges sharing a
+            node, i.e. the sum of degree * (degree - 1)
+
+    Returns:
+        tuple: (expected homophily ratio, its standard deviation), each of shape (...)
+    """
+    sizes = np.asarray(class_sizes, dtype=float)
+    num_edges = np.asarray(num_edges, dtype=float)
+    adjacent_pairs = np.asarray(adjacent_pairs, dtype=float)
+    num_nodes = sizes.sum(axis=-1)
+    disjoint_pairs = num_edges * (num_edges - 1) - adjacent_pairs
+
+    sizes2 = _falling(sizes, 2)
+    p_single = _safe_ratio(sizes2.sum(axis=-1), _falling(num_nodes, 2))
+    p_adjacent = _safe_ratio(_falling(sizes, 3).sum(axis=-1), _falling(num_nodes, 3))
+    p_disjoint = _safe_ratio(_falling(sizes, 4).sum(axis=-1) + sizes2.sum(axis=-1) ** 2 - (sizes2 ** 2).sum(axis=-1),
+                             _falling(num_nodes, 4))
+    variance = _edge_count_variance(num_edges, adjacent_pairs, disjoint_pairs, p_single, p_adjacent, p_disjoint)
+    return p_single, _safe_ratio(np.sqrt(variance), num_edges)
+
+
+def configuration_homophily(class_degrees, num_edges):
+    """
+    Expected same-attribute edge ratio under the configuration model and its
+    binomial standard deviation, batched over any leading axes.
+
+    Args:
+        class_degrees (numpy.ndarray): (..., num_values) sum of degrees per attribute value
+        num_edges (numpy.ndarray): (...) number of edges
+
+    Returns:
+        tuple: (expected homophily ratio, its standard deviation), each of shape (...)
+    """
+    class_degrees = np.asarray(class_degrees, dtype=float)
+    num_edges = np.asarray(num_edges, dtype=float)
+    share = _safe_ratio(class_degrees, 2.0 * num_edges[..., None])
+    homophily = (share ** 2).sum(axis=-1)
+    return homophily, np.sqrt(_safe_ratio(homophily * (1 - homophily), num_edges))
+
+
+def mixing_counts(codes, src, dst, num_values):
+    """
+    Mixing counts of the observed graph, laid out like create_mixing_matrix.
+
+    Args:
+        codes (numpy.ndarray): Attribute code of each node
+        src (numpy.ndarray): Source node index of each edge
+        dst (numpy.ndarray): Target node index of each edge
+        num_values (int): Number of distinct attribute codes
+
+    Returns:
+        numpy.ndarray: (num_values, num_values) matrix of edge counts
+    """
+    a, b = codes[src], codes[dst]
+    directed = np.bincount(a * num_values + b, minlength=num_values ** 2).reshape(num_values, num_values)
+    counts = directed + directed.T
+    counts[np.diag_indices(num_values)] //= 2
+    return counts
+
+
+def shuffling_expectations(codes, src, dst, num_values):
+    """
+    Exact moments of the attribute-shuffling null model.
+
+    Args:
+        codes (numpy.ndarray): Attribute code of each node
+        src (numpy.ndarray): Source node index of each edge
+        dst (numpy.ndarray): Target node index of each edge
+        num_values (int): Number of distinct attribute codes
+
+    Returns:
+        dict: 'homophily' and 'homophily_sd' (ratio of same-attribute edges),
+              'mixing' and 'mixing_sd' (num_values x num_values arrays laid out
+              like create_mixing_matrix) and 'assortativity' (first-order
+              approximation of the expected coefficient)
+    """
+    num_nodes = len(codes)
+    num_edges = len(src)
+    sizes = np.bincount(codes, minlength=num_values).astype(float)
+    degrees = (np.bincount(src, minlength=num_nodes) + np.bincount(dst, minlength=num_nodes)).astype(float)
+
+    adjacent_pairs = float(np.sum(degrees * (degrees - 1)))
+    disjoint_pairs = float(num_edges * (num_edges - 1)) - adjacent_pairs
+
+    n2, n3, n4 = _falling(num_nodes, 2), _falling(num_nodes, 3), _falling(num_nodes, 4)
+    sizes2, sizes3, sizes4 = _falling(sizes, 2), _falling(sizes, 3), _falling(sizes, 4)
+
+    homophily, homophily_sd = shuffling_homophily(sizes, num_edges, adjacent_pairs)
+
+    # Mixing counts: diagonal entries count same-value edges, off-diagonal
+    # entries count edges joining the two values in either orientation
+    a, b = np.meshgrid(np.arange(num_values), np.arange(num_values), indexing='ij')
+    diagonal = a == b
+    pair_single = np.where(diagonal, sizes2[a], 2 * sizes[a] * sizes[b])
+    pair_adjacent = np.where(diagonal, sizes3[a], sizes[a] * sizes2[b] + sizes[b] * sizes2[a])
+    pair_disjoint = np.where(diagonal, sizes4[a], 4 * sizes2[a] * sizes2[b])
+    p_pair = _safe_ratio(pair_single, n2)
+    mixing_variance = _edge_count_variance(
+        num_edges, adjacent_pairs, disjoint_pairs,
+        p_pair, _safe_ratio(pair_adjacent, n3), _safe_ratio(pair_disjoint, n4))
+
+    # Expected squared degree share per value, used for the assortativity approximation
+    total_degree = degrees.sum()
+    sum_sq_degrees = (degrees ** 2).sum()
+    expected_class_sq = (_safe_ratio(sizes, float(num_nodes)) * sum_sq_degrees
+                         + _safe_ratio(sizes2, n2) * (total_degree ** 2 - sum_sq_degrees))
+    expected_share = _safe_ratio(expected_class_sq.sum(), total_degree ** 2) if total_degree else 0.0
+
+    homophily = float(homophily)
+    return {
+        'homophily': homophily,
+        'homophily_sd': float(homophily_sd),
+        'mixing': num_edges * p_pair,
+        'mixing_sd': np.sqrt(mixing_variance),
+        'assortativity': float(_safe_ratio(homophily - expected_share, 1.0 - expected_share)),
+    }
+
+
+def configuration_expectations(codes, src, dst, num_values):
+    """
+    Expected mixing under the configuration model (degree-aware null).
+
+    Edge stubs are paired uniformly at random, so an edge joins values a and b
+    with probability proportional to the product of their degree sums. The
+    standard deviations treat the edges as independent draws (binomial
+    approximation), which is accurate when no class holds most of the stubs.
+
+    Args:
+        codes (numpy.ndarray): Attribute code of each node
+        src (numpy.ndarray): Source node index of each edge
+        dst (numpy.ndarray): Target node index of each edge
+        num_values (int): Number of distinct attribute codes
+
+    Returns:
+        dict: 'homophily' and 'homophily_sd', 'mixing' and 'mixing_sd'
+              (num_values x num_values arrays laid out like create_mixing_matrix)
+              and 'assortativity' (coefficient of the expected mixing counts,
+              a first-order approximation of the expected coefficient)
+    """
+    num_edges = len(src)
+    if num_edges == 0:
+        zeros = np.zeros((num_values, num_values))
+        return {'homophily': 0.0, 'homophily_sd': 0.0, 'mixing': zeros, 'mixing_sd': zeros,
+                'assortativity': float('nan')}
+
+    class_degrees = (np.bincount(codes[src], minlength=num_values)
+                     + np.bincount(codes[dst], minlength=num_values)).astype(float)
+    share = class_degrees / (2.0 * num_edges)
+
+    # Probability that an edge falls in each mixing cell: a^2 on the diagonal,
+    # 2ab off it (either orientation)
+    p_pair = 2 * np.outer(share, share)
+    p_pair[np.diag_indices(num_values)] = share ** 2
+    homophily, homophily_sd = configuration_homophily(class_degrees, num_edges)
+    mixing = num_edges * p_pair
+
+    return {
+        'homophily': float(homophily),
+        'homophily_sd': float(homophily_sd),
+        'mixing': mixing,
+        'mixing_sd': np.sqrt(num_edges * p_pair * (1 - p_pair)),
+        # The degree sums per value are fixed by the model
+        'assortativity': assortativity_from_counts(np.trace(mixing), num_edges, class_degrees),
+    }
+
+
+def z_score(observed, expected, sd):
+    """Standardised distance of an observation from the null expectation (NaN if sd is 0)."""
+    observed = np.asarray(observed, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = (observed - expected) / sd
+    return float(result) if np.ndim(result) == 0 else result
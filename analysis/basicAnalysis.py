@@ -4,12 +4,20 @@ Writes all stats to a single file and plots selected figures.
 """
 
 import networkx as nx
-import matplotlib.pyplot as plt
 import numpy as np
 from collections import Counter
 import os
+from resultCache import cached_analysis, output_file
+from resultSink import ResultSink
+from profiler import profiled
+from lazyImport import lazy_import
 
-def analyze_network(G, attribute=None, output_dir="analysis_results"):
+# Loaded on first use (see lazyImport)
+plt = lazy_import("matplotlib.pyplot")
+
+@profiled(category="analysis")
+@cached_analysis(default_log="network_analysis.txt", overwrites_log=True)
+def analyze_network(G, attribute=None, output_dir="analysis_results", log_path=None):
     """
     Perform basic and summary analysis on a network graph.
 
@@ -17,6 +25,8 @@ def analyze_network(G, attribute=None, output_dir="analysis_results"):
         G (networkx.Graph): The graph to analyze.
         attribute (str, optional): Node attribute to analyze (e.g., 'club').
         output_dir (str): Directory to store analysis results.
+        log_path (str, optional): Report file, overwritten (defaults to
+            network_analysis.txt in output_dir).
 
     Returns:
         dict: Summary statistics.
@@ -24,10 +34,10 @@ def analyze_network(G, attribute=None, output_dir="analysis_results"):
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    output_path = os.path.join(output_dir, "network_analysis.txt")
+    output_path = log_path or os.path.join(output_dir, "network_analysis.txt")
     results = {}
 
-    with open(output_path, "w") as f:
+    with ResultSink(output_path, mode="w") as f:
         f.write("NETWORK ANALYSIS REPORT\n")
         f.write("=" * 60 + "\n\n")
 
@@ -80,7 +90,7 @@ def analyze_network(G, attribute=None, output_dir="analysis_results"):
         plt.xlabel("Degree")
         plt.ylabel("Count")
         plt.grid(True, alpha=0.3)
-        plt.savefig(os.path.join(output_dir, "degree_distribution.png"), dpi=300, bbox_inches='tight')
+        plt.savefig(output_file(os.path.join(output_dir, "degree_distribution.png")), dpi=300, bbox_inches='tight')
         plt.close()
 
         # Component analysis
@@ -148,7 +158,7 @@ def analyze_network(G, attribute=None, output_dir="analysis_results"):
             plt.ylabel("Count")
             plt.xticks(rotation=45, ha='right')
             plt.tight_layout()
-            plt.savefig(os.path.join(output_dir, f"{attribute}_distribution.png"), dpi=300, bbox_inches='tight')
+            plt.savefig(output_file(os.path.join(output_dir, f"{attribute}_distribution.png")), dpi=300, bbox_inches='tight')
             plt.close()
 
     return results
@@ -0,0 +1,201 @@
+"""
+Batch Runner - Analyse every dataset folder in one invocation
+
+Discovers the genre and label graphs under the given dataset roots, runs
+run_analysis for every (dataset, attribute) pair in a process pool and
+writes one cross-dataset summary table. collect_batch rebuilds the table
+from the results.json files of earlier runs without analysing anything.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import math
+import os
+import sys
+from runner import run_analysis, _output_subfolder
+from resultSink import load_results
+from profiler import span
+from lazyImport import lazy_import
+
+# Loaded on first use (see lazyImport)
+pd = lazy_import("pandas")
+
+# Graph files written by genreGraph.py / labelsGraph.py, relative to a dataset folder
+GRAPH_FILES = {
+    "main_genre": os.path.join("graph_genre", "genre_graph.graphml"),
+    "major_label": os.path.join("graph_labels", "label_graph.graphml"),
+}
+
+
+def discover_graphs(roots, attributes=tuple(GRAPH_FILES)):
+    """
+    Find the analysable graphs under the given folders.
+
+    A root is either a dataset folder itself (it contains graph_genre/ or
+    graph_labels/) or a folder whose direct subfolders are datasets.
+
+    Args:
+        roots (list): Folders to search
+        attributes (tuple): Attributes to look for
+
+    Returns:
+        list: (dataset folder, attribute, graph path) tuples
+    """
+    tasks = []
+    for root in roots:
+        candidates = [root] + sorted(os.path.join(root, name) for name in os.listdir(root)
+                                     if os.path.isdir(os.path.join(root, name)))
+        for dataset_dir in candidates:
+            for attribute in attributes:
+                graph_path = os.path.join(dataset_dir, GRAPH_FILES[attribute])
+                if os.path.isfile(graph_path) and (dataset_dir, attribute, graph_path) not in tasks:
+                    tasks.append((dataset_dir, attribute, graph_path))
+    return tasks
+
+
+def graph_cost(graph_path):
+    """
+    Cheap estimate of the analysis cost of a graph: its number of edges,
+    counted in the GraphML text without building the graph.
+    """
+    with open(graph_path, "rb") as f:
+        return f.read().count(b"<edge ")
+
+
+def _run_task(task):
+    dataset_dir, attribute, graph_path = task
+    with span("dataset", "batch", graph=graph_path, attribute=attribute):
+        results = run_analysis(graph_path, attribute, output_root=os.path.join(dataset_dir, "analysis_results"))
+    return summarize(os.path.basename(os.path.normpath(dataset_dir)), attribute, results)
+
+
+def summarize(dataset, attribute, results):
+    """
+    One summary row from the results of run_analysis.
+
+    Args:
+        dataset (str): Dataset name
+        attribute (str): Analysed attribute
+        results (dict): Return value of run_analysis (None if it failed)
+
+    Returns:
+        dict: Headline metrics of the run
+    """
+    if not results:
+        return {'dataset': dataset, 'attribute': attribute, 'status': 'failed'}
+    basic, homophily = results['basic'], results['homophily']
+    null_model, community = results['null_model'], results['community'] or {}
+    row = {
+        'dataset': dataset,
+        'attribute': attribute,
+        'status': 'ok',
+        'nodes': basic['num_nodes'],
+        'edges': basic['num_edges'],
+        'density': basic['density'],
+        'avg_clustering': basic['avg_clustering'],
+        'homophily_ratio': homophily['homophily_ratio'],
+        'assortativity': homophily['assortativity'],
+        'config_homophily': null_model['config_homophily'],
+        'config_z_score': null_model['config_z_score'],
+        'attr_shuffled_homophily': null_model['attribute_shuffled_homophily'],
+        'attr_z_score': null_model['attr_z_score'],
+        'rewired_p_value': null_model['rewired_p_value'],
+        'attr_p_value': null_model['attr_p_value'],
+        'louvain_modularity': community.get('louvain_modularity'),
+        'attr_modularity': community.get('attr_modularity'),
+        'nmi': community.get('nmi'),
+        'ari': community.get('ari'),
+        'purity': community.get('purity'),
+        'output_dir': results['output_dir'],
+    }
+    if results.get('soft_homophily'):
+        row['soft_homophily'] = results['soft_homophily']['soft_homophily']
+    return row
+
+
+def run_batch(roots, attributes=tuple(GRAPH_FILES), workers=None, summary_path="analysis_results/batch_summary.csv"):
+    """
+    Analyse every discovered (dataset, attribute) pair in a process pool.
+
+    Tasks are submitted largest graph first. The pool is sized from the
+    estimated costs: with more workers than total / largest cost the largest
+    graph alone bounds the wall time, so extra processes would only add memory.
+
+    Args:
+        roots (list): Folders to search (see discover_graphs)
+        attributes (tuple): Attributes to analyse
+        workers (int, optional): Worker processes; derived from the costs and
+            the CPU count by default
+        summary_path (str): CSV file for the consolidated summary
+
+    Returns:
+        pandas.DataFrame: One row per (dataset, attribute), in discovery order
+    """
+    tasks = discover_graphs(roots, attributes)
+    if not tasks:
+        print(f"No graphs found under {', '.join(roots)}")
+        return pd.DataFrame()
+
+    costs = {task: max(graph_cost(task[2]), 1) for task in tasks}
+    if workers is None:
+        balanced = math.ceil(sum(costs.values()) / max(costs.values()))
+        workers = max(1, min(os.cpu_count() or 1, len(tasks), balanced))
+    print(f"Analysing {len(tasks)} graphs with {workers} worker processes")
+
+    rows = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_run_task, task): task for task in sorted(tasks, key=costs.get, reverse=True)}
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                rows[task] = future.result()
+            except Exception as e:
+                print(f"Analysis of {task[2]} failed: {e}")
+                rows[task] = {'dataset': os.path.basename(os.path.normpath(task[0])), 'attribute': task[1],
+                              'status': f'error: {e}'}
+
+    return _write_summary([rows[task] for task in tasks], summary_path)
+
+
+def collect_batch(roots, attributes=tuple(GRAPH_FILES), summary_path="analysis_results/batch_summary.csv"):
+    """
+    Build the batch summary from saved results instead of re-running the analysis.
+
+    Args:
+        roots (list): Folders to search (see discover_graphs)
+        attributes (tuple): Attributes to collect
+        summary_path (str): CSV file for the consolidated summary
+
+    Returns:
+        pandas.DataFrame: One row per (dataset, attribute); status 'missing'
+        where no results.json was found
+    """
+    rows = []
+    for dataset_dir, attribute, _ in discover_graphs(roots, attributes):
+        dataset = os.path.basename(os.path.normpath(dataset_dir))
+        output_dir = os.path.join(dataset_dir, "analysis_results", _output_subfolder(attribute))
+        results = load_results(output_dir)
+        if results is None:
+            rows.append({'dataset': dataset, 'attribute': attribute, 'status': 'missing'})
+        else:
+            rows.append(summarize(dataset, attribute, results))
+    return _write_summary(rows, summary_path)
+
+
+def _write_summary(rows, summary_path):
+    summary = pd.DataFrame(rows)
+    if os.path.dirname(summary_path):
+        os.makedirs(os.path.dirname(summary_path), exist_ok=True)
+    summary.to_csv(summary_path, index=False)
+    print(f"\nBatch summary saved to: {summary_path}")
+    print(summary[['dataset', 'attribute', 'status']].to_string(index=False))
+    return summary
+
+
+if __name__ == "__main__":
+    # Defaults to every dataset folder next to the analysis package;
+    # --collect only gathers the results of earlier runs
+    if sys.argv[1:2] in (["-h"], ["--help"]):
+        print("Usage: python batchRunner.py [--collect] [root ...]")
+    elif sys.argv[1:2] == ["--collect"]:
+        collect_batch(sys.argv[2:] or [".."])
+    else:
+        run_batch(sys.argv[1:] or [".."])
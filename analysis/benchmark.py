@@ -0,0 +1,291 @@
+"""
+Benchmark - Time and memory of every analysis function across graph sizes
+
+Generates synthetic graphs (see synthetic.py) of increasing size and runs
+each analysis function on them in a fresh child process, recording wall
+time, CPU time, peak RSS and the RSS added by the function. Functions that
+exceed the time limit are stopped and reported as 'timeout', and are not
+run on the larger sizes. Results go to benchmark_results.csv and .json so
+runs on different machines or commits can be compared. --startup instead
+times how long the command-line scripts take to start.
+
+    python benchmark.py [size ...] [--limit SECONDS] [--output DIR]
+    python benchmark.py --startup
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# Stored results would make every run after the first a cache lookup
+os.environ["ANALYSIS_CACHE"] = "off"
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+import pandas as pd
+from synthetic import synthetic_graph, write_synthetic
+from basicAnalysis import analyze_network
+from homophily import homophily_analysis
+from nullModel import null_model_analysis
+from communityDetenction import community_detection
+from centrality import centrality_analysis
+from softHomophily import soft_homophily_analysis
+from stratifiedAnalysis import stratified_analysis
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# Invocations that should start quickly: the heavy dependencies are only
+# imported by the code paths that use them (see lazyImport)
+STARTUP_COMMANDS = (
+    ["runner.py", "--help"],
+    ["batchRunner.py", "--help"],
+    [os.path.join("..", "pipeline.py"), "--help"],
+)
+
+# Start-up budget of the commands that do not need the heavy dependencies,
+# and the modules they must not import (see check_startup)
+STARTUP_LIMIT_S = 1.0
+HEAVY_MODULES = ("matplotlib", "scipy.stats", "community")
+
+# Run in a fresh interpreter by check_startup: executes one invocation and
+# reports its wall time and the heavy modules it imported
+_STARTUP_PROBE = """
+import json, runpy, sys, time
+start = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'elapsed_s': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+# name -> function(G, output_dir)
+BENCHMARKS = {
+    'analyze_network': lambda G, out: analyze_network(G, attribute='main_genre', output_dir=out,
+                                                      log_path=os.path.join(out, "log.txt")),
+    'homophily_analysis': lambda G, out: homophily_analysis(G, 'main_genre', output_dir=out),
+    'null_model_analysis': lambda G, out: null_model_analysis(G, 'main_genre', output_dir=out, seed=0),
+    'null_model_analysis (empirical)': lambda G, out: null_model_analysis(G, 'main_genre', num_iterations=20,
+                                                                          rewiring_iterations=2, output_dir=out,
+                                                                          empirical=True, seed=0),
+    'community_detection': lambda G, out: community_detection(G, 'main_genre', output_dir=out, seed=0),
+    'community_detection (native)': lambda G, out: community_detection(G, 'main_genre', output_dir=out, seed=0,
+                                                                       backend="native"),
+    'centrality_analysis': lambda G, out: centrality_analysis(G, 'main_genre', output_dir=out, seed=0),
+    'soft_homophily_analysis': lambda G, out: soft_homophily_analysis(G, num_permutations=200, seed=0,
+                                                                      output_dir=out),
+    'stratified_analysis': lambda G, out: stratified_analysis(G, output_dir=out),
+}
+
+
+def _rss_mb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _measure(name, G, connection):
+    """Child process: run one benchmark and send back its measurements."""
+    baseline = _rss_mb()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        with tempfile.TemporaryDirectory() as output_dir:
+            BENCHMARKS[name](G, output_dir)
+        status = "ok"
+    except Exception as e:
+        status = f"error: {e}"
+    peak = _rss_mb()
+    connection.send({
+        'status': status,
+        'wall_s': time.perf_counter() - start_wall,
+        'cpu_s': time.process_time() - start_cpu,
+        'peak_rss_mb': peak,
+        'added_rss_mb': None if peak is None else peak - baseline,
+    })
+
+
+def run_benchmark(name, G, time_limit):
+    """
+    Run one benchmark on G in a child process.
+
+    The graph is inherited by forking where possible; the child's peak RSS
+    therefore includes the graph, and added_rss_mb is what the function
+    itself allocated on top of it.
+
+    Returns:
+        dict: status ('ok', 'timeout' or 'error: ...'), wall_s, cpu_s,
+        peak_rss_mb and added_rss_mb
+    """
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_measure, args=(name, G, sender))
+    process.start()
+    if receiver.poll(time_limit):
+        result = receiver.recv()
+        process.join()
+        return result
+    process.terminate()
+    process.join()
+    return {'status': 'timeout', 'wall_s': time_limit, 'cpu_s': None, 'peak_rss_mb': None, 'added_rss_mb': None}
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, benchmarks=tuple(BENCHMARKS), time_limit=600, seed=0,
+                   output_dir="benchmark"):
+    """
+    Benchmark the analysis functions on synthetic graphs of the given sizes.
+
+    Args:
+        sizes (tuple): Numbers of nodes, smallest first
+        benchmarks (tuple): Names from BENCHMARKS to run
+        time_limit (float): Seconds after which a run is stopped
+        seed (int): Seed of the synthetic graphs
+        output_dir (str): Folder for benchmark_results.csv / .json
+
+    Returns:
+        pandas.DataFrame: One row per (function, size)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rows = []
+    timed_out = set()
+    for size in sorted(sizes):
+        start = time.perf_counter()
+        G = synthetic_graph(size, genre_weights=True, seed=seed)
+        print(f"\n{size} nodes, {G.number_of_edges()} edges (generated in {time.perf_counter() - start:.1f}s)")
+        for name in benchmarks:
+            if name in timed_out:
+                result = {'status': 'skipped'}
+            else:
+                result = run_benchmark(name, G, time_limit)
+                if result['status'] == 'timeout':
+                    timed_out.add(name)
+            rows.append({'function': name, 'nodes': size, 'edges': G.number_of_edges(), **result})
+            wall = f"{result['wall_s']:.2f}s" if result.get('wall_s') is not None else ""
+            print(f"  {name:35} {result['status']:10} {wall}")
+
+    results = pd.DataFrame(rows, columns=['function', 'nodes', 'edges', 'status', 'wall_s', 'cpu_s',
+                                          'peak_rss_mb', 'added_rss_mb'])
+    results.to_csv(os.path.join(output_dir, "benchmark_results.csv"), index=False)
+    with open(os.path.join(output_dir, "benchmark_results.json"), "w") as f:
+        json.dump({
+            'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpus': os.cpu_count()},
+            'time_limit_s': time_limit,
+            'seed': seed,
+            'results': json.loads(results.to_json(orient="records")),
+        }, f, indent=2)
+    print(f"\nBenchmark results saved to {output_dir}")
+    return results
+
+
+def measure_startup(commands=STARTUP_COMMANDS, repeats=5):
+    """
+    Wall time of each command-line invocation in a fresh interpreter.
+
+    Args:
+        commands (tuple): Argument lists, run with this Python from this folder
+        repeats (int): Runs per command; the fastest one is reported
+
+    Returns:
+        pandas.DataFrame: command, best_s and median_s
+    """
+    folder = os.path.dirname(os.path.abspath(__file__))
+    rows = []
+    for command in commands:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            subprocess.run([sys.executable] + command, cwd=folder, capture_output=True)
+            times.append(time.perf_counter() - start)
+        times.sort()
+        rows.append({'command': " ".join(command), 'best_s': times[0], 'median_s': times[len(times) // 2]})
+        print(f"  {' '.join(command):60} {times[0]:.3f}s")
+    return pd.DataFrame(rows)
+
+
+def _probe(body, env=None):
+    folder = os.path.dirname(os.path.abspath(__file__))
+    code = _STARTUP_PROBE.format(body=body, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", code], cwd=folder, capture_output=True, text=True,
+                               env=dict(os.environ, **(env or {})))
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        return {'wall_s': wall, 'heavy': [], 'error': completed.stderr.strip().splitlines()[-1:]}
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    return {'wall_s': wall, 'heavy': report['heavy'], 'error': None}
+
+
+def check_startup(limit=STARTUP_LIMIT_S, repeat=3):
+    """
+    Check that the light invocations start quickly without the heavy modules.
+
+    Runs `runner.py --help` and a seeded run served from the result cache
+    (a small synthetic graph, analysed once beforehand to fill a temporary
+    cache) in fresh interpreters. Each must finish within limit
+    seconds (the best of repeat runs), interpreter start included, without
+    importing HEAVY_MODULES.
+
+    Returns:
+        list: Failure messages, empty when both checks pass
+    """
+    failures = []
+    with tempfile.TemporaryDirectory() as folder:
+        graph_path = os.path.join(folder, "graph.graphml")
+        env = {'ANALYSIS_CACHE': 'on', 'ANALYSIS_CACHE_DIR': os.path.join(folder, "cache"), 'MPLBACKEND': 'Agg'}
+        run = (f"from runner import run_analysis\n"
+               f"run_analysis({graph_path!r}, 'major_label', output_root={os.path.join(folder, 'results')!r}, seed=0)")
+        checks = (
+            ("runner.py --help", "sys.argv = ['runner.py', '--help']\nrunpy.run_path('runner.py', run_name='__main__')"),
+            ("cached run_analysis", run),
+        )
+
+        write_synthetic(graph_path, 1000, seed=0)
+        # Fills the cache; the timed run below is served from it
+        warm = _probe(run, env)
+        if warm['error']:
+            return [f"cached run_analysis: warm-up failed: {warm['error']}"]
+
+        for name, body in checks:
+            # Best of a few runs, so a busy machine does not fail the check
+            result = min((_probe(body, env) for _ in range(repeat)), key=lambda probe: probe['wall_s'])
+            status = "ok"
+            if result['error']:
+                status = f"error: {result['error']}"
+            elif result['wall_s'] > limit:
+                status = f"too slow ({result['wall_s']:.2f}s > {limit:.2f}s)"
+            elif result['heavy']:
+                status = f"imported {', '.join(result['heavy'])}"
+            print(f"  {name:30} {result['wall_s']:.3f}s  {status}")
+            if status != "ok":
+                failures.append(f"{name}: {status}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the analysis functions on synthetic graphs.")
+    parser.add_argument("sizes", nargs="*", type=int, default=list(DEFAULT_SIZES), help="numbers of nodes")
+    parser.add_argument("--limit", type=float, default=600, help="time limit per run in seconds")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help="functions to benchmark")
+    parser.add_argument("--output", default="benchmark", help="output folder")
+    parser.add_argument("--startup", action="store_true",
+                        help=f"only time the start-up of the scripts; exits with 1 if --help or a cached run "
+                             f"takes over {STARTUP_LIMIT_S}s or imports {', '.join(HEAVY_MODULES)}")
+    args = parser.parse_args()
+
+    if args.startup:
+        os.makedirs(args.output, exist_ok=True)
+        measure_startup().to_csv(os.path.join(args.output, "startup_times.csv"), index=False)
+        failures = check_startup()
+        if failures:
+            print("\nStart-up check failed:\n  " + "\n  ".join(failures))
+            sys.exit(1)
+    else:
+        run_benchmarks(args.sizes, args.only, time_limit=args.limit, output_dir=args.output)
@@ -0,0 +1,256 @@
+"""
+Bootstrap - Batched resampling of per-unit statistics
+
+Every replicate resamples the units (nodes, edges, BFS sources...) with
+replacement within their strata. Instead of materialising the resampled
+units, a batch of replicates is drawn as a (replicates, units) matrix of
+multiplicities, and one matrix product turns the per-unit values into the
+resampled per-stratum sums. Any estimator that is a function of such sums
+(ratios, weighted means, mixing counts) is then evaluated for the whole
+batch with array operations.
+
+The mixing matrix, from which homophily, E-I and assortativity follow, is
+bootstrapped directly: edge resamples are one multinomial draw over its
+cells, node resamples weight every edge by its endpoints' multiplicities.
+"""
+import warnings
+import numpy as np
+from swapEngine import assortativity_from_counts
+
+
+def stratified_bootstrap_sums(strata, values, num_replicates, batch_size=100, seed=None):
+    """
+    Per-stratum column sums of values for bootstrap resamples of the units.
+
+    Args:
+        strata (numpy.ndarray): Stratum code of each unit (0..K-1)
+        values (numpy.ndarray): (units, columns) values to sum
+        num_replicates (int): Number of bootstrap replicates
+        batch_size (int): Replicates drawn per batch (memory is batch x units)
+        seed (int or numpy.random.Generator, optional): Seed for the resampling
+
+    Returns:
+        numpy.ndarray: (replicates, K, columns) resampled sums; each stratum
+        keeps its number of units in every replicate
+    """
+    rng = np.random.default_rng(seed)
+    values = np.asarray(values, dtype=float).reshape(len(strata), -1)
+    num_strata = int(strata.max()) + 1 if len(strata) else 0
+    sums = np.zeros((num_replicates, num_strata, values.shape[1]))
+    members = [np.flatnonzero(strata == k) for k in range(num_strata)]
+    for start in range(0, num_replicates, batch_size):
+        size = min(batch_size, num_replicates - start)
+        for k, units in enumerate(members):
+            if len(units) == 0:
+                continue
+            counts = rng.multinomial(len(units), np.full(len(units), 1 / len(units)), size=size)
+            sums[start:start + size, k] = counts @ values[units]
+    return sums
+
+
+def stratum_sums(strata, values):
+    """Per-stratum column sums of values, shaped like one bootstrap replicate: (K, columns)."""
+    values = np.asarray(values, dtype=float).reshape(len(strata), -1)
+    num_strata = int(strata.max()) + 1 if len(strata) else 0
+    sums = np.zeros((num_strata, values.shape[1]))
+    np.add.at(sums, strata, values)
+    return sums
+
+
+def interval(estimate, replicates, confidence=0.95, shrink=1.0):
+    """
+    Standard error and percentile interval of a statistic.
+
+    Args:
+        estimate (numpy.ndarray or float): Point estimate
+        replicates (numpy.ndarray): Bootstrap replicates along axis 0
+        confidence (float): Coverage of the interval
+        shrink (float): Factor applied to the spread around the estimate,
+            e.g. the finite-population correction sqrt(1 - sampling fraction)
+
+    Returns:
+        tuple: (standard error, lower bound, upper bound)
+    """
+    alpha = (1 - confidence) / 2
+    # Statistics undefined in some replicates (e.g. an empty group) are NaN there
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        se = np.nanstd(replicates, axis=0, ddof=1) * shrink
+        low, high = np.nanquantile(replicates, [alpha, 1 - alpha], axis=0)
+    return se, estimate + shrink * (low - estimate), estimate + shrink * (high - estimate)
+
+
+def mixing_layout(directed, num_values):
+    """
+    Fold directed cell counts (..., K*K) into the create_mixing_matrix layout (..., K, K).
+
+    Each edge (a, b) is counted once in cell a*K+b of directed; the result
+    holds it in both off-diagonal cells and internal edges once on the diagonal.
+    """
+    directed = directed.reshape(directed.shape[:-1] + (num_values, num_values))
+    mixing = directed + np.swapaxes(directed, -1, -2)
+    diagonal = np.arange(num_values)
+    mixing[..., diagonal, diagonal] //= 2
+    return mixing
+
+
+def mixing_statistics(mixing):
+    """
+    Homophily ratio, E-I indices and assortativity from mixing matrices.
+
+    Args:
+        mixing (numpy.ndarray): (..., K, K) edge counts laid out like
+            create_mixing_matrix, optionally batched along leading axes
+
+    Returns:
+        dict: 'homophily_ratio', 'assortativity' and 'ei_indices' (last axis
+              per attribute value); E-I is 0 for values without edges, as in
+              calculate_ei_indices
+    """
+    mixing = np.asarray(mixing, dtype=float)
+    internal = np.diagonal(mixing, axis1=-2, axis2=-1)
+    row_sums = mixing.sum(axis=-1)
+    external = row_sums - internal
+    same = internal.sum(axis=-1)
+    num_edges = same + external.sum(axis=-1) / 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            'homophily_ratio': np.where(num_edges > 0, same / num_edges, 0.0),
+            'assortativity': assortativity_from_counts(same, num_edges, internal + row_sums),
+            'ei_indices': np.where(internal + external > 0, (external - internal) / (internal + external), 0.0),
+        }
+
+
+def edge_bootstrap_mixing(codes, src, dst, num_values, num_replicates, seed=None):
+    """
+    Mixing matrices of edge resamples.
+
+    Resampling the edges with replacement only changes how many fall in each
+    cell of the mixing matrix, so a replicate is one multinomial draw over
+    the cells, whatever the number of edges.
+
+    Returns:
+        numpy.ndarray: (replicates, K, K) mixing matrices
+    """
+    rng = np.random.default_rng(seed)
+    a, b = codes[src], codes[dst]
+    cells = np.minimum(a, b) * num_values + np.maximum(a, b)
+    counts = np.bincount(cells, minlength=num_values ** 2)
+    if len(src) == 0:
+        return np.zeros((num_replicates, num_values, num_values), dtype=np.int64)
+    draws = rng.multinomial(len(src), counts / len(src), size=num_replicates)
+    return mixing_layout(draws, num_values)
+
+
+def node_bootstrap_mixing(codes, src, dst, num_values, num_replicates, node_values=None,
+                          max_batch_entries=2 ** 24, seed=None):
+    """
+    Mixing matrices of node resamples.
+
+    Every replicate draws the nodes with replacement; an edge is kept as many
+    times as the product of its endpoints' multiplicities, so the edges
+    between resampled nodes are the induced subgraph of the resample. The
+    multiplicities of a batch of replicates are one (batch, nodes) matrix
+    and the edge weights are gathered from it with the endpoint index arrays.
+
+    Args:
+        codes (numpy.ndarray): Attribute code of each node
+        src (numpy.ndarray): Source node index of each edge
+        dst (numpy.ndarray): Target node index of each edge
+        num_values (int): Number of distinct attribute codes
+        num_replicates (int): Number of replicates
+        node_values (numpy.ndarray, optional): (nodes, columns) per-node values
+            to sum over each resample
+        max_batch_entries (int): Bound on batch x edges (memory per batch)
+        seed (int or numpy.random.SeedSequence, optional): Random seed
+
+    Returns:
+        tuple: (replicates, K, K) mixing matrices and the (replicates,
+        columns) resampled sums of node_values (None without node_values)
+    """
+    rng = np.random.default_rng(seed)
+    num_nodes, num_cells = len(codes), num_values ** 2
+    cells = codes[src] * num_values + codes[dst]
+    batch_size = max(1, min(num_replicates, max_batch_entries // max(len(src), num_nodes, 1)))
+
+    directed = np.zeros((num_replicates, num_cells), dtype=np.int64)
+    sums = None if node_values is None else np.zeros((num_replicates, np.shape(node_values)[1]))
+    for start in range(0, num_replicates, batch_size):
+        size = min(batch_size, num_replicates - start)
+        # Drawn node indices, counted per replicate into multiplicities
+        drawn = rng.integers(0, num_nodes, size=(size, num_nodes)) + (np.arange(size) * num_nodes)[:, None]
+        multiplicity = np.bincount(drawn.ravel(), minlength=size * num_nodes).reshape(size, num_nodes)
+        multiplicity = multiplicity.astype(np.int32)
+        weights = multiplicity[:, src] * multiplicity[:, dst]
+        offsets = (np.arange(size) * num_cells)[:, None]
+        directed[start:start + size] = np.bincount((cells + offsets).ravel(), weights=weights.ravel(),
+                                                   minlength=size * num_cells).reshape(size, num_cells)
+        if sums is not None:
+            sums[start:start + size] = multiplicity @ node_values
+    return mixing_layout(directed, num_values), sums
+
+
+# Graph arrays held by each worker process (see bootstrap_mixing)
+_worker_arrays = {}
+
+
+def _set_worker_arrays(arrays):
+    _worker_arrays.update(arrays)
+
+
+def _bootstrap_chunk(task):
+    method, num_replicates, seed = task
+    arrays = _worker_arrays
+    if method == "edge":
+        return edge_bootstrap_mixing(arrays['codes'], arrays['src'], arrays['dst'], arrays['num_values'],
+                                     num_replicates, seed=seed), None
+    return node_bootstrap_mixing(arrays['codes'], arrays['src'], arrays['dst'], arrays['num_values'],
+                                 num_replicates, node_values=arrays['node_values'], seed=seed)
+
+
+def bootstrap_mixing(arrays, num_replicates, method="node", node_values=None, seed=None, workers=1,
+                     chunk_size=250):
+    """
+    Bootstrap replicates of the mixing matrix, optionally in a process pool.
+
+    Replicates are drawn in chunks, each from its own SeedSequence child of
+    the run seed, so the result for a given seed does not depend on the
+    number of workers.
+
+    Args:
+        arrays (dict): Output of graphLoader.graph_to_arrays
+        num_replicates (int): Number of replicates
+        method (str): 'node' (resample nodes, keep the edges among them) or
+            'edge' (resample edges)
+        node_values (numpy.ndarray, optional): Per-node values summed over
+            each node resample (ignored for edge resampling)
+        seed (int or numpy.random.SeedSequence, optional): Run seed
+        workers (int): Worker processes; 1 runs in this process
+        chunk_size (int): Replicates per task
+
+    Returns:
+        tuple: (replicates, K, K) mixing matrices and the resampled sums of
+        node_values (None for edge resampling or without node_values)
+    """
+    if method not in ("node", "edge"):
+        raise ValueError(f"Unknown bootstrap method '{method}'. Use 'node' or 'edge'.")
+    root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    sizes = [min(chunk_size, num_replicates - start) for start in range(0, num_replicates, chunk_size)]
+    tasks = [(method, size, child) for size, child in zip(sizes, root.spawn(len(sizes)))]
+    shared = {'codes': arrays['codes'], 'src': arrays['src'], 'dst': arrays['dst'],
+              'num_values': len(arrays['values']), 'node_values': node_values}
+
+    workers = max(1, min(int(workers), len(tasks)))
+    if workers == 1:
+        _set_worker_arrays(shared)
+        chunks = [_bootstrap_chunk(task) for task in tasks]
+        _worker_arrays.clear()
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers, initializer=_set_worker_arrays, initargs=(shared,)) as pool:
+            chunks = list(pool.map(_bootstrap_chunk, tasks))
+
+    mixing = np.concatenate([chunk[0] for chunk in chunks])
+    if method == "edge" or node_values is None:
+        return mixing, None
+    return mixing, np.concatenate([chunk[1] for chunk in chunks])
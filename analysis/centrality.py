@@ -0,0 +1,352 @@
+"""
+Centrality Analysis Module - PageRank, eigenvector and betweenness by attribute
+
+Works on the sparse adjacency matrix of the graph: PageRank and eigenvector
+centrality are power iterations (one sparse product per step), and
+betweenness is estimated from a random sample of pivot sources with
+Brandes' accumulation run for a block of pivots at once, level by level,
+on index arrays. Pivot blocks can run in a process pool.
+Scores are aggregated per attribute value, and the nodes whose shortest
+paths connect different values (high betweenness, many neighbours in other
+groups) are flagged as cross-group brokers.
+
+    python centrality.py <graph.graphml> <attribute> [--pivots K] [--workers N]
+"""
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from graphLoader import load_graph, validate_graph, graph_to_arrays
+from nativeCommunities import adjacency_from_arrays
+from resultCache import cached_analysis, output_file
+from resultSink import ResultSink
+from profiler import profiled
+from lazyImport import lazy_import
+
+# Loaded on first use (see lazyImport)
+plt = lazy_import("matplotlib.pyplot")
+
+# Betweenness is exact up to this many nodes, and estimated from
+# DEFAULT_PIVOTS sampled sources on larger graphs
+EXACT_BETWEENNESS_NODES = 5000
+DEFAULT_PIVOTS = 256
+
+# Adjacency matrix held by each worker process (see approximate_betweenness)
+_worker_adjacency = {}
+
+
+def pagerank(adjacency, alpha=0.85, tol=1e-6, max_iter=100):
+    """
+    PageRank by power iteration, as nx.pagerank.
+
+    Dangling nodes spread their rank uniformly; the iteration stops when the
+    L1 change drops below num_nodes * tol.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix): Symmetric adjacency matrix
+        alpha (float): Damping factor
+        tol (float): Tolerance per node
+        max_iter (int): Maximum number of iterations
+
+    Returns:
+        tuple: (scores summing to 1, converged flag)
+    """
+    num_nodes = adjacency.shape[0]
+    out_degree = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = out_degree == 0
+    inverse_degree = np.divide(1.0, out_degree, out=np.zeros(num_nodes), where=~dangling)
+    transition = adjacency.T.tocsr()
+
+    x = np.full(num_nodes, 1.0 / num_nodes)
+    for _ in range(max_iter):
+        previous = x
+        x = alpha * (transition @ (previous * inverse_degree) + previous[dangling].sum() / num_nodes)
+        x += (1 - alpha) / num_nodes
+        if np.abs(x - previous).sum() < num_nodes * tol:
+            return x, True
+    return x, False
+
+
+def eigenvector_centrality(adjacency, tol=1e-6, max_iter=1000):
+    """
+    Eigenvector centrality by power iteration on A + I, as nx.eigenvector_centrality.
+
+    The identity shift keeps the iteration from oscillating on bipartite
+    parts of the graph; the result has unit Euclidean norm.
+
+    Returns:
+        tuple: (scores, converged flag)
+    """
+    num_nodes = adjacency.shape[0]
+    x = np.full(num_nodes, 1.0 / num_nodes)
+    for _ in range(max_iter):
+        previous = x
+        x = previous + adjacency @ previous
+        norm = np.linalg.norm(x)
+        if norm == 0:
+            return x, True
+        x = x / norm
+        if np.abs(x - previous).sum() < num_nodes * tol:
+            return x, True
+    return x, False
+
+
+def _neighbour_keys(adjacency, keys, width):
+    """
+    Expand (node, pivot) keys, encoded as node * width + pivot, to their neighbours.
+
+    Returns:
+        tuple: neighbour keys and, for each, the position of the key it came from
+    """
+    nodes, columns = np.divmod(keys, width)
+    starts = adjacency.indptr[nodes]
+    counts = adjacency.indptr[nodes + 1] - starts
+    owner = np.repeat(np.arange(len(keys)), counts)
+    position = np.arange(len(owner)) - np.repeat(np.cumsum(counts) - counts, counts) + starts[owner]
+    return adjacency.indices[position] * width + columns[owner], owner
+
+
+def pivot_dependencies(adjacency, pivots):
+    """
+    Sum of Brandes' dependencies of every node on a block of pivot sources.
+
+    The BFS from all pivots advances one level at a time over (node, pivot)
+    pairs: the frontier is expanded through the CSR index arrays, so every
+    level only touches the edges of its own frontier. The dependencies are
+    then accumulated back from the deepest level in the same way.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix): Symmetric adjacency matrix
+        pivots (numpy.ndarray): Source node indices
+
+    Returns:
+        numpy.ndarray: Dependency of each node summed over the pivots
+    """
+    num_nodes, width = adjacency.shape[0], len(pivots)
+    distance = np.full(num_nodes * width, -1, dtype=np.int32)
+    paths = np.zeros(num_nodes * width)
+    frontier = pivots * width + np.arange(width)
+    distance[frontier] = 0
+    paths[frontier] = 1
+
+    levels = [frontier]
+    while True:
+        targets, owner = _neighbour_keys(adjacency, frontier, width)
+        unvisited = distance[targets] < 0
+        targets, owner = targets[unvisited], owner[unvisited]
+        if len(targets) == 0:
+            break
+        np.add.at(paths, targets, paths[frontier][owner])
+        targets.sort()
+        frontier = targets[np.concatenate(([True], targets[1:] != targets[:-1]))]
+        distance[frontier] = len(levels)
+        levels.append(frontier)
+
+    dependency = np.zeros_like(paths)
+    for depth in range(len(levels) - 1, 0, -1):
+        keys = levels[depth]
+        coefficient = (1 + dependency[keys]) / paths[keys]
+        targets, owner = _neighbour_keys(adjacency, keys, width)
+        parents = distance[targets] == depth - 1
+        np.add.at(dependency, targets[parents], coefficient[owner[parents]])
+        above = levels[depth - 1]
+        dependency[above] *= paths[above]
+    # A pivot does not lie on its own paths
+    dependency[levels[0]] = 0
+    return dependency.reshape(num_nodes, width).sum(axis=1)
+
+
+def _set_worker_adjacency(adjacency):
+    _worker_adjacency['adjacency'] = adjacency
+
+
+def _pivot_block(pivots):
+    return pivot_dependencies(_worker_adjacency['adjacency'], pivots)
+
+
+def approximate_betweenness(adjacency, num_pivots=256, max_block_entries=2 ** 22, seed=None, workers=1):
+    """
+    Betweenness centrality estimated from randomly sampled pivot sources.
+
+    Normalised like nx.betweenness_centrality(G, k=num_pivots): the
+    dependencies on the pivots are scaled by num_nodes / num_pivots. With
+    num_pivots >= number of nodes every node is a pivot and the result is
+    exact.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix): Symmetric adjacency matrix
+        num_pivots (int): Number of sampled sources
+        max_block_entries (int): Bound on nodes x pivots processed together
+            (memory of one block)
+        seed (int, optional): Seed for the pivot sample
+        workers (int, optional): Worker processes for the pivot blocks; None
+            uses the CPU count
+
+    Returns:
+        tuple: (scores, number of pivots used)
+    """
+    num_nodes = adjacency.shape[0]
+    num_pivots = min(num_pivots, num_nodes)
+    pivots = np.random.default_rng(seed).choice(num_nodes, size=num_pivots, replace=False)
+    block_size = max(1, min(num_pivots, max_block_entries // max(num_nodes, 1)))
+    blocks = [pivots[start:start + block_size] for start in range(0, num_pivots, block_size)]
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(blocks)))
+    if workers == 1:
+        totals = [pivot_dependencies(adjacency, block) for block in blocks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_set_worker_adjacency,
+                                 initargs=(adjacency,)) as pool:
+            totals = list(pool.map(_pivot_block, blocks))
+
+    scores = np.sum(totals, axis=0) if totals else np.zeros(num_nodes)
+    if num_nodes > 2:
+        scores = scores * num_nodes / (num_pivots * (num_nodes - 1) * (num_nodes - 2))
+    return scores, num_pivots
+
+
+def group_summary(scores, codes, values):
+    """
+    Centrality aggregated per attribute value.
+
+    Args:
+        scores (pandas.DataFrame): One column per centrality, one row per node
+        codes (numpy.ndarray): Attribute code of each node
+        values (list): Attribute value of each code
+
+    Returns:
+        pandas.DataFrame: Node count and share, then the mean, max and share
+        of the total of every centrality, one row per attribute value
+    """
+    frame = scores.assign(group=np.asarray(values, dtype=object)[codes])
+    grouped = frame.groupby('group')
+    summary = pd.DataFrame({'nodes': grouped.size()})
+    summary['node_share'] = summary['nodes'] / len(frame)
+    for column in scores.columns:
+        summary[f"{column}_mean"] = grouped[column].mean()
+        summary[f"{column}_max"] = grouped[column].max()
+        total = frame[column].sum()
+        summary[f"{column}_share"] = grouped[column].sum() / total if total > 0 else 0.0
+    return summary.sort_values('betweenness_share', ascending=False)
+
+
+def _samples_pivots(G, params):
+    """Whether the betweenness pivots are a random sample (see cached_analysis)."""
+    if params['num_pivots'] is None:
+        return len(G) > EXACT_BETWEENNESS_NODES
+    return params['num_pivots'] < len(G)
+
+
+@profiled(category="analysis")
+@cached_analysis(draws_random=_samples_pivots)
+def centrality_analysis(G, attribute, output_dir="analysis_results", log_path=None, num_pivots=None,
+                        num_brokers=20, seed=None, workers=1):
+    """
+    PageRank, eigenvector and approximate betweenness centrality by attribute.
+
+    Args:
+        G (networkx.Graph): The network graph
+        attribute (str): Node attribute to aggregate by
+        output_dir (str): Directory for the CSV files and the figure
+        log_path (str): Path to the log file for results
+        num_pivots (int, optional): Sampled sources for betweenness; by
+            default exact up to EXACT_BETWEENNESS_NODES nodes, DEFAULT_PIVOTS above
+        num_brokers (int): Number of cross-group brokers to flag
+        seed (int, optional): Seed for the pivot sample
+        workers (int, optional): Worker processes for betweenness; None uses
+            the CPU count
+
+    Returns:
+        dict: 'group_centrality' (DataFrame per attribute value), 'brokers'
+              (DataFrame of the top cross-group brokers), convergence flags
+              and 'betweenness_pivots'
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    sink = ResultSink(log_path)
+    log = sink.log
+    log("\n--- Centrality Analysis ---")
+    results = {}
+
+    arrays = graph_to_arrays(G, attribute)
+    codes, values, degrees = arrays['codes'], arrays['values'], arrays['degrees']
+    num_nodes = len(codes)
+    adjacency = adjacency_from_arrays(arrays['src'], arrays['dst'], num_nodes)
+
+    page, results['pagerank_converged'] = pagerank(adjacency)
+    eigen, results['eigenvector_converged'] = eigenvector_centrality(adjacency)
+    if num_pivots is None:
+        num_pivots = num_nodes if num_nodes <= EXACT_BETWEENNESS_NODES else DEFAULT_PIVOTS
+    between, pivots = approximate_betweenness(adjacency, num_pivots, seed=seed, workers=workers)
+    results['betweenness_pivots'] = pivots
+    scores = pd.DataFrame({'pagerank': page, 'eigenvector': eigen, 'betweenness': between})
+    method = "exact" if pivots == num_nodes else f"estimated from {pivots} sampled sources"
+    log(f"PageRank and eigenvector centrality by sparse power iteration; betweenness {method}")
+    if not (results['pagerank_converged'] and results['eigenvector_converged']):
+        log("Warning: power iteration did not converge, scores are approximate")
+
+    summary = group_summary(scores, codes, values)
+    results['group_centrality'] = summary
+    log(f"\nCentrality by {attribute.capitalize()} (share = fraction of the total score):")
+    log(summary[['nodes', 'node_share', 'pagerank_share', 'eigenvector_share', 'betweenness_share',
+                 'betweenness_max']].round(4).to_string())
+
+    # Brokers: nodes on many shortest paths whose neighbours are mostly in other groups
+    same = np.bincount(arrays['src'], weights=codes[arrays['src']] == codes[arrays['dst']], minlength=num_nodes)
+    same += np.bincount(arrays['dst'], weights=codes[arrays['src']] == codes[arrays['dst']], minlength=num_nodes)
+    external_share = np.divide(degrees - same, degrees, out=np.zeros(num_nodes), where=degrees > 0)
+    pairs = np.unique(np.concatenate([arrays['src'] * len(values) + codes[arrays['dst']],
+                                      arrays['dst'] * len(values) + codes[arrays['src']]]))
+    neighbour_groups = np.bincount(pairs // len(values), minlength=num_nodes)
+
+    nodes = pd.DataFrame({'node': arrays['nodes'], 'group': np.asarray(values, dtype=object)[codes],
+                          'degree': degrees, 'external_share': external_share,
+                          'neighbour_groups': neighbour_groups}).join(scores)
+    nodes['broker_score'] = nodes['betweenness'] * nodes['external_share']
+    nodes.to_csv(output_file(os.path.join(output_dir, f"centrality_{attribute}.csv")), index=False)
+
+    brokers = nodes[nodes['broker_score'] > 0].nlargest(num_brokers, 'broker_score')
+    results['brokers'] = brokers.reset_index(drop=True)
+    log("\nTop cross-group brokers (betweenness x share of neighbours in other groups):")
+    for _, row in brokers.iterrows():
+        log(f"  {row['node']} ({row['group']}): betweenness {row['betweenness']:.4f}, "
+            f"{row['external_share']:.0%} of {row['degree']} neighbours outside, "
+            f"{row['neighbour_groups']} groups")
+
+    plt.figure(figsize=(12, 6))
+    shares = summary[['node_share', 'pagerank_share', 'betweenness_share']]
+    shares.plot(kind='bar', ax=plt.gca())
+    plt.title(f"Share of Nodes and Centrality by {attribute.capitalize()}")
+    plt.xlabel(attribute.capitalize())
+    plt.ylabel("Share")
+    plt.xticks(rotation=45, ha='right')
+    plt.tight_layout()
+    plt.savefig(output_file(os.path.join(output_dir, f"centrality_by_{attribute}.png")), dpi=300, bbox_inches='tight')
+    plt.close()
+
+    sink.flush()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Centrality of the nodes and attribute groups of a graph.")
+    parser.add_argument("graph", help="graph file (.graphml)")
+    parser.add_argument("attribute", choices=["main_genre", "major_label"])
+    parser.add_argument("--pivots", type=int, default=None,
+                        help=f"sampled sources for betweenness (default: exact up to {EXACT_BETWEENNESS_NODES} "
+                             f"nodes, {DEFAULT_PIVOTS} above)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--output", default=os.path.join("analysis_results", "centrality"), help="output folder")
+    args = parser.parse_args()
+
+    log_path = os.path.join(args.output, "centrality.txt")
+    if os.path.exists(log_path):
+        os.remove(log_path)
+
+    G = load_graph(args.graph)
+    if G is not None and validate_graph(G, required_attribute=args.attribute):
+        centrality_analysis(G, args.attribute, output_dir=args.output, log_path=log_path, num_pivots=args.pivots,
+                            workers=args.workers)
+        print(f"\nCentrality analysis complete. Results saved to: {args.output}")
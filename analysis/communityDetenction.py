@@ -1,34 +1,42 @@
-from collections import defaultdict, Counter
-import matplotlib.pyplot as plt
 import networkx as nx
 import pandas as pd
-import seaborn as sns
-from sklearn.metrics import normalized_mutual_info_score as normalized_mutual_information_score
-from sklearn.metrics import adjusted_rand_score
-import community as community_louvain
 import os
-import matplotlib.patches as mpatches
 import numpy as np
+from nativeCommunities import leiden_partition, adjacency_from_arrays
+from nativeCommunities import modularity as native_modularity
+from graphLoader import graph_to_arrays
+from contingency import (contingency_matrix, nmi_from_contingency, ari_from_contingency,
+                         purity, composition_percentages)
+from resultCache import cached_analysis, output_file
+from resultSink import ResultSink
+from profiler import profiled
+from lazyImport import lazy_import
 
+# Loaded on first use (see lazyImport)
+plt = lazy_import("matplotlib.pyplot")
+sns = lazy_import("seaborn")
+community_louvain = lazy_import("community")
+mpatches = lazy_import("matplotlib.patches")
+csgraph = lazy_import("scipy.sparse.csgraph")
 
-def plot_stacked_bar_chart(composition_df, communities_to_plot, community_sizes, attribute, attr_values, output_dir):
+# The spring layout and the node/edge drawings are skipped above these sizes
+# (of the component analysed); they would not finish on a large crawl
+NETWORK_PLOT_MAX_NODES = 5000
+NETWORK_PLOT_MAX_EDGES = 20000
+
+
+def plot_stacked_bar_chart(percentage_df, communities_to_plot, community_sizes, attribute, attr_values, output_dir):
     """
     Create a fixed stacked bar chart without gaps between segments.
+
+    percentage_df holds the composition percentages (communities x attribute values).
     """
     # Limit to top communities for visibility
     max_communities_to_plot = 15
     top_communities = communities_to_plot[:max_communities_to_plot]
     
-    # Create a pivot table for stacked bar chart
-    pivot_for_stacked = composition_df.pivot_table(
-        index='Community', 
-        columns='Attribute', 
-        values='Percentage',
-        fill_value=0
-    ).loc[top_communities]
-    
     # Convert to the format needed for stacked bars
-    stacked_df = pivot_for_stacked.T  # Transpose so attributes are rows
+    stacked_df = percentage_df.loc[top_communities].T  # Transpose so attributes are rows
     
     # Create figure
     plt.figure(figsize=(max(12, len(top_communities) * 0.8), 8))
@@ -76,21 +84,70 @@ def plot_stacked_bar_chart(composition_df, communities_to_plot, community_sizes,
     plt.ylim(0, 100)
     plt.legend(title=attribute_label, bbox_to_anchor=(1.05, 1), loc='upper left')
     plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, "community_stacked_bar_percent_fixed.png"), 
+    plt.savefig(output_file(os.path.join(output_dir, "community_stacked_bar_percent_fixed.png")), 
                 dpi=300, bbox_inches='tight')
     plt.close()
 
 
-def community_detection(G, attribute='main_genre', output_dir="analysis_results", log_path=None):
-    """Detect communities in artist graph, compare with attribute, and visualize results."""
+def plot_network_communities(G, attribute_label, attr_values, attr_communities, louvain_communities,
+                             communities_plot_filename, output_dir):
+    """
+    Draw the network coloured by attribute value and by detected community.
+
+    attr_communities maps each node to the index of its value in attr_values.
+    """
+    pos = nx.spring_layout(G, seed=42)
+
+    # Plot attribute communities
+    color_map = {val: plt.cm.tab20(i / max(1, len(attr_values))) for i, val in enumerate(attr_values)}
+    node_colors_attr = [color_map[attr_values[attr_communities[node]]] for node in G.nodes()]
+    plt.figure(figsize=(12, 10))
+    nx.draw_networkx_edges(G, pos, alpha=0.3)
+    nx.draw_networkx_nodes(G, pos, node_color=node_colors_attr, node_size=50)
+    patches = [mpatches.Patch(color=color_map[val], label=val) for val in attr_values]
+    plt.legend(handles=patches, title=attribute_label, loc='best', fontsize='small')
+    plt.title(f"Artist Network - {attribute_label} Communities")
+    plt.axis('off')
+    plt.tight_layout()
+    plt.savefig(output_file(os.path.join(output_dir, communities_plot_filename)), dpi=300, bbox_inches='tight')
+    plt.close()
+
+    # Plot Louvain communities
+    plt.figure(figsize=(12, 10))
+    unique_communities = sorted(set(louvain_communities.values()))
+    community_to_color = {comm: plt.cm.tab20(i / max(1, len(unique_communities))) for i, comm in enumerate(unique_communities)}
+    node_colors_louvain = [community_to_color[louvain_communities[node]] for node in G.nodes()]
+    nx.draw_networkx_edges(G, pos, alpha=0.3)
+    nx.draw_networkx_nodes(G, pos, node_color=node_colors_louvain, node_size=50)
+    patches = [mpatches.Patch(color=community_to_color[c], label=f"Community {c}") for c in unique_communities]
+    plt.legend(handles=patches, title="Louvain Community", loc='best', fontsize='small')
+    plt.title("Artist Network - Louvain Communities")
+    plt.axis('off')
+    plt.tight_layout()
+    plt.savefig(output_file(os.path.join(output_dir, "louvain_communities.png")), dpi=300, bbox_inches='tight')
+    plt.close()
+
+
+@profiled(category="analysis")
+@cached_analysis()
+def community_detection(G, attribute='main_genre', output_dir="analysis_results", log_path=None,
+                        resolution=1.0, seed=None, backend="louvain"):
+    """
+    Detect communities in artist graph, compare with attribute, and visualize results.
+
+    resolution and seed are passed to Louvain; resolutionSweep.resolution_sweep
+    (`runner.py sweep <attribute>`) shows how the results depend on them. backend="native" partitions with the
+    array-based Leiden-style engine in nativeCommunities instead of python-louvain,
+    and finds the largest component and the modularities on the edge arrays, so
+    it scales to million-edge graphs. The network drawings are only made for
+    components up to NETWORK_PLOT_MAX_NODES nodes and NETWORK_PLOT_MAX_EDGES edges.
+    """
     
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    def log(message):
-        if log_path:
-            with open(log_path, "a") as f:
-                f.write(message + "\n")
+    sink = ResultSink(log_path)
+    log = sink.log
 
     log("\n--- Community Detection ---")
 
@@ -108,105 +165,105 @@ def community_detection(G, attribute='main_genre', output_dir="analysis_results"
     else:
         log(f"Error: Unsupported attribute '{attribute}'")
         print(f"Unsupported attribute '{attribute}' in community_detection")
+        sink.flush()
         return
 
-    # Ensure undirected and connected
-    if hasattr(G, 'is_directed') and G.is_directed():
-        G = G.to_undirected()
-
-    if not nx.is_connected(G):
-        largest_cc = max(nx.connected_components(G), key=len)
-        G = G.subgraph(largest_cc).copy()
-        log(f"Using largest connected component with {len(G.nodes())} nodes")
+    # Ensure undirected and connected; the native backend stays on the edge arrays
+    if backend == "native":
+        arrays = graph_to_arrays(G, attribute)
+        adjacency = adjacency_from_arrays(arrays['src'], arrays['dst'], len(arrays['nodes']))
+        num_components, components = csgraph.connected_components(adjacency, directed=False)
+        keep = components == np.argmax(np.bincount(components))
+        nodes_list = [node for node, kept in zip(arrays['nodes'], keep) if kept]
+        if num_components > 1:
+            adjacency = adjacency[keep][:, keep]
+        num_edges = adjacency.nnz // 2
+        attr_codes, attr_membership = np.unique(arrays['codes'][keep], return_inverse=True)
+        attr_values = [arrays['values'][code] for code in attr_codes]
+    else:
+        if hasattr(G, 'is_directed') and G.is_directed():
+            G = G.to_undirected()
+        num_components = nx.number_connected_components(G)
+        if num_components > 1:
+            G = G.subgraph(max(nx.connected_components(G), key=len)).copy()
+        nodes_list = list(G.nodes())
+        num_edges = G.number_of_edges()
+        attr_values = sorted(set(G.nodes[node][attribute] for node in nodes_list))
+        attr_to_community = {attr: i for i, attr in enumerate(attr_values)}
+        attr_membership = np.array([attr_to_community[G.nodes[node][attribute]] for node in nodes_list])
+    if num_components > 1:
+        log(f"Using largest connected component with {len(nodes_list)} nodes")
     else:
         log("Using full graph (connected)")
 
     # Attribute communities
-    node_to_attr_community = {node: G.nodes[node][attribute] for node in G.nodes()}
-    attr_values = sorted(set(node_to_attr_community.values()))
-    attr_to_community = {attr: i for i, attr in enumerate(attr_values)}
-    attr_communities = {node: attr_to_community[node_to_attr_community[node]] for node in G.nodes()}
+    attr_communities = dict(zip(nodes_list, attr_membership.tolist()))
 
     # Louvain detection
-    louvain_communities = community_louvain.best_partition(G)
-    log(f"Number of attribute-based communities: {len(set(attr_communities.values()))}")
+    if backend == "native":
+        louvain_communities = dict(zip(nodes_list, leiden_partition(adjacency, resolution=resolution,
+                                                                    seed=seed).tolist()))
+    else:
+        louvain_communities = community_louvain.best_partition(G, resolution=resolution, random_state=seed)
+    log(f"Number of attribute-based communities: {len(attr_values)}")
     log(f"Number of Louvain-detected communities: {len(set(louvain_communities.values()))}")
 
-    # Evaluation metrics
-    nodes_sorted = sorted(G.nodes())
-    attr_membership = [attr_communities[node] for node in nodes_sorted]
-    louvain_membership = [louvain_communities[node] for node in nodes_sorted]
+    # Evaluation metrics from one community x attribute contingency table
+    community_ids, louvain_membership = np.unique(
+        np.array([louvain_communities[node] for node in nodes_list]), return_inverse=True)
+    table = contingency_matrix(louvain_membership, attr_membership, len(community_ids), len(attr_values))
 
-    nmi = normalized_mutual_information_score(attr_membership, louvain_membership)
-    ari = adjusted_rand_score(attr_membership, louvain_membership)
+    nmi = nmi_from_contingency(table)
+    ari = ari_from_contingency(table)
+    community_purity, overall_purity = purity(table)
     log(f"Normalized Mutual Information (NMI): {nmi:.4f}")
     log(f"Adjusted Rand Index (ARI): {ari:.4f}")
+    log(f"Community purity (size-weighted): {overall_purity:.4f}")
 
     # Modularity
-    def calc_modularity(communities): return community_louvain.modularity(communities, G)
-    attr_modularity = calc_modularity(attr_communities)
-    louvain_modularity = calc_modularity(louvain_communities)
+    if backend == "native":
+        attr_modularity = native_modularity(adjacency, attr_membership)
+        louvain_modularity = native_modularity(adjacency, louvain_membership)
+    else:
+        attr_modularity = community_louvain.modularity(attr_communities, G)
+        louvain_modularity = community_louvain.modularity(louvain_communities, G)
     log(f"Modularity of attribute-based partition: {attr_modularity:.4f}")
     log(f"Modularity of Louvain partition: {louvain_modularity:.4f}")
 
-    # Graph layout
-    pos = nx.spring_layout(G, seed=42)
+    if len(nodes_list) <= NETWORK_PLOT_MAX_NODES and num_edges <= NETWORK_PLOT_MAX_EDGES:
+        plot_network_communities(G.subgraph(nodes_list) if backend == "native" else G, attribute_label,
+                                 attr_values, attr_communities, louvain_communities,
+                                 communities_plot_filename, output_dir)
+    else:
+        log(f"Network drawings skipped ({len(nodes_list)} nodes, {num_edges} edges)")
+        for filename in (communities_plot_filename, "louvain_communities.png"):
+            # Do not leave the drawings of an earlier, smaller run next to these results
+            if os.path.exists(os.path.join(output_dir, filename)):
+                os.remove(os.path.join(output_dir, filename))
 
-    # Plot attribute communities
-    color_map = {val: plt.cm.tab20(i / max(1, len(attr_values))) for i, val in enumerate(attr_values)}
-    node_colors_attr = [color_map[node_to_attr_community[node]] for node in G.nodes()]
-    plt.figure(figsize=(12, 10))
-    nx.draw_networkx_edges(G, pos, alpha=0.3)
-    nx.draw_networkx_nodes(G, pos, node_color=node_colors_attr, node_size=50)
-    patches = [mpatches.Patch(color=color_map[val], label=val) for val in attr_values]
-    plt.legend(handles=patches, title=attribute_label, loc='best', fontsize='small')
-    plt.title(f"Artist Network - {attribute_label} Communities")
-    plt.axis('off')
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, communities_plot_filename), dpi=300, bbox_inches='tight')
-    plt.close()
+    # Community composition, all derived from the contingency table
+    sizes = np.asarray(table.sum(axis=1)).ravel()
+    order = np.argsort(-sizes, kind='stable')
+    communities_to_plot = community_ids[order].tolist()
+    community_sizes = dict(zip(community_ids.tolist(), sizes.tolist()))
 
-    # Plot Louvain communities
-    plt.figure(figsize=(12, 10))
-    unique_communities = sorted(set(louvain_communities.values()))
-    community_to_color = {comm: plt.cm.tab20(i / max(1, len(unique_communities))) for i, comm in enumerate(unique_communities)}
-    node_colors_louvain = [community_to_color[louvain_communities[node]] for node in G.nodes()]
-    nx.draw_networkx_edges(G, pos, alpha=0.3)
-    nx.draw_networkx_nodes(G, pos, node_color=node_colors_louvain, node_size=50)
-    patches = [mpatches.Patch(color=community_to_color[c], label=f"Community {c}") for c in unique_communities]
-    plt.legend(handles=patches, title="Louvain Community", loc='best', fontsize='small')
-    plt.title("Artist Network - Louvain Communities")
-    plt.axis('off')
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, "louvain_communities.png"), dpi=300, bbox_inches='tight')
-    plt.close()
+    present = np.asarray(table.sum(axis=0)).ravel() > 0
+    percentages = composition_percentages(table)
+    percentage_df = pd.DataFrame(percentages[:, present], index=community_ids,
+                                 columns=[val for val, keep in zip(attr_values, present) if keep])
+    percentage_df.index.name = 'Community'
+    percentage_df.columns.name = 'Attribute'
 
-    # Analyze community composition
-    def analyze_community_composition(G, communities, attribute):
-        counts = defaultdict(lambda: defaultdict(int))
-        for node in G.nodes():
-            comm = communities[node]
-            attr_val = G.nodes[node][attribute]
-            counts[comm][attr_val] += 1
-        rows = []
-        for comm, attr_counts in counts.items():
-            total = sum(attr_counts.values())
-            for attr_val, count in attr_counts.items():
-                rows.append({
-                    'Community': comm,
-                    'Attribute': attr_val,
-                    'Count': count,
-                    'Percentage': count / total * 100
-                })
-        return pd.DataFrame(rows)
-
-    composition_df = analyze_community_composition(G, louvain_communities, attribute)
-    community_sizes = Counter(louvain_communities.values())
-    communities_to_plot = [comm for comm, _ in community_sizes.most_common()]
+    cells = table.tocoo()
+    composition_df = pd.DataFrame({
+        'Community': community_ids[cells.row],
+        'Attribute': np.array(attr_values, dtype=object)[cells.col],
+        'Count': cells.data,
+        'Percentage': percentages[cells.row, cells.col],
+    })
 
     # Heatmap
-    pivot = composition_df.pivot_table(index='Community', columns='Attribute', values='Percentage', fill_value=0)
-    pivot = pivot.reindex(communities_to_plot)
+    pivot = percentage_df.reindex(communities_to_plot)
     fig_width = max(14, pivot.shape[1] * 0.7)
     fig_height = max(12, pivot.shape[0] * 0.4)
     plt.figure(figsize=(fig_width, fig_height))
@@ -230,12 +287,12 @@ def community_detection(G, attribute='main_genre', output_dir="analysis_results"
             [pivot.index[i] for i in range(0, pivot.shape[0], step)]
         )
     plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, "community_composition_full.png"), dpi=300, bbox_inches='tight')
+    plt.savefig(output_file(os.path.join(output_dir, "community_composition_full.png")), dpi=300, bbox_inches='tight')
     plt.close()
 
     # Stacked bar chart using helper function
     plot_stacked_bar_chart(
-        composition_df=composition_df,
+        percentage_df=percentage_df,
         communities_to_plot=communities_to_plot,
         community_sizes=community_sizes,
         attribute=attribute,
@@ -243,6 +300,7 @@ def community_detection(G, attribute='main_genre', output_dir="analysis_results"
         output_dir=output_dir
     )
 
+    sink.flush()
     return {
         'nmi': nmi,
         'ari': ari,
@@ -250,5 +308,8 @@ def community_detection(G, attribute='main_genre', output_dir="analysis_results"
         'louvain_modularity': louvain_modularity,
         'attr_communities': attr_communities,
         'louvain_communities': louvain_communities,
-        'community_composition': composition_df
+        'community_composition': composition_df,
+        'contingency_table': table,
+        'community_purity': dict(zip(community_ids.tolist(), community_purity.tolist())),
+        'purity': overall_purity
     }
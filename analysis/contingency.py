@@ -0,0 +1,119 @@
+"""
+Contingency - Partition evaluation from one sparse contingency table
+
+Builds the community x attribute contingency matrix with a single
+np.bincount and derives NMI, ARI, purity and the composition percentages
+from it, instead of nested dictionaries, pivot tables and per-node lists.
+"""
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+def contingency_matrix(row_codes, col_codes, num_rows=None, num_cols=None):
+    """
+    Sparse contingency table of two labelings of the same nodes.
+
+    Args:
+        row_codes (numpy.ndarray): Integer label of each node (e.g. community)
+        col_codes (numpy.ndarray): Integer label of each node (e.g. attribute)
+        num_rows (int, optional): Number of row labels, inferred by default
+        num_cols (int, optional): Number of column labels, inferred by default
+
+    Returns:
+        scipy.sparse.csr_matrix: (num_rows, num_cols) matrix of node counts
+    """
+    row_codes = np.asarray(row_codes, dtype=np.int64)
+    col_codes = np.asarray(col_codes, dtype=np.int64)
+    num_rows = int(row_codes.max()) + 1 if num_rows is None else num_rows
+    num_cols = int(col_codes.max()) + 1 if num_cols is None else num_cols
+    counts = np.bincount(row_codes * num_cols + col_codes, minlength=num_rows * num_cols)
+    cells = np.flatnonzero(counts)
+    return csr_matrix((counts[cells], (cells // num_cols, cells % num_cols)), shape=(num_rows, num_cols))
+
+
+def _entropy(counts, total):
+    p = counts[counts > 0] / total
+    return float(-np.sum(p * np.log(p)))
+
+
+def nmi_from_contingency(table):
+    """
+    Normalized mutual information (arithmetic normalisation, as sklearn's default).
+
+    Args:
+        table (scipy.sparse.csr_matrix): Contingency table
+
+    Returns:
+        float: NMI between the row and column labelings
+    """
+    total = table.sum()
+    rows = np.asarray(table.sum(axis=1)).ravel()
+    cols = np.asarray(table.sum(axis=0)).ravel()
+    if np.count_nonzero(rows) == np.count_nonzero(cols) <= 1:
+        return 1.0
+    coo = table.tocoo()
+    joint = coo.data / total
+    mutual_info = float(np.sum(joint * (np.log(coo.data * total) - np.log(rows[coo.row] * cols[coo.col]))))
+    normaliser = (_entropy(rows, total) + _entropy(cols, total)) / 2
+    if mutual_info <= 0 or normaliser == 0:
+        return 0.0
+    return min(mutual_info / normaliser, 1.0)
+
+
+def ari_from_contingency(table):
+    """
+    Adjusted Rand index from pair counts of the contingency table.
+
+    Args:
+        table (scipy.sparse.csr_matrix): Contingency table
+
+    Returns:
+        float: ARI between the row and column labelings
+    """
+    total = float(table.sum())
+    rows = np.asarray(table.sum(axis=1), dtype=float).ravel()
+    cols = np.asarray(table.sum(axis=0), dtype=float).ravel()
+    num_rows, num_cols = np.count_nonzero(rows), np.count_nonzero(cols)
+    if num_rows == num_cols == 1 or num_rows == num_cols == 0 or num_rows == num_cols == total:
+        return 1.0
+    data = table.data.astype(float)
+    sum_cells = np.sum(data * (data - 1)) / 2
+    sum_rows = np.sum(rows * (rows - 1)) / 2
+    sum_cols = np.sum(cols * (cols - 1)) / 2
+    expected = sum_rows * sum_cols / (total * (total - 1) / 2)
+    maximum = (sum_rows + sum_cols) / 2
+    if maximum == expected:
+        return 0.0
+    return float((sum_cells - expected) / (maximum - expected))
+
+
+def purity(table):
+    """
+    Share of each row's nodes that carry its most common column label.
+
+    Args:
+        table (scipy.sparse.csr_matrix): Contingency table
+
+    Returns:
+        tuple: (per-row purity array, overall purity weighted by row size)
+    """
+    sizes = np.asarray(table.sum(axis=1)).ravel()
+    largest = table.max(axis=1).toarray().ravel()
+    per_row = np.divide(largest, sizes, out=np.zeros(len(sizes)), where=sizes > 0)
+    overall = float(largest.sum() / sizes.sum()) if sizes.sum() else 0.0
+    return per_row, overall
+
+
+def composition_percentages(table):
+    """
+    Row-normalised contingency table in percent (dense).
+
+    Args:
+        table (scipy.sparse.csr_matrix): Contingency table
+
+    Returns:
+        numpy.ndarray: Percentage of each column label within each row
+    """
+    dense = table.toarray().astype(float)
+    sizes = dense.sum(axis=1, keepdims=True)
+    return np.divide(dense * 100, sizes, out=np.zeros_like(dense), where=sizes > 0)
@@ -2,8 +2,11 @@
 Graph Loader - Utility functions for loading and validating network graphs
 """
 import networkx as nx
+import numpy as np
 import os
+from profiler import profiled
 
+@profiled(category="io")
 def load_graph(path):
     """
     Load a network graph from various file formats.
@@ -74,4 +77,40 @@ def validate_graph(G, required_attribute=None):
 def ensure_output_directory(directory="analysis_results"):
     """Create output directory if it doesn't exist"""
     os.makedirs(directory, exist_ok=True)
-    return directory
\ No newline at end of file
+    return directory
+
+def graph_to_arrays(G, attribute):
+    """
+    Flatten a graph into integer arrays for the vectorised engines.
+
+    Nodes are numbered in G.nodes() order and attribute values are encoded
+    as integer codes in sorted order (same ordering as create_mixing_matrix).
+
+    Args:
+        G (networkx.Graph): The graph to flatten
+        attribute (str): Node attribute to encode
+
+    Returns:
+        dict: 'nodes' (list), 'values' (sorted attribute values), 'codes'
+              (int array, one per node), 'src' and 'dst' (int arrays, one
+              entry per edge) and 'degrees' (int array, one per node)
+    """
+    nodes = list(G.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    values = sorted(set(G.nodes[n][attribute] for n in nodes))
+    value_index = {val: i for i, val in enumerate(values)}
+    codes = np.array([value_index[G.nodes[n][attribute]] for n in nodes], dtype=np.int64)
+
+    edges = np.array([(index[u], index[v]) for u, v in G.edges()], dtype=np.int64).reshape(-1, 2)
+    src = np.ascontiguousarray(edges[:, 0])
+    dst = np.ascontiguousarray(edges[:, 1])
+    degrees = np.bincount(src, minlength=len(nodes)) + np.bincount(dst, minlength=len(nodes))
+
+    return {
+        'nodes': nodes,
+        'values': values,
+        'codes': codes,
+        'src': src,
+        'dst': dst,
+        'degrees': degrees,
+    }
@@ -2,11 +2,21 @@
 Homophily Analysis Module - Functions to analyze homophily patterns in networks
 """
 import networkx as nx
-import matplotlib.pyplot as plt
 import pandas as pd
 from collections import Counter, defaultdict
 import os
 import copy
+import numpy as np
+from graphLoader import graph_to_arrays
+from bootstrap import bootstrap_mixing, mixing_statistics, interval
+from analyticNull import mixing_counts
+from resultCache import cached_analysis, output_file
+from resultSink import ResultSink
+from profiler import profiled
+from lazyImport import lazy_import
+
+# Loaded on first use (see lazyImport)
+plt = lazy_import("matplotlib.pyplot")
 
 def calculate_homophily_ratio(G, attribute):
     """
@@ -133,23 +143,91 @@ def calculate_ei_indices(G, attribute):
     
     return ei_indices
 
-def log_line(text, log_path):
-    if log_path:
-        with open(log_path, "a") as f:
-            f.write(str(text) + "\n")
+def bootstrap_intervals(G, attribute, blau_indices=None, num_replicates=1000, method="node", confidence=0.95,
+                        seed=None, workers=1):
+    """
+    Bootstrap confidence intervals for the homophily metrics.
 
-            
-def homophily_analysis(G, attribute, output_dir="analysis_results", log_path=None):
+    Only the nodes that have the attribute (and the edges among them) are
+    resampled, as in the mixing matrix and the E-I indices; the homophily
+    ratio interval is then over those edges only.
+
+    Args:
+        G (networkx.Graph): The network graph
+        attribute (str): Node attribute to analyze
+        blau_indices (dict, optional): Blau index per node, for the interval
+            of their average over the nodes with the attribute (node
+            resampling only)
+        num_replicates (int): Bootstrap replicates
+        method (str): 'node' or 'edge' resampling (see bootstrap.bootstrap_mixing)
+        confidence (float): Coverage of the intervals
+        seed (int, optional): Seed; a fresh one is drawn when None
+        workers (int): Worker processes for the replicates
+
+    Returns:
+        tuple: DataFrame (metric, estimate, se, ci_low, ci_high) and the
+               entropy of the seed used
+    """
+    arrays = graph_to_arrays(G.subgraph(n for n in G if attribute in G.nodes[n]), attribute)
+    values = arrays['values']
+    root = np.random.SeedSequence(seed)
+
+    node_values = None
+    if blau_indices and method == "node":
+        node_values = np.zeros((len(arrays['nodes']), 2))
+        for i, node in enumerate(arrays['nodes']):
+            if node in blau_indices:
+                node_values[i] = (blau_indices[node], 1)
+
+    observed = mixing_counts(arrays['codes'], arrays['src'], arrays['dst'], len(values))
+    mixing, node_sums = bootstrap_mixing(arrays, num_replicates, method=method, node_values=node_values,
+                                         seed=root, workers=workers)
+    estimates = mixing_statistics(observed)
+    replicates = mixing_statistics(mixing)
+
+    metrics = [('homophily_ratio', estimates['homophily_ratio'], replicates['homophily_ratio'])]
+    if node_sums is not None:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            metrics.append(('avg_blau_index', node_values[:, 0].sum() / node_values[:, 1].sum(),
+                            node_sums[:, 0] / node_sums[:, 1]))
+    metrics.append(('assortativity', estimates['assortativity'], replicates['assortativity']))
+    metrics.extend((f"ei_index[{val}]", estimates['ei_indices'][k], replicates['ei_indices'][:, k])
+                   for k, val in enumerate(values))
+    metrics.extend((f"mixing[{values[i]}|{values[j]}]", observed[i, j], mixing[:, i, j])
+                   for i in range(len(values)) for j in range(i, len(values)))
+
+    rows = []
+    for metric, estimate, samples in metrics:
+        se, low, high = interval(estimate, samples, confidence)
+        rows.append({'metric': metric, 'estimate': float(estimate), 'se': float(se),
+                     'ci_low': float(low), 'ci_high': float(high)})
+    return pd.DataFrame(rows, columns=['metric', 'estimate', 'se', 'ci_low', 'ci_high']), root.entropy
+
+@profiled(category="analysis")
+@cached_analysis(draws_random=lambda G, params: bool(params['num_bootstrap']))
+def homophily_analysis(G, attribute, output_dir="analysis_results", log_path=None, num_bootstrap=1000,
+                       bootstrap="node", confidence=0.95, seed=None, workers=1):
+    """
+    Homophily ratio, Blau index, mixing matrix, E-I indices and assortativity.
+
+    Every metric also gets a bootstrap confidence interval from num_bootstrap
+    resamples of the nodes (bootstrap='node', keeping the edges among them)
+    or of the edges (bootstrap='edge'); set num_bootstrap=0 to skip them.
+    The intervals are saved to homophily_intervals_<attribute>.csv and drawn
+    as error bars on the E-I figure.
+    """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    log_line("\n--- Homophily Analysis ---", log_path)
+    sink = ResultSink(log_path)
+    log = sink.log
+    log("\n--- Homophily Analysis ---")
     results = {}
 
     # Directly analyze the graph without filtering ambiguous nodes
     hr_original = calculate_homophily_ratio(G, attribute)
     results['homophily_ratio'] = hr_original
-    log_line(f"Homophily Ratio (original): {hr_original:.4f}", log_path)
+    log(f"Homophily Ratio (original): {hr_original:.4f}")
 
     blau_indices = {node: blau_index(G, node, attribute) for node in G.nodes()
                     if any(attribute in G.nodes[n] for n in G.neighbors(node))}
@@ -157,44 +235,70 @@ def homophily_analysis(G, attribute, output_dir="analysis_results", log_path=Non
         avg_blau = sum(blau_indices.values()) / len(blau_indices)
         results['blau_indices'] = blau_indices
         results['avg_blau_index'] = avg_blau
-        log_line(f"Average Blau's Heterogeneity Index: {avg_blau:.4f}", log_path)
+        log(f"Average Blau's Heterogeneity Index: {avg_blau:.4f}")
 
     mixing_matrix = create_mixing_matrix(G, attribute)
     results['mixing_matrix'] = mixing_matrix
 
-    log_line("\nMixing Matrix:", log_path)
-    log_line(mixing_matrix, log_path)  # Print the full mixing matrix
+    log("\nMixing Matrix:")
+    log(mixing_matrix)  # Print the full mixing matrix
 
     ei_indices = calculate_ei_indices(G, attribute)
     results['ei_indices'] = ei_indices
 
-    log_line(f"\nE-I Index by {attribute.capitalize()}:", log_path)
-    for val, idx in sorted(ei_indices.items(), key=lambda x: x[1]):
-        log_line(f"  {val}: {idx:.4f}", log_path)
+    log(f"\nE-I Index by {attribute.capitalize()}:")
+    for val, idx in sorted(ei_indices.items(), key=lambda x: (x[1], x[0])):
+        log(f"  {val}: {idx:.4f}")
+
+    intervals = None
+    if num_bootstrap:
+        intervals, entropy = bootstrap_intervals(G, attribute, blau_indices, num_replicates=num_bootstrap,
+                                                 method=bootstrap, confidence=confidence, seed=seed, workers=workers)
+        intervals.to_csv(output_file(os.path.join(output_dir, f"homophily_intervals_{attribute}.csv")), index=False)
+        unattributed = sum(1 for n in G if attribute not in G.nodes[n])
+        results['bootstrap'] = {'method': bootstrap, 'replicates': num_bootstrap, 'confidence': confidence,
+                                'seed': entropy, 'intervals': intervals}
+        intervals = intervals.set_index('metric')
 
     plt.figure(figsize=(12, 6))
     plot_values = []
     plot_indices = []
-    for val, idx in sorted(ei_indices.items(), key=lambda x: x[1]):
+    for val, idx in sorted(ei_indices.items(), key=lambda x: (x[1], x[0])):
         plot_values.append(val)
         plot_indices.append(idx)
 
-    plt.bar(plot_values, plot_indices)
+    error = None
+    if intervals is not None:
+        bounds = intervals.loc[[f"ei_index[{val}]" for val in plot_values], ['ci_low', 'ci_high']].values
+        error = np.clip([np.array(plot_indices) - bounds[:, 0], bounds[:, 1] - np.array(plot_indices)], 0, None)
+    plt.bar(plot_values, plot_indices, yerr=error, capsize=3)
     plt.axhline(y=0, color='r', linestyle='-', alpha=0.3)
     plt.title(f"E-I Index by {attribute.capitalize()}")
     plt.xlabel(attribute.capitalize())
     plt.ylabel("E-I Index")
     plt.xticks(rotation=45, ha='right')
     plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, f"ei_index_{attribute}.png"), dpi=300, bbox_inches='tight')
+    plt.savefig(output_file(os.path.join(output_dir, f"ei_index_{attribute}.png")), dpi=300, bbox_inches='tight')
     plt.close()
 
     try:
         assortativity = nx.attribute_assortativity_coefficient(G, attribute)
         results['assortativity'] = assortativity
-        log_line(f"\nAttribute Assortativity Coefficient: {assortativity:.4f}", log_path)
+        log(f"\nAttribute Assortativity Coefficient: {assortativity:.4f}")
     except:
         results['assortativity'] = None
-        log_line("Could not calculate assortativity coefficient", log_path)
+        log("Could not calculate assortativity coefficient")
+
+    if intervals is not None:
+        log(f"\nBootstrap {confidence:.0%} confidence intervals ({num_bootstrap} {bootstrap} resamples, "
+            f"seed {results['bootstrap']['seed']}):")
+        if unattributed:
+            log(f"  ({unattributed} nodes without {attribute} and their edges left out)")
+        for metric in intervals.index:
+            if metric.startswith("mixing["):
+                continue
+            row = intervals.loc[metric]
+            log(f"  {metric}: {row['estimate']:.4f} ± {row['se']:.4f} [{row['ci_low']:.4f}, {row['ci_high']:.4f}]")
 
+    sink.flush()
     return results
@@ -0,0 +1,37 @@
+"""
+Lazy Import - Defer heavy dependencies until they are first used
+
+Plotting (matplotlib, seaborn), scipy.stats and python-louvain take most of
+the start-up time of the analysis scripts, but many invocations (usage,
+--help, collecting saved results, runs served from the result cache) never
+touch them. A module bound with lazy_import is only imported on its first
+attribute access.
+"""
+import importlib
+
+
+class LazyModule:
+    """Stand-in for a module that imports it on the first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        # sys.modules caches the import, so only the first access pays for it
+        return getattr(importlib.import_module(self._name), attribute)
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'>"
+
+
+def lazy_import(name):
+    """
+    Module bound on first use, e.g. plt = lazy_import("matplotlib.pyplot").
+
+    Args:
+        name (str): Absolute module name
+
+    Returns:
+        LazyModule: Proxy forwarding attribute access to the module
+    """
+    return LazyModule(name)
@@ -0,0 +1,326 @@
+"""
+Native Community Detection - Leiden-style modularity optimisation on CSR arrays
+
+An array-based alternative to python-louvain for large crawls. The graph is
+held as a symmetric scipy CSR matrix with integer community labels, and
+every step works on whole edge arrays at once:
+
+- local moving: all nodes evaluate their best neighbouring community in
+  parallel and a random half of the improving nodes move per sweep, which
+  avoids the oscillation of fully synchronous updates;
+- refinement: communities are re-grown from singletons with moves restricted
+  to the parent community and then split into connected pieces, so every
+  community is connected (the Leiden guarantee);
+- aggregation: refined communities become nodes of the next level, starting
+  from the parent partition.
+
+Label propagation is available as a faster, lower-quality alternative.
+"""
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix
+from lazyImport import lazy_import
+
+# Loaded on first use (see lazyImport)
+csgraph = lazy_import("scipy.sparse.csgraph")
+
+
+def adjacency_from_arrays(src, dst, num_nodes, weights=None):
+    """
+    Symmetric CSR adjacency matrix from edge endpoint arrays.
+
+    Args:
+        src (numpy.ndarray): Source node index of each edge
+        dst (numpy.ndarray): Target node index of each edge
+        num_nodes (int): Number of nodes
+        weights (numpy.ndarray, optional): Edge weights, 1 by default
+
+    Returns:
+        scipy.sparse.csr_matrix: Adjacency matrix
+    """
+    if weights is None:
+        weights = np.ones(len(src))
+    rows = np.concatenate([src, dst])
+    cols = np.concatenate([dst, src])
+    data = np.concatenate([weights, weights]).astype(float)
+    return coo_matrix((data, (rows, cols)), shape=(num_nodes, num_nodes)).tocsr()
+
+
+def _relabel(labels):
+    """Map labels to 0..k-1 in order of first appearance of each value."""
+    _, first, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    order = np.argsort(np.argsort(first))
+    return order[inverse]
+
+
+def modularity(adjacency, labels, resolution=1.0):
+    """
+    Modularity of a partition of a (possibly aggregated) CSR graph.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix): Symmetric adjacency matrix
+        labels (numpy.ndarray): Community id of each node
+        resolution (float): Resolution parameter (1 is standard modularity)
+
+    Returns:
+        float: Modularity
+    """
+    total = adjacency.sum()
+    if total == 0:
+        return 0.0
+    coo = adjacency.tocoo()
+    num_labels = labels.max() + 1
+    internal = np.bincount(labels[coo.row], weights=coo.data * (labels[coo.row] == labels[coo.col]),
+                           minlength=num_labels)
+    strength = np.asarray(adjacency.sum(axis=1)).ravel()
+    totals = np.bincount(labels, weights=strength, minlength=num_labels)
+    return float(internal.sum() / total - resolution * np.sum((totals / total) ** 2))
+
+
+def _off_diagonal(adjacency, keep=None):
+    """Adjacency without self-loops, optionally restricted to a mask over its entries."""
+    coo = adjacency.tocoo()
+    mask = coo.row != coo.col
+    if keep is not None:
+        mask &= keep(coo.row, coo.col)
+    return csr_matrix((coo.data[mask], (coo.row[mask], coo.col[mask])), shape=adjacency.shape)
+
+
+def _community_weights(adjacency, labels, rows=None):
+    """
+    Edge weight from nodes to each of their neighbouring communities.
+
+    Computed as the sparse product of (a row subset of) the adjacency matrix
+    with the one-hot membership matrix, so entries come out grouped by node.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix): Adjacency matrix without self-loops
+        labels (numpy.ndarray): Community of each node
+        rows (numpy.ndarray, optional): Nodes to evaluate, all by default
+
+    Returns:
+        tuple: (position, community, weight, indptr) where position indexes rows
+    """
+    num_nodes = adjacency.shape[0]
+    onehot = csr_matrix((np.ones(num_nodes), (np.arange(num_nodes), labels)),
+                        shape=(num_nodes, labels.max() + 1))
+    subset = adjacency if rows is None else adjacency[rows]
+    weights = (subset @ onehot).tocsr()
+    position = np.repeat(np.arange(subset.shape[0]), np.diff(weights.indptr))
+    return position, weights.indices, weights.data, weights.indptr
+
+
+def _row_argmax(values, indptr):
+    """Position of the largest value in every non-empty CSR row (first one on ties)."""
+    starts = indptr[:-1][np.diff(indptr) > 0]
+    row_max = np.maximum.reduceat(values, starts)
+    rows = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(values))))
+    candidates = np.flatnonzero(values == row_max[rows])
+    first = np.ones(len(candidates), dtype=bool)
+    first[1:] = rows[candidates[1:]] != rows[candidates[:-1]]
+    return candidates[first]
+
+
+def _local_moving(adjacency, strength, labels, resolution, rng, parent=None, max_sweeps=50,
+                  move_fraction=0.5, tolerance=1e-4):
+    """
+    Parallel local moving of nodes between communities.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix): Symmetric adjacency matrix
+        strength (numpy.ndarray): Node strength (weighted degree, incl. self-loops)
+        labels (numpy.ndarray): Initial community of each node
+        resolution (float): Resolution parameter
+        rng (numpy.random.Generator): Random generator
+        parent (numpy.ndarray, optional): If given, a node may only join a
+            community whose members share its parent label
+        max_sweeps (int): Maximum number of sweeps
+        move_fraction (float): Probability that an improving node moves in a sweep
+        tolerance (float): Stop once fewer than this fraction of nodes can improve
+
+    Returns:
+        numpy.ndarray: Community of each node
+    """
+    num_nodes = adjacency.shape[0]
+    labels = _relabel(labels)
+    total = strength.sum()
+    if total == 0:
+        return labels
+
+    if parent is None:
+        neighbours = _off_diagonal(adjacency)
+    else:
+        neighbours = _off_diagonal(adjacency, keep=lambda row, col: parent[row] == parent[col])
+    if neighbours.nnz == 0:
+        return labels
+
+    # Only nodes whose neighbourhood changed in the last sweep are re-evaluated
+    scale = resolution / total
+    active = np.arange(num_nodes)
+    for _ in range(max_sweeps):
+        totals = np.bincount(labels, weights=strength, minlength=num_nodes)
+        position, community, weight, indptr = _community_weights(neighbours, labels, active)
+        node = active[position]
+
+        own = labels[node] == community
+        # Gain of placing the node in a community, relative to leaving it alone
+        others = totals[community] - np.where(own, strength[node], 0.0)
+        gain = weight - scale * strength[node] * others
+
+        stay = -scale * strength[active] * (totals[labels[active]] - strength[active])
+        stay[position[own]] = gain[own]
+
+        best = _row_argmax(gain, indptr)
+        best_position, best_community, best_gain = position[best], community[best], gain[best]
+
+        improving = (best_community != labels[active[best_position]]) & (best_gain > stay[best_position] + 1e-12)
+        if np.count_nonzero(improving) <= tolerance * num_nodes:
+            break
+        movers = improving & (rng.random(len(best_position)) < move_fraction)
+        moved = active[best_position[movers]]
+        labels[moved] = best_community[movers]
+
+        touched = np.zeros(num_nodes, dtype=bool)
+        touched[moved] = True
+        touched[active[best_position[improving & ~movers]]] = True
+        touched[neighbours[moved].indices] = True
+        active = np.flatnonzero(touched)
+
+    return labels
+
+
+def _split_disconnected(adjacency, labels):
+    """Split every community into its connected pieces."""
+    coo = adjacency.tocoo()
+    inside = labels[coo.row] == labels[coo.col]
+    internal = csr_matrix((coo.data[inside], (coo.row[inside], coo.col[inside])), shape=adjacency.shape)
+    _, pieces = csgraph.connected_components(internal, directed=False)
+    return pieces
+
+
+def _aggregate(adjacency, labels):
+    """Collapse communities into nodes; internal weight becomes a self-loop."""
+    num_labels = labels.max() + 1
+    membership = csr_matrix((np.ones(len(labels)), (labels, np.arange(len(labels)))),
+                            shape=(num_labels, len(labels)))
+    return (membership @ adjacency @ membership.T).tocsr()
+
+
+def leiden_partition(adjacency, resolution=1.0, seed=None, max_levels=20):
+    """
+    Leiden-style modularity partition of a CSR graph.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix): Symmetric adjacency matrix
+        resolution (float): Resolution parameter (1 is standard modularity)
+        seed (int, optional): Random seed
+        max_levels (int): Maximum number of aggregation levels
+
+    Returns:
+        numpy.ndarray: Community id (0..k-1) of each node
+    """
+    rng = np.random.default_rng(seed)
+    num_nodes = adjacency.shape[0]
+    membership = np.arange(num_nodes)  # original node -> node of the current level
+    level_graph = adjacency
+    level_labels = np.arange(num_nodes)
+
+    for _ in range(max_levels):
+        strength = np.asarray(level_graph.sum(axis=1)).ravel()
+        level_labels = _local_moving(level_graph, strength, level_labels, resolution, rng)
+
+        # Refinement: regrow each community from singletons, then keep connected pieces
+        refined = _local_moving(level_graph, strength, np.arange(level_graph.shape[0]),
+                                resolution, rng, parent=level_labels)
+        refined = _relabel(_split_disconnected(level_graph, refined))
+        if refined.max() + 1 == level_graph.shape[0]:
+            break
+
+        # Aggregate on the refined partition, start the next level from the parents
+        parent_of_refined = np.zeros(refined.max() + 1, dtype=np.int64)
+        parent_of_refined[refined] = level_labels
+        level_graph = _aggregate(level_graph, refined)
+        membership = refined[membership]
+        level_labels = _relabel(parent_of_refined)
+
+    return _relabel(level_labels[membership])
+
+
+def label_propagation(adjacency, seed=None, max_iter=100, tolerance=1e-4):
+    """
+    Semi-synchronous label propagation on a CSR graph.
+
+    Every sweep computes, for all nodes at once, the neighbouring label with
+    the largest total edge weight (ties broken at random); a random half of
+    the nodes adopt it, which prevents two-colour oscillations.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix): Symmetric adjacency matrix
+        seed (int, optional): Random seed
+        max_iter (int): Maximum number of sweeps
+        tolerance (float): Stop once fewer than this fraction of nodes change
+
+    Returns:
+        numpy.ndarray: Community id (0..k-1) of each node
+    """
+    rng = np.random.default_rng(seed)
+    num_nodes = adjacency.shape[0]
+    labels = np.arange(num_nodes)
+    neighbours = _off_diagonal(adjacency)
+    if neighbours.nnz == 0:
+        return labels
+
+    active = np.arange(num_nodes)
+    for _ in range(max_iter):
+        position, label, weight, indptr = _community_weights(neighbours, labels, active)
+        node = active[position]
+        # Random jitter far below any weight difference breaks ties
+        score = weight + rng.random(len(weight)) * 1e-9
+        best = _row_argmax(score, indptr)
+        best_position, best_label, best_weight = position[best], label[best], weight[best]
+
+        # Keep the current label when it is already among the heaviest
+        current = np.zeros(len(active))
+        is_current = labels[node] == label
+        current[position[is_current]] = weight[is_current]
+        changing = (best_label != labels[active[best_position]]) & (best_weight > current[best_position])
+        if np.count_nonzero(changing) <= tolerance * num_nodes:
+            break
+        movers = changing & (rng.random(len(best_position)) < 0.5)
+        moved = active[best_position[movers]]
+        labels[moved] = best_label[movers]
+
+        # Only nodes next to a change (or still waiting to change) are re-evaluated
+        touched = np.zeros(num_nodes, dtype=bool)
+        touched[moved] = True
+        touched[active[best_position[changing & ~movers]]] = True
+        touched[neighbours[moved].indices] = True
+        active = np.flatnonzero(touched)
+
+    return _relabel(labels)
+
+
+def detect_communities(G, method='leiden', resolution=1.0, seed=None):
+    """
+    Partition a networkx graph with the native engine.
+
+    Args:
+        G (networkx.Graph): The graph to partition
+        method (str): 'leiden' or 'label_propagation'
+        resolution (float): Resolution parameter (leiden only)
+        seed (int, optional): Random seed
+
+    Returns:
+        dict: node -> community id, the same shape as community_louvain.best_partition
+    """
+    nodes = list(G.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = np.array([(index[u], index[v]) for u, v in G.edges()], dtype=np.int64).reshape(-1, 2)
+    adjacency = adjacency_from_arrays(edges[:, 0], edges[:, 1], len(nodes))
+
+    if method == 'leiden':
+        labels = leiden_partition(adjacency, resolution=resolution, seed=seed)
+    elif method == 'label_propagation':
+        labels = label_propagation(adjacency, seed=seed)
+    else:
+        raise ValueError(f"Unknown community detection method '{method}'")
+    return dict(zip(nodes, labels.tolist()))
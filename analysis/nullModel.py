@@ -2,15 +2,30 @@
 Null Model Analysis Module - Compare observed network patterns with null models
 """
 import networkx as nx
-import matplotlib.pyplot as plt
 import numpy as np
-import random
-from scipy import stats
+import pandas as pd
 import os
 from homophily import calculate_homophily_ratio
+from graphLoader import graph_to_arrays
+from permutationTest import empirical_p_value
+from analyticNull import shuffling_expectations, configuration_expectations, mixing_counts, z_score
+from nullSampler import NullSampler, REWIRING, SHUFFLING
+from sequentialStopping import sample_until_decided
+from resultCache import cached_analysis, output_file
+from resultSink import ResultSink
+from profiler import profiled
+from lazyImport import lazy_import
 
+# Loaded on first use (see lazyImport)
+plt = lazy_import("matplotlib.pyplot")
+stats = lazy_import("scipy.stats")
 
-def null_model_analysis(G, attribute, num_iterations=100, rewiring_iterations=10, output_dir="analysis_results", log_path=None):
+
+@profiled(category="analysis")
+@cached_analysis(draws_random=lambda G, params: params['empirical'] or params['adaptive'])
+def null_model_analysis(G, attribute, num_iterations=100, rewiring_iterations=10, output_dir="analysis_results", log_path=None,
+                        sample_interval=None, num_permutations=None, seed=None, workers=1,
+                        adaptive=False, alpha=0.05, max_iterations=10000, empirical=False):
     """
     Compare the original graph with null models.
     
@@ -21,19 +36,43 @@ def null_model_analysis(G, attribute, num_iterations=100, rewiring_iterations=10
         rewiring_iterations (int): Number of edge swaps per edge in the rewiring process
         output_dir (str): Directory to save output figures
         log_path (str): Path to the log file for results
+        sample_interval (int, optional): Swaps between consecutive rewiring samples
+            of a chain; defaults to 2 * |E|. Only the first sample of a chain needs
+            the full burn-in: after it the chain is at equilibrium, and 2 * |E| swaps
+            already leave consecutive homophily samples uncorrelated
+        num_permutations (int, optional): Number of attribute shufflings; defaults to
+            num_iterations. Permutations are batched, so thousands are cheap
+        seed (int, optional): Run seed for both null models; a fresh one is drawn
+            and logged when None
+        workers (int): Number of worker processes sampling the null models
+        adaptive (bool): Sample each null model in batches until significance at
+            alpha is decided (or max_iterations is reached) instead of using
+            num_iterations / num_permutations. Implies empirical=True
+        alpha (float): Significance level for the adaptive mode
+        max_iterations (int): Sample budget per null model in the adaptive mode
+        empirical (bool): Simulate both null models to get their empirical distributions.
+            By default no simulation runs: the rewiring model is replaced by the
+            configuration-model expectation and the attribute-shuffling model by its
+            exact moments, both with standard deviations and z-scores
+
+    All p-values are one-sided: the chance of a null homophily ratio at least as
+    high as the observed one, as in the permutation test, the adaptive stopping
+    rule and stratifiedAnalysis.
         
     Returns:
         dict: Results of null model analysis
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
+    # Adaptive stopping decides when to stop simulating, so it needs the simulation
+    empirical = empirical or adaptive
 
-    def log(message):
-        if log_path:
-            with open(log_path, "a") as f:
-                f.write(message + "\n")
+    sink = ResultSink(log_path)
+    log = sink.log
 
     log("\n--- Null Model Analysis ---")
+    if not empirical:
+        log("Null models: analytic expectations (the default; empirical=True simulates them)")
     results = {}
 
     # Original graph metrics
@@ -44,64 +83,135 @@ def null_model_analysis(G, attribute, num_iterations=100, rewiring_iterations=10
     log(f"Original homophily ratio: {original_homophily:.4f}")
     log(f"Original assortativity coefficient: {original_assortativity:.4f}")
 
-    # Storage for null model metrics
-    rewired_homophily_scores = []
-    rewired_assortativity_scores = []
-    attr_shuffled_homophily_scores = []
-    attr_shuffled_assortativity_scores = []
+    arrays = graph_to_arrays(G, attribute)
+    values = arrays['values']
+    num_values = len(values)
+    observed_mixing = mixing_counts(arrays['codes'], arrays['src'], arrays['dst'], num_values)
+    rewired_homophily_scores, rewired_assortativity_scores = [], []
+    attr_shuffled_homophily_scores, attr_shuffled_assortativity_scores = [], []
 
-    # 1. Rewiring Model (degree-preserving randomization)
-    for i in range(num_iterations):
-        if i > 0 and i % 10 == 0:
-            log(f"  Running rewiring model iteration {i}/{num_iterations}")
-        
-        # Create a copy of the original graph
-        G_rewired = G.copy()
-        
-        # Calculate number of edge swaps to perform (typically |E| * rewiring_iterations)
+    # Closed-form nulls: the configuration-model expectation for the degree-preserving
+    # model and the exact moments of the attribute permutation model
+    configuration = configuration_expectations(arrays['codes'], arrays['src'], arrays['dst'], num_values)
+    results['config_homophily'] = configuration['homophily']
+    results['config_homophily_sd'] = configuration['homophily_sd']
+    results['config_z_score'] = z_score(original_homophily, configuration['homophily'], configuration['homophily_sd'])
+    results['config_expected_mixing'] = pd.DataFrame(configuration['mixing'], index=values, columns=values)
+    results['config_mixing_z_scores'] = pd.DataFrame(
+        z_score(observed_mixing, configuration['mixing'], configuration['mixing_sd']), index=values, columns=values)
+    log(f"Configuration Model (analytic) - Expected homophily: {configuration['homophily']:.4f} "
+        f"(sd {configuration['homophily_sd']:.4f}, z = {results['config_z_score']:.2f})")
+    log(f"Configuration Model (analytic) - Expected assortativity: {configuration['assortativity']:.4f}")
+    log("\nMixing Matrix z-scores vs. configuration model:")
+    log(results['config_mixing_z_scores'].round(2).to_string())
+
+    expected = shuffling_expectations(arrays['codes'], arrays['src'], arrays['dst'], num_values)
+    results['attr_homophily_sd'] = expected['homophily_sd']
+    results['attr_z_score'] = z_score(original_homophily, expected['homophily'], expected['homophily_sd'])
+    results['attr_expected_mixing'] = pd.DataFrame(expected['mixing'], index=values, columns=values)
+    results['attr_mixing_z_scores'] = pd.DataFrame(
+        z_score(observed_mixing, expected['mixing'], expected['mixing_sd']), index=values, columns=values)
+    log(f"\nAttribute Shuffling (analytic) - Expected homophily: {expected['homophily']:.4f} "
+        f"(sd {expected['homophily_sd']:.4f}, z = {results['attr_z_score']:.2f})")
+    log(f"Attribute Shuffling (analytic) - Expected assortativity: {expected['assortativity']:.4f}")
+    log("\nMixing Matrix z-scores vs. attribute shuffling:")
+    log(results['attr_mixing_z_scores'].round(2).to_string())
+
+    if empirical:
+        # Simulated only on request, as a cross-check of the closed forms and to get
+        # the empirical distributions
         num_edge_swaps = len(G.edges()) * rewiring_iterations
-        
-        # Perform edge swaps using built-in NetworkX function
-        # This preserves the degree distribution while randomizing connections
-        nx.double_edge_swap(G_rewired, nswap=num_edge_swaps, max_tries=num_edge_swaps*10, seed=random.randint(1, 1000))
-            
-        # Calculate metrics
-        rewired_homophily_scores.append(calculate_homophily_ratio(G_rewired, attribute))
-        rewired_assortativity_scores.append(nx.attribute_assortativity_coefficient(G_rewired, attribute))
-
-    results['rewired_homophily'] = np.mean(rewired_homophily_scores)
-    results['rewired_assortativity'] = np.mean(rewired_assortativity_scores)
-    log(f"Rewiring Model - Avg homophily: {results['rewired_homophily']:.4f}")
-    log(f"Rewiring Model - Avg assortativity: {results['rewired_assortativity']:.4f}")
-
-    # 2. Attribute Shuffling Model
-    for i in range(num_iterations):
-        if i > 0 and i % 10 == 0:
-            log(f"  Running attribute shuffling iteration {i}/{num_iterations}")
-        G_shuffle = G.copy()
-        attr_values = list(nx.get_node_attributes(G, attribute).values())
-        random.shuffle(attr_values)
-        for i, node in enumerate(G_shuffle.nodes()):
-            G_shuffle.nodes[node][attribute] = attr_values[i]
-        attr_shuffled_homophily_scores.append(calculate_homophily_ratio(G_shuffle, attribute))
-        attr_shuffled_assortativity_scores.append(nx.attribute_assortativity_coefficient(G_shuffle, attribute))
-
-    results['attribute_shuffled_homophily'] = np.mean(attr_shuffled_homophily_scores)
-    results['attribute_shuffled_assortativity'] = np.mean(attr_shuffled_assortativity_scores)
-    log(f"Attribute Shuffling - Avg homophily: {results['attribute_shuffled_homophily']:.4f}")
-    log(f"Attribute Shuffling - Avg assortativity: {results['attribute_shuffled_assortativity']:.4f}")
-
-    # Statistical tests
-    results['rewired_p_value'] = stats.ttest_1samp(rewired_homophily_scores, original_homophily).pvalue
-    results['attr_p_value'] = stats.ttest_1samp(attr_shuffled_homophily_scores, original_homophily).pvalue
-    log("\nStatistical significance (p-values):")
-    log(f"Rewiring Model: {results['rewired_p_value']:.6f}")
-    log(f"Attribute Shuffling: {results['attr_p_value']:.6f}")
+        if sample_interval is None:
+            sample_interval = max(1, 2 * len(G.edges()))
+        if num_permutations is None:
+            num_permutations = num_iterations
+
+        # Both models draw from per-chunk SeedSequence streams of one run seed, so the
+        # samples are reproducible and identical for any number of workers
+        with NullSampler(arrays, burn_in=num_edge_swaps, interval=sample_interval,
+                         seed=seed, workers=workers) as sampler:
+            results['seed'] = sampler.entropy
+            log(f"\nNull model seed: {sampler.entropy} ({sampler.workers} worker(s))")
+
+            # 1. Rewiring Model (degree-preserving randomization)
+            # Swap chains on flat edge arrays: each chain is burned in with |E| * rewiring_iterations
+            # swaps, then emits a sample every sample_interval swaps without copying the graph
+            if adaptive:
+                rewired_homophily_scores, rewired_assortativity_scores, decision = sample_until_decided(
+                    sampler.rewired, original_homophily, alpha=alpha,
+                    batch_size=sampler.chunk_sizes[REWIRING], max_samples=max_iterations)
+                results['rewired_decision'] = decision
+                log(f"  Sampled {decision['samples']} rewired networks in {decision['batches']} batches "
+                    f"(stopped by {decision['stopped_by']})")
+            else:
+                rewired_homophily_scores, rewired_assortativity_scores = sampler.rewired(num_iterations)
+                log(f"  Sampled {num_iterations} rewired networks")
+            results['rewired_samples'] = len(rewired_homophily_scores)
+
+            # 2. Attribute Shuffling Model
+            # Shuffled codes for a whole batch of permutations are scored at once on the edge arrays
+            if adaptive:
+                attr_shuffled_homophily_scores, attr_shuffled_assortativity_scores, decision = sample_until_decided(
+                    sampler.shuffled, original_homophily, alpha=alpha,
+                    batch_size=sampler.chunk_sizes[SHUFFLING], max_samples=max_iterations)
+                results['attr_decision'] = decision
+                log(f"  Evaluated {decision['samples']} attribute permutations in {decision['batches']} batches "
+                    f"(stopped by {decision['stopped_by']})")
+            else:
+                attr_shuffled_homophily_scores, attr_shuffled_assortativity_scores = sampler.shuffled(num_permutations)
+                log(f"  Evaluated {num_permutations} attribute permutations")
+            results['attr_shuffled_samples'] = len(attr_shuffled_homophily_scores)
+
+        results['rewired_homophily'] = np.mean(rewired_homophily_scores)
+        results['rewired_assortativity'] = np.mean(rewired_assortativity_scores)
+        log(f"Rewiring Model - Avg homophily: {results['rewired_homophily']:.4f}")
+        log(f"Rewiring Model - Avg assortativity: {results['rewired_assortativity']:.4f}")
+        results['attribute_shuffled_homophily'] = np.mean(attr_shuffled_homophily_scores)
+        results['attribute_shuffled_assortativity'] = np.mean(attr_shuffled_assortativity_scores)
+        log(f"Attribute Shuffling - Avg homophily: {results['attribute_shuffled_homophily']:.4f}")
+        log(f"Attribute Shuffling - Avg assortativity: {results['attribute_shuffled_assortativity']:.4f}")
+    else:
+        results['rewired_homophily'] = configuration['homophily']
+        results['rewired_assortativity'] = configuration['assortativity']
+        results['attribute_shuffled_homophily'] = expected['homophily']
+        results['attribute_shuffled_assortativity'] = expected['assortativity']
+
+    # Statistical tests, all one-sided (null homophily at least the observed one)
+    log("\nStatistical significance (one-sided p-values, homophily above the null):")
+    if empirical:
+        results['rewired_p_value'] = stats.ttest_1samp(rewired_homophily_scores, original_homophily,
+                                                       alternative='less').pvalue
+        results['attr_p_value'] = stats.ttest_1samp(attr_shuffled_homophily_scores, original_homophily,
+                                                    alternative='less').pvalue
+        log(f"Rewiring Model (t-test): {results['rewired_p_value']:.6f}")
+        log(f"Attribute Shuffling (t-test): {results['attr_p_value']:.6f}")
+        results['attr_empirical_p_value'] = empirical_p_value(attr_shuffled_homophily_scores, original_homophily)
+        log(f"Attribute Shuffling (permutation, n={results['attr_shuffled_samples']}): {results['attr_empirical_p_value']:.6f}")
+    else:
+        results['rewired_p_value'] = stats.norm.sf(results['config_z_score'])
+        results['attr_p_value'] = stats.norm.sf(results['attr_z_score'])
+        log(f"Configuration Model (analytic, normal approximation): {results['rewired_p_value']:.6f}")
+        log(f"Attribute Shuffling (analytic, normal approximation): {results['attr_p_value']:.6f}")
+    if adaptive:
+        for name, key in (("Rewiring Model", 'rewired_decision'), ("Attribute Shuffling", 'attr_decision')):
+            decision = results[key]
+            verdict = "significant" if decision['significant'] else "not significant"
+            log(f"{name}: {verdict} at alpha={alpha} (one-sided) after {decision['samples']} samples "
+                f"(z={decision['z_score']:.2f}, stopped by {decision['stopped_by']})")
 
     # Plot 1: Homophily Distribution
+    # Empirical histograms when simulated, otherwise the normal approximations of the analytic nulls
     plt.figure(figsize=(10, 6))
-    plt.hist(rewired_homophily_scores, bins=30, alpha=0.6, label="Rewiring", color='skyblue', density=True)
-    plt.hist(attr_shuffled_homophily_scores, bins=30, alpha=0.6, label="Attribute Shuffling", color='lightcoral', density=True)
+    if empirical:
+        plt.hist(rewired_homophily_scores, bins=30, alpha=0.6, label="Rewiring", color='skyblue', density=True)
+        plt.hist(attr_shuffled_homophily_scores, bins=30, alpha=0.6, label="Attribute Shuffling", color='lightcoral', density=True)
+    else:
+        for mean, sd, label, color in (
+                (results['config_homophily'], results['config_homophily_sd'], "Configuration Model (analytic)", 'skyblue'),
+                (results['attribute_shuffled_homophily'], results['attr_homophily_sd'], "Attribute Shuffling (analytic)", 'lightcoral')):
+            if sd > 0:
+                grid = np.linspace(mean - 4 * sd, mean + 4 * sd, 200)
+                plt.plot(grid, stats.norm.pdf(grid, mean, sd), color=color, linewidth=2, label=label)
     plt.axvline(original_homophily, color='red', linestyle='--', linewidth=2, label=f"Original ({original_homophily:.3f})")
     plt.legend(loc='upper right', fontsize=10)
     plt.title("Homophily Ratio Distribution", fontsize=14)
@@ -109,26 +219,34 @@ def null_model_analysis(G, attribute, num_iterations=100, rewiring_iterations=10
     plt.ylabel("Density", fontsize=12)
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, "homophily_distribution.png"), dpi=300, bbox_inches='tight')
+    plt.savefig(output_file(os.path.join(output_dir, "homophily_distribution.png")), dpi=300, bbox_inches='tight')
     plt.close()
 
     # Plot 2: Assortativity Distribution
-    plt.figure(figsize=(10, 6))
-    plt.hist(rewired_assortativity_scores, bins=30, alpha=0.6, label="Rewiring", color='lightgreen', density=True)
-    plt.hist(attr_shuffled_assortativity_scores, bins=30, alpha=0.6, label="Attribute Shuffling", color='plum', density=True)
-    plt.axvline(original_assortativity, color='darkblue', linestyle='--', linewidth=2, label=f"Original ({original_assortativity:.3f})")
-    plt.legend(loc='upper right', fontsize=10)
-    plt.title("Assortativity Coefficient Distribution", fontsize=14)
-    plt.xlabel("Assortativity", fontsize=12)
-    plt.ylabel("Density", fontsize=12)
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    plt.savefig(os.path.join(output_dir, "assortativity_distribution.png"), dpi=300, bbox_inches='tight')
-    plt.close()
+    # Only for the simulated nulls: the analytic ones give no assortativity distribution
+    if empirical:
+        plt.figure(figsize=(10, 6))
+        plt.hist(rewired_assortativity_scores, bins=30, alpha=0.6, label="Rewiring", color='lightgreen', density=True)
+        plt.hist(attr_shuffled_assortativity_scores, bins=30, alpha=0.6, label="Attribute Shuffling", color='plum', density=True)
+        plt.axvline(original_assortativity, color='darkblue', linestyle='--', linewidth=2, label=f"Original ({original_assortativity:.3f})")
+        plt.legend(loc='upper right', fontsize=10)
+        plt.title("Assortativity Coefficient Distribution", fontsize=14)
+        plt.xlabel("Assortativity", fontsize=12)
+        plt.ylabel("Density", fontsize=12)
+        plt.grid(True, alpha=0.3)
+        plt.tight_layout()
+        plt.savefig(output_file(os.path.join(output_dir, "assortativity_distribution.png")), dpi=300, bbox_inches='tight')
+        plt.close()
+    elif os.path.exists(os.path.join(output_dir, "assortativity_distribution.png")):
+        # Do not leave the figure of an earlier simulated run next to these results
+        os.remove(os.path.join(output_dir, "assortativity_distribution.png"))
 
     
     # Plot comparison bar chart
-    models = ['Original', 'Rewiring', 'Attr. Shuffling']
+    if empirical:
+        models = ['Original', 'Rewiring', 'Attr. Shuffling']
+    else:
+        models = ['Original', 'Configuration (analytic)', 'Attr. Shuffling (analytic)']
     homophily_values = [original_homophily, results['rewired_homophily'], results['attribute_shuffled_homophily']]
     assortativity_values = [original_assortativity, results['rewired_assortativity'], results['attribute_shuffled_assortativity']]
     
@@ -159,7 +277,8 @@ def null_model_analysis(G, attribute, num_iterations=100, rewiring_iterations=10
     autolabel(rects2)
     
     fig.tight_layout()
-    plt.savefig(os.path.join(output_dir, "metrics_comparison_bar.png"), dpi=300, bbox_inches='tight')
+    plt.savefig(output_file(os.path.join(output_dir, "metrics_comparison_bar.png")), dpi=300, bbox_inches='tight')
     plt.close()
 
+    sink.flush()
     return results
\ No newline at end of file
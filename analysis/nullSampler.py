@@ -0,0 +1,176 @@
+"""
+Null Sampler - Reproducible, optionally parallel sampling of the null models
+
+Work is split into fixed-size chunks and every chunk draws from its own
+numpy SeedSequence stream derived from one run seed, so results are
+bit-identical for a given seed whatever the number of workers. With more
+than one worker the edge and attribute arrays are placed in shared memory
+once and every worker process attaches to them instead of receiving a
+pickled graph per task.
+"""
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from swapEngine import EdgeSwapChain
+from permutationTest import permutation_null
+from profiler import profiled
+
+REWIRING = 0
+SHUFFLING = 1
+
+# Arrays attached by each worker process (see _attach_shared_arrays)
+_worker_arrays = {}
+
+
+def chunk_seed(root, stream, index):
+    """
+    Seed for one chunk of one null model.
+
+    Derived from the root entropy and a (stream, index) spawn key, so it does
+    not depend on how many chunks were requested before.
+    """
+    return np.random.SeedSequence(root.entropy, spawn_key=tuple(root.spawn_key) + (stream, index))
+
+
+@profiled(category="null_model")
+def rewiring_chunk(src, dst, codes, num_values, num_samples, interval, burn_in, seed):
+    """Run one burned-in swap chain and return its homophily and assortativity samples."""
+    chain = EdgeSwapChain(src, dst, codes, num_values, seed=seed)
+    samples = np.array(list(chain.samples(num_samples, interval=interval, burn_in=burn_in)), dtype=float)
+    return samples[:, 0], samples[:, 1]
+
+
+@profiled(category="null_model")
+def shuffling_chunk(src, dst, codes, num_values, num_samples, seed):
+    """Evaluate one batch of attribute permutations."""
+    return permutation_null(codes, src, dst, num_values, num_samples, batch_size=num_samples, seed=seed)
+
+
+def _attach_shared_arrays(name, num_nodes, num_edges):
+    block = shared_memory.SharedMemory(name=name)
+    buffer = np.ndarray((2 * num_edges + num_nodes,), dtype=np.int64, buffer=block.buf)
+    _worker_arrays['block'] = block
+    _worker_arrays['src'] = buffer[:num_edges]
+    _worker_arrays['dst'] = buffer[num_edges:2 * num_edges]
+    _worker_arrays['codes'] = buffer[2 * num_edges:]
+
+
+def _run_shared_chunk(task):
+    kind, args = task
+    src, dst, codes = _worker_arrays['src'], _worker_arrays['dst'], _worker_arrays['codes']
+    if kind == REWIRING:
+        return rewiring_chunk(src, dst, codes, *args)
+    return shuffling_chunk(src, dst, codes, *args)
+
+
+class NullSampler:
+    """
+    Draw samples from the rewiring and attribute-shuffling null models.
+
+    Args:
+        arrays (dict): Output of graphLoader.graph_to_arrays
+        burn_in (int): Swaps before the first sample of each rewiring chain
+        interval (int): Swaps between consecutive rewiring samples
+        seed (int, optional): Run seed; a fresh one is drawn when None and
+            exposed as `entropy` so the run can be repeated
+        workers (int): Number of worker processes (1 runs in-process)
+        rewiring_chunk_size (int): Samples per independent swap chain (each
+            chain pays the burn-in once)
+        shuffling_chunk_size (int): Permutations per task
+    """
+
+    def __init__(self, arrays, burn_in, interval, seed=None, workers=1,
+                 rewiring_chunk_size=100, shuffling_chunk_size=250):
+        self.src = arrays['src']
+        self.dst = arrays['dst']
+        self.codes = arrays['codes']
+        self.num_values = len(arrays['values'])
+        self.burn_in = burn_in
+        self.interval = interval
+        self.root = np.random.SeedSequence(seed)
+        self.entropy = self.root.entropy
+        self.workers = max(1, int(workers))
+        self.chunk_sizes = {REWIRING: rewiring_chunk_size, SHUFFLING: shuffling_chunk_size}
+        self._block = None
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _start_pool(self):
+        num_nodes, num_edges = len(self.codes), len(self.src)
+        self._block = shared_memory.SharedMemory(create=True, size=max(1, (2 * num_edges + num_nodes) * 8))
+        buffer = np.ndarray((2 * num_edges + num_nodes,), dtype=np.int64, buffer=self._block.buf)
+        buffer[:num_edges] = self.src
+        buffer[num_edges:2 * num_edges] = self.dst
+        buffer[2 * num_edges:] = self.codes
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_attach_shared_arrays,
+            initargs=(self._block.name, num_nodes, num_edges),
+        )
+
+    def close(self):
+        """Shut down the worker pool and release the shared memory block."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._block is not None:
+            self._block.close()
+            self._block.unlink()
+            self._block = None
+
+    def _chunk_args(self, kind, index):
+        seed = chunk_seed(self.root, kind, index)
+        size = self.chunk_sizes[kind]
+        if kind == REWIRING:
+            return (self.num_values, size, self.interval, self.burn_in, seed)
+        return (self.num_values, size, seed)
+
+    def _sample(self, kind, num_samples, first_sample):
+        size = self.chunk_sizes[kind]
+        first_chunk = first_sample // size
+        last_chunk = (first_sample + num_samples + size - 1) // size
+        tasks = [(kind, self._chunk_args(kind, index)) for index in range(first_chunk, last_chunk)]
+
+        if self.workers == 1:
+            run = rewiring_chunk if kind == REWIRING else shuffling_chunk
+            chunks = [run(self.src, self.dst, self.codes, *args) for _, args in tasks]
+        else:
+            if self._pool is None:
+                self._start_pool()
+            chunks = list(self._pool.map(_run_shared_chunk, tasks))
+
+        offset = first_sample - first_chunk * size
+        homophily = np.concatenate([c[0] for c in chunks])[offset:offset + num_samples]
+        assortativity = np.concatenate([c[1] for c in chunks])[offset:offset + num_samples]
+        return homophily, assortativity
+
+    def rewired(self, num_samples, first_sample=0):
+        """
+        Samples from the degree-preserving rewiring model.
+
+        Args:
+            num_samples (int): Number of samples
+            first_sample (int): Index of the first sample in the run's stream
+
+        Returns:
+            tuple: (homophily ratios, assortativity coefficients)
+        """
+        return self._sample(REWIRING, num_samples, first_sample)
+
+    def shuffled(self, num_samples, first_sample=0):
+        """
+        Samples from the attribute-shuffling model.
+
+        Args:
+            num_samples (int): Number of samples
+            first_sample (int): Index of the first sample in the run's stream
+
+        Returns:
+            tuple: (homophily ratios, assortativity coefficients)
+        """
+        return self._sample(SHUFFLING, num_samples, first_sample)
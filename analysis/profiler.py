@@ -0,0 +1,213 @@
+"""
+Profiler - Opt-in timing and memory instrumentation for the pipeline and the analysis
+
+Set PROFILE_DIR (or call enable) to record a span for every instrumented
+function: wall time, CPU time, peak RSS and the number of calls. The analysis
+stages, graph loading, the null-model sampling chunks and every plt.savefig
+are instrumented. Worker processes inherit the setting and append their spans
+to PROFILE_DIR/events_<pid>.jsonl; the process that enabled profiling merges
+them at exit into trace.json (open it in chrome://tracing or
+ui.perfetto.dev) and profile_summary.csv.
+
+With PROFILE_DIR unset every hook is a no-op.
+"""
+import atexit
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+TRACE_FILE = "trace.json"
+SUMMARY_FILE = "profile_summary.csv"
+
+_events = []
+_depth = threading.local()
+
+
+def profile_dir():
+    return os.environ.get("PROFILE_DIR")
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _flush_events():
+    """Append the spans recorded by this process to its events file."""
+    global _events
+    if not _events:
+        return
+    path = os.path.join(profile_dir(), f"events_{os.getpid()}.jsonl")
+    with open(path, "a") as f:
+        f.write("".join(json.dumps(event) + "\n" for event in _events))
+    _events = []
+
+
+@contextmanager
+def span(name, category="function", **args):
+    """
+    Record the enclosed block as one trace event.
+
+    Args:
+        name (str): Event name; the summary aggregates by name
+        category (str): Event category (stage, analysis, null_model, plot, io...)
+        **args: Extra values shown with the event
+    """
+    if not profile_dir():
+        yield
+        return
+    _depth.value = getattr(_depth, "value", 0) + 1
+    start_us = time.time_ns() // 1000
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    try:
+        yield
+    finally:
+        _depth.value -= 1
+        args.update(cpu_s=time.process_time() - start_cpu, peak_rss_mb=peak_rss_mb())
+        _events.append({
+            "name": name, "cat": category, "ph": "X", "ts": start_us,
+            "dur": (time.perf_counter() - start_wall) * 1e6,
+            "pid": os.getpid(), "tid": threading.get_ident() % 2 ** 31, "args": args,
+        })
+        # Spans are written out whenever the outermost one closes, so worker
+        # processes never need to hand them back explicitly
+        if _depth.value == 0:
+            _flush_events()
+
+
+def profiled(name=None, category="function"):
+    """Decorator recording every call of a function as a span (see span)."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profile_dir():
+                return func(*args, **kwargs)
+            with span(span_name, category):
+                return func(*args, **kwargs)
+
+        return wrapper
+    return decorator
+
+
+def summarize_events(events):
+    """
+    Per-name totals of a list of trace events.
+
+    Returns:
+        list: Dicts with name, category, calls, wall_s, mean_wall_s, cpu_s and
+        max_peak_rss_mb, slowest first. Times are inclusive of nested spans.
+    """
+    totals = {}
+    for event in events:
+        row = totals.setdefault(event["name"], {"name": event["name"], "category": event["cat"], "calls": 0,
+                                                "wall_s": 0.0, "cpu_s": 0.0, "max_peak_rss_mb": None})
+        row["calls"] += 1
+        row["wall_s"] += event["dur"] / 1e6
+        row["cpu_s"] += event["args"]["cpu_s"]
+        rss = event["args"]["peak_rss_mb"]
+        if rss is not None and (row["max_peak_rss_mb"] is None or rss > row["max_peak_rss_mb"]):
+            row["max_peak_rss_mb"] = rss
+    rows = sorted(totals.values(), key=lambda row: row["wall_s"], reverse=True)
+    for row in rows:
+        row["mean_wall_s"] = row["wall_s"] / row["calls"]
+    return rows
+
+
+def export():
+    """
+    Merge the spans of all processes into the trace and the summary table.
+
+    Returns:
+        list: The summary rows (see summarize_events)
+    """
+    output_dir = profile_dir()
+    _flush_events()
+    events = []
+    for path in sorted(glob.glob(os.path.join(output_dir, "events_*.jsonl"))):
+        with open(path) as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+        os.remove(path)
+    events.sort(key=lambda event: event["ts"])
+
+    with open(os.path.join(output_dir, TRACE_FILE), "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    rows = summarize_events(events)
+    columns = ["name", "category", "calls", "wall_s", "mean_wall_s", "cpu_s", "max_peak_rss_mb"]
+    with open(os.path.join(output_dir, SUMMARY_FILE), "w") as f:
+        f.write(",".join(columns) + "\n")
+        for row in rows:
+            f.write(",".join("" if row[column] is None else str(row[column]) for column in columns) + "\n")
+
+    print(f"\nProfile ({len(events)} spans) saved to {output_dir}:")
+    print(f"{'name':40} {'calls':>6} {'wall s':>9} {'cpu s':>9} {'peak MB':>8}")
+    for row in rows[:15]:
+        rss = "" if row["max_peak_rss_mb"] is None else f"{row['max_peak_rss_mb']:.0f}"
+        print(f"{row['name'][:40]:40} {row['calls']:>6} {row['wall_s']:>9.3f} {row['cpu_s']:>9.3f} {rss:>8}")
+    return rows
+
+
+def _instrument_plotting():
+    """Record every figure rendered through plt.savefig."""
+    import matplotlib.pyplot as plt
+    if getattr(plt.savefig, "_profiled", False):
+        return
+    savefig = plt.savefig
+
+    @functools.wraps(savefig)
+    def wrapper(fname, *args, **kwargs):
+        with span("plt.savefig", "plot", file=os.path.basename(str(fname))):
+            return savefig(fname, *args, **kwargs)
+
+    wrapper._profiled = True
+    plt.savefig = wrapper
+
+
+def enable(output_dir):
+    """
+    Turn profiling on for this process and the processes it starts.
+
+    The calling process writes the trace and summary when it exits.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    os.environ["PROFILE_DIR"] = os.path.abspath(output_dir)
+    os.environ["PROFILE_OWNER"] = str(os.getpid())
+    for path in glob.glob(os.path.join(output_dir, "events_*.jsonl")):
+        os.remove(path)
+    _instrument_plotting()
+    atexit.register(_export_at_exit)
+
+
+def _export_at_exit():
+    if os.environ.get("PROFILE_OWNER") == str(os.getpid()):
+        export()
+
+
+def _reset_after_fork():
+    # Spans still buffered by the parent belong to the parent
+    global _events
+    _events = []
+    _depth.value = 0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+if profile_dir():
+    if os.environ.get("PROFILE_OWNER"):
+        _instrument_plotting()
+    else:
+        enable(profile_dir())
@@ -0,0 +1,203 @@
+"""
+Quick Look - The main metrics of a large crawl in seconds, with error bars
+
+For iterative exploration of large crawls. Everything that takes a single
+pass over the edges is computed exactly: node, edge, degree and component
+counts, the mixing matrix (see analyticNull.mixing_counts), and from it the
+homophily ratio and the E-I index of every attribute value, small groups
+included. Only the metrics that need more than the neighbourhood of every
+node are estimated:
+
+- average clustering from the triangles at a node sample stratified by the
+  attribute (every value keeps its share of the nodes);
+- average path length (and a lower bound on the diameter) of the largest
+  component from BFS runs from a few random sources.
+
+Their error bars come from a stratified bootstrap of the sampled nodes (and
+of the BFS sources), with a finite-population correction, and say how far
+each estimate is expected to be from the full run.
+"""
+import os
+import numpy as np
+import pandas as pd
+from scipy.sparse.csgraph import connected_components, shortest_path
+from graphLoader import graph_to_arrays
+from nativeCommunities import adjacency_from_arrays
+from analyticNull import mixing_counts
+from bootstrap import stratified_bootstrap_sums, stratum_sums, interval, mixing_statistics
+from resultSink import ResultSink
+from profiler import profiled
+
+def stratified_node_sample(codes, fraction, rng, min_per_stratum=2):
+    """
+    Sample nodes without replacement, keeping the share of every attribute value.
+
+    Args:
+        codes (numpy.ndarray): Attribute code of each node
+        fraction (float): Sampling fraction
+        rng (numpy.random.Generator): Random generator
+        min_per_stratum (int): Minimum sample size per value (all of its
+            nodes if it has fewer)
+
+    Returns:
+        numpy.ndarray: Sorted indices of the sampled nodes
+    """
+    sample = []
+    for code in np.unique(codes):
+        members = np.flatnonzero(codes == code)
+        size = min(len(members), max(min_per_stratum, int(round(fraction * len(members)))))
+        sample.append(rng.choice(members, size=size, replace=False))
+    return np.sort(np.concatenate(sample))
+
+
+def local_clustering(adjacency, sample):
+    """
+    Local clustering coefficient of the sampled nodes.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix): Symmetric adjacency matrix
+        sample (numpy.ndarray): Indices of the sampled nodes
+
+    Returns:
+        numpy.ndarray: Clustering of each sampled node (0 below degree 2)
+    """
+    rows = adjacency[sample]
+    degrees = np.asarray(rows.sum(axis=1)).ravel()
+    triangles = np.asarray((rows @ adjacency).multiply(rows).sum(axis=1)).ravel() / 2
+    pairs = degrees * (degrees - 1) / 2
+    return np.divide(triangles, pairs, out=np.zeros_like(triangles), where=pairs > 0)
+
+
+def path_sample(adjacency, num_sources, rng, chunk_size=16):
+    """
+    BFS distances from random sources in the largest component.
+
+    Returns:
+        dict: 'sources', per-source 'distance_sums', 'reached' and
+              'eccentricities', plus 'component_size' and 'num_components'
+    """
+    num_components, labels = connected_components(adjacency, directed=False)
+    largest = np.argmax(np.bincount(labels))
+    component = np.flatnonzero(labels == largest)
+    sources = rng.choice(component, size=min(num_sources, len(component)), replace=False)
+
+    distance_sums, eccentricities = [], []
+    for start in range(0, len(sources), chunk_size):
+        distances = shortest_path(adjacency, directed=False, unweighted=True,
+                                  indices=sources[start:start + chunk_size])[:, component]
+        distance_sums.append(distances.sum(axis=1))
+        eccentricities.append(distances.max(axis=1))
+    return {
+        'sources': sources,
+        'distance_sums': np.concatenate(distance_sums),
+        'reached': np.full(len(sources), len(component) - 1, dtype=float),
+        'eccentricities': np.concatenate(eccentricities),
+        'component_size': len(component),
+        'num_components': num_components,
+    }
+
+
+@profiled(category="analysis")
+def quick_look(G, attribute, fraction=0.1, num_sources=64, num_bootstrap=1000, confidence=0.95, seed=None,
+               output_dir="analysis_results", log_path=None):
+    """
+    Exact homophily, E-I and mixing; clustering and path statistics from a sample.
+
+    Args:
+        G (networkx.Graph): The network graph
+        attribute (str): Node attribute to analyze
+        fraction (float): Share of the nodes of every attribute value to sample
+            for the clustering
+        num_sources (int): BFS sources for the path statistics
+        num_bootstrap (int): Bootstrap replicates for the error bars
+        confidence (float): Coverage of the intervals
+        seed (int, optional): Seed for the sample and the bootstrap
+        output_dir (str): Directory for quick_look.csv and quick_look_mixing.csv
+        log_path (str): Path to the log file for results
+
+    Returns:
+        dict: 'estimates' (DataFrame: metric, estimate, se, ci_low, ci_high,
+              method: 'exact', 'sample' or 'lower_bound'), 'mixing'
+              (DataFrame), 'sample_size'
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    sink = ResultSink(log_path)
+    log = sink.log
+    log(f"\n--- Quick Look ({attribute}, {fraction:.0%} node sample) ---")
+
+    rng = np.random.default_rng(seed)
+    arrays = graph_to_arrays(G, attribute)
+    values, codes = arrays['values'], arrays['codes']
+    num_nodes, num_edges, num_values = len(codes), len(arrays['src']), len(values)
+    adjacency = adjacency_from_arrays(arrays['src'], arrays['dst'], num_nodes)
+
+    counts = mixing_counts(codes, arrays['src'], arrays['dst'], num_values)
+    statistics = mixing_statistics(counts)
+
+    sample = stratified_node_sample(codes, fraction, rng)
+    strata = codes[sample]
+    # Every sampled node stands for weight nodes of its value
+    weights = np.bincount(codes, minlength=num_values) / np.maximum(np.bincount(strata, minlength=num_values), 1)
+    clustering = local_clustering(adjacency, sample)[:, None]
+    clustering_sums = stratum_sums(strata, clustering)[:, 0]
+    replicate_sums = stratified_bootstrap_sums(strata, clustering, num_bootstrap, seed=rng)[..., 0]
+    node_shrink = np.sqrt(1 - len(sample) / num_nodes)
+
+    rows = []
+
+    def add(metric, estimate, replicate_values=None, shrink=1.0, method="exact"):
+        if replicate_values is None:
+            rows.append({'metric': metric, 'estimate': estimate, 'se': 0.0, 'ci_low': estimate,
+                         'ci_high': estimate, 'method': method})
+        else:
+            se, low, high = interval(estimate, replicate_values, confidence, shrink)
+            rows.append({'metric': metric, 'estimate': float(estimate), 'se': float(se), 'ci_low': float(low),
+                         'ci_high': float(high), 'method': 'sample'})
+
+    degrees = arrays['degrees']
+    add('nodes', num_nodes)
+    add('edges', num_edges)
+    add('density', 2 * num_edges / (num_nodes * (num_nodes - 1)) if num_nodes > 1 else 0.0)
+    add('avg_degree', float(degrees.mean()))
+    add('max_degree', int(degrees.max()))
+    add('homophily_ratio', float(statistics['homophily_ratio']))
+    for k, value in enumerate(values):
+        add(f"ei_index[{value}]", float(statistics['ei_indices'][k]))
+    add('avg_clustering', clustering_sums @ weights / num_nodes, replicate_sums @ weights / num_nodes, node_shrink)
+
+    if num_edges:
+        paths = path_sample(adjacency, num_sources, rng)
+        path_values = np.stack([paths['distance_sums'], paths['reached']], axis=1)
+        source_strata = np.zeros(len(paths['sources']), dtype=np.int64)
+        path_sums = stratified_bootstrap_sums(source_strata, path_values, num_bootstrap, seed=rng)[:, 0]
+        source_shrink = np.sqrt(1 - len(paths['sources']) / paths['component_size'])
+        add('num_components', paths['num_components'])
+        add('largest_component_size', paths['component_size'])
+        add('avg_path_length_lcc', paths['distance_sums'].sum() / paths['reached'].sum(),
+            path_sums[:, 0] / path_sums[:, 1], source_shrink)
+        # Eccentricity of the farthest-reaching source; the diameter can only be larger
+        add('diameter_lcc_lower_bound', float(paths['eccentricities'].max()), method='lower_bound')
+
+    table = pd.DataFrame(rows, columns=['metric', 'estimate', 'se', 'ci_low', 'ci_high', 'method'])
+    mixing = pd.DataFrame(counts, index=values, columns=values)
+
+    table.to_csv(os.path.join(output_dir, "quick_look.csv"), index=False)
+    mixing.to_csv(os.path.join(output_dir, "quick_look_mixing.csv"))
+
+    log(f"Sampled {len(sample)} of {num_nodes} nodes; {num_bootstrap} bootstrap replicates, "
+        f"{confidence:.0%} intervals (expected range of the full-run value)")
+    for row in rows:
+        if row['method'] == 'exact':
+            log(f"{row['metric']}: {row['estimate']:.6g} (exact)")
+        elif row['method'] == 'lower_bound':
+            log(f"{row['metric']}: {row['estimate']:.6g} (lower bound)")
+        else:
+            log(f"{row['metric']}: {row['estimate']:.4f} ± {row['se']:.4f} "
+                f"[{row['ci_low']:.4f}, {row['ci_high']:.4f}]")
+    log("\nMixing matrix:")
+    log(mixing.to_string())
+
+    sink.flush()
+    return {'estimates': table, 'mixing': mixing, 'sample_size': len(sample)}
@@ -0,0 +1,221 @@
+"""
+Result Cache - On-disk memoisation of the analysis stages
+
+A cached stage is keyed by the content of the graph (nodes, attributes and
+edges), the stage function, the source of its module and of the local
+modules it imports, and every argument (attribute, parameters, seed,
+output folder). A hit returns the stored result and replays the lines the
+stage wrote to its log, as long as the files it reported (see output_file)
+are still there. Entries live under ANALYSIS_CACHE_DIR and the least
+recently used ones are evicted once the cache grows past
+ANALYSIS_CACHE_MAX_MB.
+
+Set ANALYSIS_CACHE=off to disable it. A call that draws random numbers with
+seed=None is never cached, so re-running it gives a fresh draw; pass a seed
+(runner.py --seed N) to cache and reproduce it.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import re
+import tempfile
+import weakref
+
+CACHE_DIR = os.environ.get("ANALYSIS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+MAX_CACHE_BYTES = int(float(os.environ.get("ANALYSIS_CACHE_MAX_MB", 1024)) * 1024 * 1024)
+
+_graph_digests = weakref.WeakKeyDictionary()
+_code_digests = {}
+_module_sources = {}
+# "from a.b import c" (group 1) or "import a.b as c, d" (group 2)
+_IMPORT_LINE = re.compile(r"^\s*(?:from\s+([\w.]+)\s+import\b|import\s+([\w.]+(?:[ \t]+as[ \t]+\w+)?(?:[ \t]*,[ \t]*[\w.]+(?:[ \t]+as[ \t]+\w+)?)*))", re.M)
+# Output files of the cached stages running in this process (see output_file)
+_recorders = []
+
+
+def cache_enabled():
+    return os.environ.get("ANALYSIS_CACHE", "on").lower() not in ("0", "off", "false", "no")
+
+
+def graph_digest(G):
+    """
+    Content hash of a graph: sorted nodes with their attributes and sorted edges.
+
+    Computed once per graph object; the analysis stages never modify the graph.
+    """
+    if G in _graph_digests:
+        return _graph_digests[G]
+    digest = hashlib.sha256()
+    digest.update(b"directed" if G.is_directed() else b"undirected")
+    for node, data in sorted(G.nodes(data=True), key=lambda item: str(item[0])):
+        digest.update(json.dumps([str(node), sorted((k, str(v)) for k, v in data.items())]).encode())
+    edges = sorted(tuple(sorted((str(u), str(v)))) for u, v in G.edges())
+    digest.update(json.dumps(edges).encode())
+    _graph_digests[G] = digest.hexdigest()
+    return _graph_digests[G]
+
+
+def _module_source(path):
+    """
+    Source of a module and the modules it imports from its own folder.
+
+    Read once per process; the stages share most of their imports. Import
+    lines are matched textually, which is much cheaper than parsing and at
+    worst hashes a module that is only mentioned in a string.
+    """
+    if path in _module_sources:
+        return _module_sources[path]
+    folder = os.path.dirname(path)
+    with open(path, "rb") as f:
+        source = f.read()
+    imports = []
+    for module, names in _IMPORT_LINE.findall(source.decode("utf-8", "replace")):
+        for name in [module] if module else names.split(","):
+            local = os.path.join(folder, name.split()[0].split(".")[0] + ".py")
+            if os.path.isfile(local):
+                imports.append(local)
+    _module_sources[path] = (source, imports)
+    return _module_sources[path]
+
+
+def code_digest(path):
+    """Hash of a module's source and, recursively, of the modules it imports from its own folder."""
+    if path in _code_digests:
+        return _code_digests[path]
+    seen = set()
+    pending = [path]
+    digest = hashlib.sha256()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        source, imports = _module_source(current)
+        digest.update(os.path.basename(current).encode() + source)
+        pending.extend(imports)
+    _code_digests[path] = digest.hexdigest()
+    return _code_digests[path]
+
+
+def _entry_path(name, key):
+    return os.path.join(CACHE_DIR, name, key[:2], key + ".pkl")
+
+
+def _evict(max_bytes=MAX_CACHE_BYTES):
+    """Delete the least recently used entries until the cache fits in max_bytes."""
+    entries = []
+    for folder, _, files in os.walk(CACHE_DIR):
+        for file in files:
+            if file.endswith(".pkl"):
+                path = os.path.join(folder, file)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(path)
+        total -= size
+
+
+def output_file(path):
+    """
+    Report a file written by the running stage, e.g. plt.savefig(output_file(path)).
+
+    The cache only checks the files a stage reported, so stages sharing an
+    output folder (and their temporary logs) do not end up in each other's
+    entries.
+
+    Args:
+        path (str): File the stage is about to write
+
+    Returns:
+        str: The same path
+    """
+    for files in _recorders:
+        files.append(path)
+    return path
+
+
+def cached_analysis(default_log=None, overwrites_log=False, draws_random=None):
+    """
+    Decorator memoising an analysis stage called as func(G, ...).
+
+    Args:
+        default_log (str, optional): Log file name inside output_dir used when
+            the stage is called without log_path
+        overwrites_log (bool): The stage truncates its log instead of appending
+        draws_random (callable, optional): draws_random(G, params) tells whether
+            a call uses its seed; by default every call of a stage with a seed
+            parameter does. Such calls are not cached when seed is None
+
+    Returns:
+        callable: The decorator
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        source_file = inspect.getsourcefile(func)
+        seeded = 'seed' in signature.parameters
+
+        @functools.wraps(func)
+        def wrapper(G, *args, **kwargs):
+            if not cache_enabled():
+                return func(G, *args, **kwargs)
+
+            bound = signature.bind(G, *args, **kwargs)
+            bound.apply_defaults()
+            params = {name: value for name, value in bound.arguments.items() if name not in ('G', 'log_path')}
+            if seeded and params['seed'] is None and (draws_random is None or draws_random(G, params)):
+                # A fresh random draw every time, as without the cache
+                return func(G, *args, **kwargs)
+            output_dir = params.get('output_dir')
+            log_path = bound.arguments.get('log_path')
+            if log_path is None and default_log and output_dir:
+                log_path = os.path.join(output_dir, default_log)
+
+            key = hashlib.sha256(json.dumps(
+                [func.__qualname__, graph_digest(G), code_digest(source_file), params],
+                sort_keys=True, default=repr).encode()).hexdigest()
+            path = _entry_path(func.__name__, key)
+
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    entry = pickle.load(f)
+                if all(os.path.exists(os.path.join(output_dir, name)) for name in entry['files']):
+                    os.utime(path)
+                    if log_path:
+                        with open(log_path, "w" if overwrites_log else "a") as log:
+                            log.write(entry['log'])
+                    return entry['result']
+
+            log_offset = 0
+            if log_path and not overwrites_log and os.path.exists(log_path):
+                log_offset = os.path.getsize(log_path)
+            files = []
+            _recorders.append(files)
+            try:
+                result = func(G, *args, **kwargs)
+            finally:
+                _recorders.remove(files)
+
+            log_text = ""
+            if log_path and os.path.exists(log_path):
+                with open(log_path) as log:
+                    log.seek(log_offset)
+                    log_text = log.read()
+            entry = {'result': result, 'log': log_text, 'files': sorted(set(os.path.relpath(file, output_dir) for file in files))}
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp:
+                    pickle.dump(entry, tmp)
+                os.replace(tmp.name, path)
+                _evict()
+            except (OSError, pickle.PicklingError, TypeError) as e:
+                print(f"Could not cache {func.__name__}: {e}")
+            return result
+
+        return wrapper
+    return decorator
@@ -0,0 +1,141 @@
+"""
+Result Sink - Buffered text reports and machine-readable results
+
+The analysis stages collect their report lines in a ResultSink and write them
+in one go when they finish, instead of reopening the log file for every line.
+write_results stores the results of a whole run as JSON, plus a long table of
+its scalar metrics (Parquet when an engine is installed, CSV otherwise), so
+datasets can be compared later without re-running the analysis or parsing
+network_analysis.txt.
+"""
+import json
+import math
+import os
+import numpy as np
+from lazyImport import lazy_import
+
+# Loaded on first use, so reading saved results does not pay for pandas
+pd = lazy_import("pandas")
+
+RESULTS_FILE = "results.json"
+METRICS_FILE = "results_metrics"
+
+
+class ResultSink:
+    """
+    Buffer of report lines for one log file.
+
+    Used as log = ResultSink(log_path).log inside a stage (flush() before
+    returning), or as a file-like context manager that is flushed on exit.
+
+    Args:
+        log_path (str, optional): Log file; nothing is written when None
+        mode (str): 'a' to append to the file, 'w' to overwrite it
+    """
+
+    def __init__(self, log_path=None, mode="a"):
+        self.log_path = log_path
+        self.mode = mode
+        self.chunks = []
+
+    def log(self, message):
+        self.chunks.append(str(message) + "\n")
+
+    def write(self, text):
+        self.chunks.append(text)
+
+    def flush(self):
+        if self.log_path and (self.chunks or self.mode == "w"):
+            with open(self.log_path, self.mode) as f:
+                f.write("".join(self.chunks))
+        self.chunks = []
+        self.mode = "a"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+
+def to_jsonable(value):
+    """
+    Convert analysis results (numpy values, arrays, DataFrames) to JSON types.
+
+    DataFrames use pandas' 'split' layout (index, columns, data); NaN and
+    infinite floats become None.
+    """
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(to_jsonable(item) for item in value)
+    if isinstance(value, pd.DataFrame):
+        return to_jsonable(value.to_dict(orient="split"))
+    if isinstance(value, pd.Series):
+        return to_jsonable(value.to_dict())
+    if isinstance(value, np.ndarray):
+        return to_jsonable(value.tolist())
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def scalar_metrics(results):
+    """
+    Long table of the scalar metrics of a run.
+
+    Args:
+        results (dict): Return value of run_analysis
+
+    Returns:
+        pandas.DataFrame: One row per (stage, metric) with a numeric value
+    """
+    rows = []
+    for stage, stage_results in results.items():
+        if not isinstance(stage_results, dict):
+            continue
+        for metric, value in stage_results.items():
+            if isinstance(value, np.generic):
+                value = value.item()
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                rows.append({'attribute': results.get('attribute'), 'stage': stage, 'metric': metric,
+                             'value': float(value)})
+    return pd.DataFrame(rows, columns=['attribute', 'stage', 'metric', 'value'])
+
+
+def write_results(results, output_dir):
+    """
+    Save the results of a run next to its text report.
+
+    Args:
+        results (dict): Return value of run_analysis
+        output_dir (str): Results folder
+
+    Returns:
+        str: Path of the JSON file
+    """
+    json_path = os.path.join(output_dir, RESULTS_FILE)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(to_jsonable(results), f, indent=2)
+
+    metrics = scalar_metrics(results)
+    try:
+        metrics.to_parquet(os.path.join(output_dir, METRICS_FILE + ".parquet"), index=False)
+    except ImportError:
+        metrics.to_csv(os.path.join(output_dir, METRICS_FILE + ".csv"), index=False)
+    return json_path
+
+
+def load_results(output_dir):
+    """Results saved by write_results, None if the folder has none."""
+    json_path = os.path.join(output_dir, RESULTS_FILE)
+    if not os.path.exists(json_path):
+        return None
+    with open(json_path, encoding="utf-8") as f:
+        return json.load(f)
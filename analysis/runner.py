@@ -1,36 +1,237 @@
 # analysis_runner.py
 
+from concurrent.futures import ProcessPoolExecutor
+import importlib
+import inspect
 import os
 import sys
-from graphLoader import load_graph, validate_graph, ensure_output_directory
-from basicAnalysis import analyze_network
-from homophily import homophily_analysis
-from nullModel import null_model_analysis
-from communityDetenction import community_detection
+from profiler import span
 
-def run_analysis(graph_path, attribute):
+# Analysis stages in report order, as (stage, module, function). Each one only
+# reads the graph, so they can run concurrently; every stage logs to its own
+# file and the files are concatenated in this order afterwards. The modules
+# (and graphLoader, which pulls in networkx) are imported when a run starts,
+# so printing the usage does not load the plotting and statistics stack.
+STAGES = (
+    ('basic', 'basicAnalysis', 'analyze_network'),
+    ('homophily', 'homophily', 'homophily_analysis'),
+    ('null_model', 'nullModel', 'null_model_analysis'),
+    ('community', 'communityDetenction', 'community_detection'),
+    ('centrality', 'centrality', 'centrality_analysis'),
+    ('soft_homophily', 'softHomophily', 'soft_homophily_analysis'),
+)
+
+# Slowest stages first, so they start as early as possible
+STAGE_PRIORITY = ('null_model', 'community', 'basic', 'centrality', 'soft_homophily', 'homophily')
+
+# Graphs held by each worker process (see _set_worker_graphs)
+_worker_graphs = {}
+
+
+def _set_worker_graphs(graphs):
+    _worker_graphs.update(graphs)
+
+
+def _stage_log_path(output_dir, stage):
+    return os.path.join(output_dir, f".{stage}.log")
+
+
+def _stage_function(stage):
+    for name, module, function in STAGES:
+        if name == stage:
+            return getattr(importlib.import_module(module), function)
+    raise ValueError(f"Unknown stage '{stage}'")
+
+
+def _run_stage(task):
+    graph_path, attribute, stage, output_dir, options, seed = task
+    G = _worker_graphs[graph_path]
+    log_path = _stage_log_path(output_dir, stage)
+    analysis = _stage_function(stage)
+    options = dict(options)
+    if seed is not None and 'seed' in inspect.signature(analysis).parameters:
+        options.setdefault('seed', seed)
+    with span(f"stage {stage}", "stage", graph=graph_path, attribute=attribute):
+        if stage == 'soft_homophily':
+            return analysis(G, fallback_attribute=attribute, output_dir=output_dir, log_path=log_path, **options)
+        return analysis(G, attribute=attribute, output_dir=output_dir, log_path=log_path, **options)
+
+
+def _output_subfolder(attribute):
     if attribute == "main_genre":
-        subfolder = "genre"
+        return "genre"
     elif attribute == "major_label":
-        subfolder = "labels"
+        return "labels"
+    print(f"Error: Unsupported attribute '{attribute}'. Use 'main_genre' or 'major_label'.")
+    return None
+
+
+def run_analyses(jobs, workers=1, stage_options=None, seed=None):
+    """
+    Run the analysis stages of several (graph, attribute) jobs.
+
+    Every distinct graph file is loaded once. With workers > 1 the graphs are
+    handed to a process pool once per worker (inherited without copying where
+    processes are forked) and all stages of all jobs run concurrently. Each
+    stage writes its own log, and the logs are merged into
+    network_analysis.txt in STAGES order, so the report does not depend on
+    which stage finishes first. The results themselves are saved to
+    results.json (see resultSink.write_results).
+
+    Args:
+        jobs (list): (graph_path, attribute, output_root) tuples
+        workers (int, optional): Worker processes; 1 runs the stages in this
+            process, None uses the CPU count
+        stage_options (dict, optional): Extra keyword arguments per stage,
+            e.g. {'community': {'backend': 'native'}}
+        seed (int, optional): Seed for every stage that draws random numbers;
+            with None each run draws afresh and those stages bypass the result cache
+
+    Returns:
+        list: run_analysis results for each job (None for jobs that could not run)
+    """
+    from graphLoader import load_graph, validate_graph, ensure_output_directory
+    from resultSink import write_results
+
+    graphs = {}
+    tasks = []
+    results = []
+    for graph_path, attribute, output_root in jobs:
+        subfolder = _output_subfolder(attribute)
+        if subfolder is None:
+            results.append(None)
+            continue
+        if graph_path not in graphs:
+            graphs[graph_path] = load_graph(graph_path)
+        G = graphs[graph_path]
+        if G is None or not validate_graph(G, required_attribute=attribute):
+            print("Graph validation failed. Exiting.")
+            results.append(None)
+            continue
+
+        output_dir = ensure_output_directory(os.path.join(output_root, subfolder))
+        stages = [stage for stage, _, _ in STAGES if stage != 'soft_homophily']
+        # Graphs built from Last.fm genre weights (see genreGraph.py) also get the soft analysis
+        if attribute == "main_genre" and any("genre_weights" in data for _, data in G.nodes(data=True)):
+            stages.append('soft_homophily')
+        for stage in stages:
+            options = tuple(sorted((stage_options or {}).get(stage, {}).items()))
+            tasks.append((graph_path, attribute, stage, output_dir, options, seed))
+        results.append({'attribute': attribute, 'output_dir': output_dir})
+
+    ordered = sorted(tasks, key=lambda task: STAGE_PRIORITY.index(task[2]))
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tasks)))
+    if workers == 1:
+        _set_worker_graphs(graphs)
+        outputs = {task: _run_stage(task) for task in ordered}
+        _worker_graphs.clear()
     else:
-        print(f"Error: Unsupported attribute '{attribute}'. Use 'main_genre' or 'major_label'.")
-        return
+        with ProcessPoolExecutor(max_workers=workers, initializer=_set_worker_graphs, initargs=(graphs,)) as pool:
+            outputs = dict(zip(ordered, pool.map(_run_stage, ordered)))
+
+    for result in results:
+        if result is None:
+            continue
+        output_dir = result['output_dir']
+        stage_outputs = {task[2]: output for task, output in outputs.items() if task[3] == output_dir}
+        with open(os.path.join(output_dir, "network_analysis.txt"), "w") as report:
+            for stage, _, _ in STAGES:
+                if stage not in stage_outputs:
+                    continue
+                result[stage] = stage_outputs[stage]
+                stage_log = _stage_log_path(output_dir, stage)
+                if os.path.exists(stage_log):
+                    with open(stage_log) as f:
+                        report.write(f.read())
+                    os.remove(stage_log)
+        write_results(result, output_dir)
+        print(f"\nAnalysis complete for attribute '{result['attribute']}'. Results saved to: {output_dir}")
+    return results
+
+
+def run_analysis(graph_path, attribute, output_root="analysis_results", workers=1, stage_options=None, seed=None):
+    """
+    Run every analysis stage on one graph for one attribute.
 
-    output_dir = ensure_output_directory(os.path.join("analysis_results", subfolder))
+    Args:
+        graph_path (str): Path to the graph file
+        attribute (str): 'main_genre' or 'major_label'
+        output_root (str): Folder in which the genre/ or labels/ results folder is created
+        workers (int, optional): Worker processes for the stages (see run_analyses)
+        stage_options (dict, optional): Extra keyword arguments per stage (see run_analyses)
+        seed (int, optional): Seed for the randomised stages (see run_analyses)
+
+    Returns:
+        dict: Results of each stage ('basic', 'homophily', 'null_model',
+              'community', 'centrality' and, when available, 'soft_homophily') plus
+              'attribute' and 'output_dir'; None if the analysis could not run
+    """
+    return run_analyses([(graph_path, attribute, output_root)], workers=workers, stage_options=stage_options,
+                        seed=seed)[0]
+
+
+def run_stratified_analysis(graph_path, attributes=("main_genre", "major_label")):
+    from graphLoader import load_graph, validate_graph, ensure_output_directory
+    from stratifiedAnalysis import stratified_analysis
+
+    output_dir = ensure_output_directory(os.path.join("analysis_results", "stratified"))
     log_path = os.path.join(output_dir, "network_analysis.txt")
 
     G = load_graph(graph_path)
-    if not validate_graph(G, required_attribute=attribute):
-        print("Graph validation failed. Exiting.")
+    if not all(validate_graph(G, required_attribute=attribute) for attribute in attributes):
+        print("Graph validation failed (the graph needs both attributes, see labelsGraph.py). Exiting.")
         return
 
-    analyze_network(G, attribute=attribute, output_dir=output_dir)
-    homophily_analysis(G, attribute=attribute, output_dir=output_dir, log_path=log_path)
-    null_model_analysis(G, attribute=attribute, output_dir=output_dir, log_path=log_path)
-    community_detection(G, attribute=attribute, output_dir=output_dir, log_path=log_path)
+    stratified_analysis(G, attributes=attributes, output_dir=output_dir, log_path=log_path)
+
+    print(f"\nStratified analysis complete for {' x '.join(attributes)}. Results saved to: {output_dir}")
+
 
-    print(f"\nAnalysis complete for attribute '{attribute}'. Results saved to: {output_dir}")
+def run_quick_look(graph_path, attribute, fraction=0.1, seed=None):
+    from graphLoader import load_graph, validate_graph, ensure_output_directory
+    from quickLook import quick_look
+
+    subfolder = _output_subfolder(attribute)
+    if subfolder is None:
+        return None
+    output_dir = ensure_output_directory(os.path.join("analysis_results", "quick_look", subfolder))
+    log_path = os.path.join(output_dir, "quick_look.txt")
+    if os.path.exists(log_path):
+        os.remove(log_path)
+
+    G = load_graph(graph_path)
+    if G is None or not validate_graph(G, required_attribute=attribute):
+        print("Graph validation failed. Exiting.")
+        return None
+
+    results = quick_look(G, attribute, fraction=fraction, seed=seed, output_dir=output_dir, log_path=log_path)
+
+    print(f"\nQuick look complete for attribute '{attribute}' ({fraction:.0%} sample). Results saved to: {output_dir}")
+    return results
+
+
+def run_resolution_sweep(graph_path, attribute, num_seeds=10, seed=None):
+    from graphLoader import load_graph, validate_graph, ensure_output_directory
+    from resolutionSweep import resolution_sweep
+
+    subfolder = _output_subfolder(attribute)
+    if subfolder is None:
+        return None
+    output_dir = ensure_output_directory(os.path.join("analysis_results", "resolution_sweep", subfolder))
+    log_path = os.path.join(output_dir, "resolution_sweep.txt")
+    if os.path.exists(log_path):
+        os.remove(log_path)
+
+    G = load_graph(graph_path)
+    if G is None or not validate_graph(G, required_attribute=attribute):
+        print("Graph validation failed. Exiting.")
+        return None
+
+    results = resolution_sweep(G, attribute, num_seeds=num_seeds, seed=seed, output_dir=output_dir,
+                               log_path=log_path)
+
+    print(f"\nResolution sweep complete for attribute '{attribute}'. Results saved to: {output_dir}")
+    return results
 
 
 if __name__ == "__main__":
@@ -42,21 +243,67 @@ if __name__ == "__main__":
         else:
             return None
 
-    if len(sys.argv) == 2:
+    # Partition with the array-based engine instead of python-louvain (see nativeCommunities)
+    stage_options = {}
+    if "--native-communities" in sys.argv:
+        sys.argv.remove("--native-communities")
+        stage_options['community'] = {'backend': 'native'}
+    # A fixed seed makes the run reproducible and lets the result cache serve its randomised stages
+    seed = None
+    if "--seed" in sys.argv[:-1]:
+        position = sys.argv.index("--seed")
+        seed = int(sys.argv[position + 1])
+        del sys.argv[position:position + 2]
+
+    if len(sys.argv) == 2 and sys.argv[1] in ("-h", "--help"):
+        print("Usage: python runner.py [--native-communities] [--seed N] "
+              "[attribute | stratified | quick attribute [fraction] | sweep attribute [seeds]]")
+        print("Accepted attributes: 'main_genre', 'major_label'")
+
+    elif len(sys.argv) == 2 and sys.argv[1] == "stratified":
+        # The label graph carries main_genre as well
+        run_stratified_analysis(get_graph_path("major_label"))
+
+    elif len(sys.argv) in (3, 4) and sys.argv[1] == "quick":
+        # Sample-based estimates with error bars, for a first look at large graphs
+        attribute = sys.argv[2]
+        graph_file = get_graph_path(attribute)
+        if graph_file:
+            run_quick_look(graph_file, attribute, fraction=float(sys.argv[3]) if len(sys.argv) == 4 else 0.1,
+                           seed=seed)
+        else:
+            print(f"Error: Unsupported attribute '{attribute}'. Use 'main_genre' or 'major_label'.")
+            sys.exit(1)
+
+    elif len(sys.argv) in (3, 4) and sys.argv[1] == "sweep":
+        # NMI / ARI / modularity of Louvain across resolutions and seeds, with consensus partitions
+        attribute = sys.argv[2]
+        graph_file = get_graph_path(attribute)
+        if graph_file:
+            run_resolution_sweep(graph_file, attribute, num_seeds=int(sys.argv[3]) if len(sys.argv) == 4 else 10,
+                                 seed=seed)
+        else:
+            print(f"Error: Unsupported attribute '{attribute}'. Use 'main_genre' or 'major_label'.")
+            sys.exit(1)
+
+    elif len(sys.argv) == 2:
         attribute = sys.argv[1]
         graph_file = get_graph_path(attribute)
         if graph_file:
-            run_analysis(graph_file, attribute)
+            run_analysis(graph_file, attribute, workers=None, stage_options=stage_options, seed=seed)
         else:
             print(f"Error: Unsupported attribute '{attribute}'. Use 'main_genre' or 'major_label'.")
             sys.exit(1)
 
     elif len(sys.argv) == 1:
         print("No attribute specified. Running analysis for both 'main_genre' and 'major_label'.\n")
-        run_analysis(get_graph_path("main_genre"), "main_genre")
-        run_analysis(get_graph_path("major_label"), "major_label")
+        # Both graphs are loaded once and all their stages share one process pool
+        run_analyses([(get_graph_path("main_genre"), "main_genre", "analysis_results"),
+                      (get_graph_path("major_label"), "major_label", "analysis_results")], workers=None,
+                     stage_options=stage_options, seed=seed)
 
     else:
-        print("Usage: python runner.py [attribute]")
+        print("Usage: python runner.py [--native-communities] [--seed N] "
+              "[attribute | stratified | quick attribute [fraction] | sweep attribute [seeds]]")
         print("Accepted attributes: 'main_genre', 'major_label'")
         sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Sequential Stopping - Adaptive sample sizes for the null models
+
+Null samples are drawn in batches until either the empirical p-value or the
+z-score of the observed homophily is known precisely enough to decide at
+the requested alpha, or the sample budget runs out.
+"""
+import numpy as np
+from lazyImport import lazy_import
+
+# Loaded on first use (see lazyImport)
+stats = lazy_import("scipy.stats")
+
+
+def p_value_interval(exceed, num_samples, confidence=0.99):
+    """
+    Clopper-Pearson interval for the tail probability of the null.
+
+    Args:
+        exceed (int): Null samples at least as extreme as the observation
+        num_samples (int): Number of null samples
+        confidence (float): Confidence level of the interval
+
+    Returns:
+        tuple: (lower, upper) bounds
+    """
+    tail = (1 - confidence) / 2
+    lower = stats.beta.ppf(tail, exceed, num_samples - exceed + 1) if exceed > 0 else 0.0
+    upper = stats.beta.ppf(1 - tail, exceed + 1, num_samples - exceed) if exceed < num_samples else 1.0
+    return float(lower), float(upper)
+
+
+def z_score_interval(null_scores, observed, confidence=0.99):
+    """
+    Approximate interval for the z-score of an observation against the null.
+
+    Uses the large-sample standard error of (observed - mean) / sd, which
+    accounts for the uncertainty of both the mean and the standard deviation.
+
+    Args:
+        null_scores (numpy.ndarray): Samples from the null model
+        observed (float): Observed statistic
+        confidence (float): Confidence level of the interval
+
+    Returns:
+        tuple: (z, lower, upper); all NaN if the null has no spread
+    """
+    n = len(null_scores)
+    sd = np.std(null_scores, ddof=1) if n > 1 else 0.0
+    if sd == 0:
+        return np.nan, np.nan, np.nan
+    z = (observed - np.mean(null_scores)) / sd
+    se = np.sqrt(1.0 / n + z ** 2 / (2.0 * (n - 1)))
+    half = stats.norm.ppf(1 - (1 - confidence) / 2) * se
+    return float(z), float(z - half), float(z + half)
+
+
+def sample_until_decided(draw, observed, alpha=0.05, batch_size=50, max_samples=10000, confidence=0.99):
+    """
+    Draw null samples in batches until significance at alpha is decided.
+
+    Stops when the Clopper-Pearson interval of the one-sided p-value lies
+    entirely below or above alpha, or when the z-score interval lies
+    entirely beyond or within the one-sided critical value.
+
+    Args:
+        draw (callable): draw(num_samples, first_sample) -> (homophily, assortativity)
+        observed (float): Observed homophily ratio
+        alpha (float): Significance level to decide at
+        batch_size (int): Samples drawn per batch
+        max_samples (int): Sample budget
+        confidence (float): Confidence level of the stopping intervals
+
+    Returns:
+        tuple: (homophily samples, assortativity samples, decision dict with
+                'samples', 'batches', 'significant', 'stopped_by', 'p_value',
+                'p_interval', 'z_score', 'z_interval')
+    """
+    z_critical = stats.norm.ppf(1 - alpha)
+    homophily_batches = []
+    assortativity_batches = []
+    num_samples = 0
+    decision = {}
+
+    while num_samples < max_samples:
+        size = min(batch_size, max_samples - num_samples)
+        homophily, assortativity = draw(size, num_samples)
+        homophily_batches.append(homophily)
+        assortativity_batches.append(assortativity)
+        num_samples += size
+
+        scores = np.concatenate(homophily_batches)
+        exceed = int(np.count_nonzero(scores >= observed))
+        p_low, p_high = p_value_interval(exceed, num_samples, confidence)
+        z, z_low, z_high = z_score_interval(scores, observed, confidence)
+        decision = {
+            'samples': num_samples,
+            'batches': len(homophily_batches),
+            'p_value': (exceed + 1) / (num_samples + 1),
+            'p_interval': (p_low, p_high),
+            'z_score': z,
+            'z_interval': (z_low, z_high),
+            'significant': None,
+            'stopped_by': 'budget',
+        }
+
+        if p_high < alpha or p_low > alpha:
+            decision['significant'] = bool(p_high < alpha)
+            decision['stopped_by'] = 'p_value'
+            break
+        if not np.isnan(z) and (z_low > z_critical or z_high < z_critical):
+            decision['significant'] = bool(z_low > z_critical)
+            decision['stopped_by'] = 'z_score'
+            break
+
+    if decision.get('significant') is None:
+        decision['significant'] = bool(decision.get('p_value', 1.0) < alpha)
+
+    return np.concatenate(homophily_batches), np.concatenate(assortativity_batches), decision
@@ -0,0 +1,226 @@
+"""
+Soft Homophily - Genre similarity of collaborators from full tag distributions
+
+Each artist is a row of a sparse artist x genre weight matrix X built from
+all of its Last.fm tags (see GenreMapper.genre_weights), instead of a single
+genre. The soft mixing matrix is X^T A X and the soft homophily ratio is the
+mean genre overlap x_u . x_v over the edges; with one-hot rows both reduce
+to the usual mixing matrix and homophily ratio. The attribute-shuffling null
+permutes the rows of X, which stays sparse throughout.
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from graphLoader import graph_to_arrays
+from nativeCommunities import adjacency_from_arrays
+from permutationTest import permuted_labels, empirical_p_value
+from analyticNull import z_score
+from resultSink import ResultSink
+from profiler import profiled
+from lazyImport import lazy_import
+
+# Loaded on first use (see lazyImport)
+plt = lazy_import("matplotlib.pyplot")
+
+
+def genre_weight_matrix(G, nodes, attribute='genre_weights', fallback_attribute='main_genre'):
+    """
+    Sparse artist x genre weight matrix with rows summing to 1.
+
+    Args:
+        G (networkx.Graph): The network graph
+        nodes (list): Node order of the rows
+        attribute (str): Node attribute holding the weights as a JSON string
+        fallback_attribute (str): Hard genre used (with weight 1) for nodes
+            without weights
+
+    Returns:
+        tuple: (csr_matrix X, sorted list of genres, boolean array marking
+               the rows that came from weights)
+    """
+    rows_weights = []
+    from_weights = np.zeros(len(nodes), dtype=bool)
+    for i, node in enumerate(nodes):
+        weights = G.nodes[node].get(attribute)
+        weights = json.loads(weights) if isinstance(weights, str) else weights
+        if weights:
+            from_weights[i] = True
+        else:
+            weights = {G.nodes[node][fallback_attribute]: 1.0}
+        rows_weights.append(weights)
+
+    genres = sorted(set(genre for weights in rows_weights for genre in weights))
+    genre_index = {genre: j for j, genre in enumerate(genres)}
+    rows, cols, data = [], [], []
+    for i, weights in enumerate(rows_weights):
+        total = float(sum(weights.values()))
+        for genre, weight in weights.items():
+            rows.append(i)
+            cols.append(genre_index[genre])
+            data.append(weight / total)
+    X = csr_matrix((data, (rows, cols)), shape=(len(nodes), len(genres)))
+    return X, genres, from_weights
+
+
+def soft_mixing(X, adjacency):
+    """
+    Soft mixing matrix X^T A X, laid out like create_mixing_matrix.
+
+    Args:
+        X (scipy.sparse.csr_matrix or numpy.ndarray): (nodes, genres) weights
+        adjacency (scipy.sparse.csr_matrix): Symmetric adjacency matrix
+
+    Returns:
+        numpy.ndarray: (genres, genres) soft edge counts; the diagonal holds
+        the soft number of same-genre edges
+    """
+    mixing = X.T @ (adjacency @ X)
+    mixing = mixing.toarray() if hasattr(mixing, 'toarray') else np.asarray(mixing, dtype=float)
+    mixing[np.diag_indices_from(mixing)] /= 2
+    return mixing
+
+
+def soft_shuffling_expectation(X, num_edges):
+    """
+    Exact expectation of the soft mixing matrix when the rows of X are shuffled.
+
+    For two distinct nodes, E[x_ua x_vb] = (S_a S_b - sum_w x_wa x_wb) / (n (n - 1))
+    with S the column sums of X.
+
+    Args:
+        X (scipy.sparse.csr_matrix): (nodes, genres) weights
+        num_edges (int): Number of edges
+
+    Returns:
+        tuple: (expected soft homophily ratio, expected soft mixing matrix)
+    """
+    num_nodes = X.shape[0]
+    column_sums = np.asarray(X.sum(axis=0)).ravel()
+    pair = (np.outer(column_sums, column_sums) - (X.T @ X).toarray()) / (num_nodes * (num_nodes - 1))
+    expected = 2 * num_edges * pair
+    expected[np.diag_indices_from(expected)] /= 2
+    return float(np.trace(pair)), expected
+
+
+def soft_permutation_null(X, adjacency, num_permutations, batch_size=50, seed=None):
+    """
+    Soft homophily and mixing under row-shuffled genre weights.
+
+    X stays sparse: each sample permutes its rows (X[perm] is still CSR) and
+    X_p^T (A X_p) is a product of sparse matrices, so memory grows with the
+    non-zero weights and edges rather than nodes x genres.
+
+    Args:
+        X (scipy.sparse.csr_matrix): (nodes, genres) weights
+        adjacency (scipy.sparse.csr_matrix): Symmetric adjacency matrix
+        num_permutations (int): Number of shuffled samples
+        batch_size (int): Permutations drawn per batch (memory is batch x nodes)
+        seed (int, optional): Seed for the permutations
+
+    Returns:
+        dict: 'homophily' (array, one per permutation), 'mixing_mean' and
+              'mixing_sd' (genres x genres arrays)
+    """
+    rng = np.random.default_rng(seed)
+    X = csr_matrix(X)
+    num_nodes, num_genres = X.shape
+    num_edges = adjacency.sum() / 2
+    indices = np.arange(num_nodes)
+
+    homophily = np.empty(num_permutations)
+    mixing_sum = np.zeros((num_genres, num_genres))
+    mixing_sq = np.zeros((num_genres, num_genres))
+    for start in range(0, num_permutations, batch_size):
+        size = min(batch_size, num_permutations - start)
+        for offset, permutation in enumerate(permuted_labels(indices, size, rng)):
+            mixing = soft_mixing(X[permutation], adjacency)
+            homophily[start + offset] = np.trace(mixing) / num_edges
+            mixing_sum += mixing
+            mixing_sq += mixing ** 2
+
+    mixing_mean = mixing_sum / num_permutations
+    mixing_var = np.maximum(mixing_sq / num_permutations - mixing_mean ** 2, 0.0)
+    return {'homophily': homophily, 'mixing_mean': mixing_mean, 'mixing_sd': np.sqrt(mixing_var)}
+
+
+@profiled(category="analysis")
+def soft_homophily_analysis(G, attribute='genre_weights', fallback_attribute='main_genre', num_permutations=1000,
+                            seed=None, output_dir="analysis_results", log_path=None):
+    """
+    Soft homophily and soft mixing with a permutation null.
+
+    Args:
+        G (networkx.Graph): The network graph
+        attribute (str): Node attribute holding the genre weights (JSON string)
+        fallback_attribute (str): Hard genre for nodes without weights
+        num_permutations (int): Number of row shufflings for the null model
+        seed (int, optional): Seed for the permutations
+        output_dir (str): Directory to save the figure
+        log_path (str): Path to the log file for results
+
+    Returns:
+        dict: Soft homophily, its null distribution and z-score, and the soft
+              mixing matrices (observed, expected, z-scores) as DataFrames
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    sink = ResultSink(log_path)
+    log = sink.log
+
+    log("\n--- Soft Homophily (genre weights) ---")
+
+    arrays = graph_to_arrays(G, fallback_attribute)
+    num_nodes, num_edges = len(arrays['nodes']), len(arrays['src'])
+    X, genres, from_weights = genre_weight_matrix(G, arrays['nodes'], attribute, fallback_attribute)
+    log(f"{int(from_weights.sum())} of {num_nodes} artists have genre weights "
+        f"(the others count fully for their {fallback_attribute})")
+    if num_edges == 0:
+        log("Graph has no edges, skipping soft homophily")
+        sink.flush()
+        return {}
+
+    adjacency = adjacency_from_arrays(arrays['src'], arrays['dst'], num_nodes)
+    observed_mixing = soft_mixing(X, adjacency)
+    soft_homophily = float(np.trace(observed_mixing) / num_edges)
+    expected_homophily, expected_mixing = soft_shuffling_expectation(X, num_edges)
+    null = soft_permutation_null(X, adjacency, num_permutations, seed=seed)
+
+    results = {
+        'soft_homophily': soft_homophily,
+        'expected_soft_homophily': expected_homophily,
+        'null_soft_homophily': null['homophily'],
+        'null_soft_homophily_sd': float(null['homophily'].std(ddof=1)),
+        'soft_mixing': pd.DataFrame(observed_mixing, index=genres, columns=genres),
+        'expected_soft_mixing': pd.DataFrame(expected_mixing, index=genres, columns=genres),
+        'soft_mixing_z_scores': pd.DataFrame(z_score(observed_mixing, null['mixing_mean'], null['mixing_sd']),
+                                             index=genres, columns=genres),
+    }
+    results['soft_z_score'] = z_score(soft_homophily, expected_homophily, results['null_soft_homophily_sd'])
+    results['soft_p_value'] = empirical_p_value(null['homophily'], soft_homophily)
+
+    log(f"Soft homophily ratio: {soft_homophily:.4f}")
+    log(f"Expected under genre-weight shuffling: {expected_homophily:.4f} "
+        f"(sd {results['null_soft_homophily_sd']:.4f}, z = {results['soft_z_score']:.2f})")
+    log(f"Permutation p-value (n={num_permutations}): {results['soft_p_value']:.6f}")
+    log("\nSoft mixing matrix:")
+    log(results['soft_mixing'].round(2).to_string())
+    log("\nSoft mixing z-scores vs. genre-weight shuffling:")
+    log(results['soft_mixing_z_scores'].round(2).to_string())
+
+    plt.figure(figsize=(10, 6))
+    plt.hist(null['homophily'], bins=30, alpha=0.6, label="Genre-weight Shuffling", color='lightcoral', density=True)
+    plt.axvline(soft_homophily, color='red', linestyle='--', linewidth=2, label=f"Original ({soft_homophily:.3f})")
+    plt.legend(loc='upper right', fontsize=10)
+    plt.title("Soft Homophily Distribution", fontsize=14)
+    plt.xlabel("Soft Homophily Ratio", fontsize=12)
+    plt.ylabel("Density", fontsize=12)
+    plt.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(os.path.join(output_dir, "soft_homophily_distribution.png"), dpi=300, bbox_inches='tight')
+    plt.close()
+
+    sink.flush()
+    return results
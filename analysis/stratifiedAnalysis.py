@@ -0,0 +1,178 @@
+"""
+Stratified Analysis - Second-order homophily within the strata of another attribute
+
+Replaces the per-genre loop of filtering albums, rebuilding the label graph
+and re-running the analysis. On one graph carrying both attributes, the
+edges inside every stratum (both endpoints share the stratum value) are
+counted with a single np.bincount per quantity, and the analytic null
+moments are evaluated for all strata at once.
+"""
+import os
+import numpy as np
+import pandas as pd
+from graphLoader import graph_to_arrays
+from analyticNull import shuffling_homophily, configuration_homophily, z_score
+from swapEngine import assortativity_from_counts
+from resultSink import ResultSink
+from profiler import profiled
+from lazyImport import lazy_import
+
+# Loaded on first use (see lazyImport)
+plt = lazy_import("matplotlib.pyplot")
+stats = lazy_import("scipy.stats")
+
+
+def stratum_counts(strata, codes, src, dst, num_strata, num_values):
+    """
+    Edge and node counts of the subgraph induced by each stratum.
+
+    Args:
+        strata (numpy.ndarray): Stratum code of each node
+        codes (numpy.ndarray): Attribute code of each node
+        src (numpy.ndarray): Source node index of each edge
+        dst (numpy.ndarray): Target node index of each edge
+        num_strata (int): Number of distinct stratum codes
+        num_values (int): Number of distinct attribute codes
+
+    Returns:
+        dict: per-stratum arrays 'num_edges' (S,), 'same_edges' (S,),
+              'mixing' (S, k, k, laid out like create_mixing_matrix),
+              'class_sizes' (S, k), 'class_degrees' (S, k) and
+              'adjacent_pairs' (S,)
+    """
+    within = strata[src] == strata[dst]
+    src, dst = src[within], dst[within]
+    edge_strata = strata[src]
+    a, b = codes[src], codes[dst]
+    k = num_values
+
+    num_edges = np.bincount(edge_strata, minlength=num_strata)
+    directed = np.bincount((edge_strata * k + a) * k + b, minlength=num_strata * k * k).reshape(num_strata, k, k)
+    mixing = directed + directed.transpose(0, 2, 1)
+    diagonal = np.arange(k)
+    mixing[:, diagonal, diagonal] //= 2
+
+    degrees = np.bincount(src, minlength=len(codes)) + np.bincount(dst, minlength=len(codes))
+    class_degrees = (np.bincount(edge_strata * k + a, minlength=num_strata * k)
+                     + np.bincount(edge_strata * k + b, minlength=num_strata * k)).reshape(num_strata, k)
+
+    return {
+        'num_edges': num_edges,
+        'same_edges': mixing[:, diagonal, diagonal].sum(axis=1),
+        'mixing': mixing,
+        'class_sizes': np.bincount(strata * k + codes, minlength=num_strata * k).reshape(num_strata, k),
+        'class_degrees': class_degrees,
+        'adjacent_pairs': np.bincount(strata, weights=degrees * (degrees - 1.0), minlength=num_strata),
+    }
+
+
+def _stratified_table(G, stratum_attribute, attribute):
+    """One row per stratum value plus the per-stratum mixing matrices."""
+    target = graph_to_arrays(G, attribute)
+    stratum_values = sorted(set(G.nodes[n][stratum_attribute] for n in target['nodes']))
+    stratum_index = {val: i for i, val in enumerate(stratum_values)}
+    strata = np.array([stratum_index[G.nodes[n][stratum_attribute]] for n in target['nodes']], dtype=np.int64)
+    values = target['values']
+
+    counts = stratum_counts(strata, target['codes'], target['src'], target['dst'], len(stratum_values), len(values))
+    num_edges = counts['num_edges']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        homophily = counts['same_edges'] / num_edges
+    shuffled, shuffled_sd = shuffling_homophily(counts['class_sizes'], num_edges, counts['adjacent_pairs'])
+    config, config_sd = configuration_homophily(counts['class_degrees'], num_edges)
+    shuffled_z = z_score(homophily, shuffled, shuffled_sd)
+    config_z = z_score(homophily, config, config_sd)
+
+    table = pd.DataFrame({
+        'stratum_attribute': stratum_attribute,
+        'stratum': stratum_values,
+        'attribute': attribute,
+        'nodes': counts['class_sizes'].sum(axis=1),
+        'attribute_values': np.count_nonzero(counts['class_sizes'], axis=1),
+        'edges': num_edges,
+        'same_edges': counts['same_edges'],
+        'homophily': homophily,
+        'assortativity': assortativity_from_counts(counts['same_edges'], num_edges, counts['class_degrees']),
+        'shuffled_homophily': shuffled,
+        'shuffled_sd': shuffled_sd,
+        'shuffled_z': shuffled_z,
+        'shuffled_p_value': stats.norm.sf(shuffled_z),
+        'config_homophily': config,
+        'config_sd': config_sd,
+        'config_z': config_z,
+        'config_p_value': stats.norm.sf(config_z),
+    })
+    mixing = {stratum: pd.DataFrame(counts['mixing'][i], index=values, columns=values)
+              for i, stratum in enumerate(stratum_values)}
+    return table, mixing
+
+
+@profiled(category="analysis")
+def stratified_analysis(G, attributes=('main_genre', 'major_label'), output_dir="analysis_results", log_path=None):
+    """
+    Homophily of each attribute within every stratum of the other, in one pass per direction.
+
+    Within a stratum (e.g. one genre) only artists with that value and the
+    collaborations between them are kept, as in the filter-by-genre workflow.
+    Significance uses the analytic attribute-shuffling and configuration-model
+    nulls of the stratum subgraph (normal approximation, one-sided).
+
+    Args:
+        G (networkx.Graph): Graph whose nodes carry both attributes
+        attributes (tuple): The two node attributes to cross
+        output_dir (str): Directory to save the table and figure
+        log_path (str): Path to the log file for results
+
+    Returns:
+        dict: 'table' (DataFrame, one row per direction and stratum) and
+              'mixing' (dict of (stratum_attribute, stratum) -> mixing DataFrame)
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    sink = ResultSink(log_path)
+    log = sink.log
+
+    log("\n--- Stratified (Second-Order) Analysis ---")
+
+    directions = (tuple(attributes), tuple(attributes[::-1]))
+    tables = []
+    mixing = {}
+    for stratum_attribute, attribute in directions:
+        table, stratum_mixing = _stratified_table(G, stratum_attribute, attribute)
+        tables.append(table)
+        mixing.update({(stratum_attribute, stratum): matrix for stratum, matrix in stratum_mixing.items()})
+
+        log(f"\n{attribute} homophily within each {stratum_attribute} stratum:")
+        columns = ['stratum', 'nodes', 'edges', 'homophily', 'assortativity',
+                   'shuffled_homophily', 'shuffled_z', 'config_homophily', 'config_z', 'config_p_value']
+        log(table[columns].round(4).to_string(index=False))
+        log("(p-values one-sided: homophily above the null)")
+        for stratum, matrix in stratum_mixing.items():
+            if matrix.values.sum():
+                log(f"\nMixing matrix ({attribute}) within {stratum_attribute} = {stratum}:")
+                log(matrix.to_string())
+
+    combined = pd.concat(tables, ignore_index=True)
+    combined.to_csv(os.path.join(output_dir, "stratified_analysis.csv"), index=False)
+
+    # Observed vs expected homophily per stratum, one panel per direction
+    fig, axes = plt.subplots(1, 2, figsize=(16, max(4, 0.35 * combined.groupby('stratum_attribute').size().max())))
+    for ax, (stratum_attribute, attribute), table in zip(axes, directions, tables):
+        table = table[table['edges'] > 0]
+        y = np.arange(len(table))
+        ax.barh(y - 0.2, table['homophily'], height=0.4, color='skyblue', label='Observed')
+        ax.barh(y + 0.2, table['config_homophily'], height=0.4, xerr=table['config_sd'],
+                color='lightcoral', capsize=2, label='Configuration model')
+        ax.set_yticks(y)
+        ax.set_yticklabels([f"{s} ({e})" for s, e in zip(table['stratum'], table['edges'])])
+        ax.set_xlabel(f"{attribute} homophily ratio")
+        ax.set_title(f"Within each {stratum_attribute} (edges)")
+        ax.grid(True, axis='x', alpha=0.3)
+    axes[0].legend(fontsize='small')
+    fig.tight_layout()
+    plt.savefig(os.path.join(output_dir, "stratified_homophily.png"), dpi=300, bbox_inches='tight')
+    plt.close()
+
+    sink.flush()
+    return {'table': combined, 'mixing': mixing}
@@ -0,0 +1,196 @@
+"""
+Synthetic Graphs - Collaboration graphs of any size with tunable homophily
+
+Generates artist graphs with the node attributes of genreGraph.py and
+labelsGraph.py (main_genre, major_label and optionally genre_weights), so
+every analysis can be run on sizes well beyond the crawled datasets.
+
+Edges follow a Chung-Lu style model: every node has an expected-degree
+weight (power-law or homogeneous), the first endpoint of an edge is drawn
+proportionally to the weights and the second one, with probability
+genre_homophily, among the nodes of the same genre, with probability
+label_homophily among the nodes of the same label, and otherwise among all
+nodes. Everything is drawn with numpy in a few vectorised passes, so a
+million nodes take seconds.
+"""
+import json
+import os
+import sys
+import networkx as nx
+import numpy as np
+
+GENRES = ("Pop", "Hip-Hop", "Rock", "Electronic", "R&B", "Latin", "Indie", "Country", "Jazz", "Metal",
+          "Folk", "Classical")
+LABELS = ("Universal Music Group", "Sony Music Entertainment", "Warner Music Group", "Other")
+LABEL_SHARES = (0.35, 0.25, 0.2, 0.2)
+
+
+def degree_weights(num_nodes, avg_degree, distribution="powerlaw", exponent=2.5, rng=None):
+    """
+    Expected degree of every node.
+
+    Args:
+        num_nodes (int): Number of nodes
+        avg_degree (float): Target average degree
+        distribution (str): 'powerlaw' (Pareto tail with the given exponent)
+            or 'poisson' (all nodes alike, Poisson degrees)
+        exponent (float): Power-law exponent of the degree distribution (> 2)
+        rng (numpy.random.Generator, optional): Random generator
+
+    Returns:
+        numpy.ndarray: Weights with mean avg_degree
+    """
+    rng = rng or np.random.default_rng()
+    if distribution == "powerlaw":
+        weights = rng.pareto(exponent - 1, num_nodes) + 1
+        # Cap the largest hubs at sqrt(2m) so the edge probabilities stay below one
+        weights = np.minimum(weights, np.sqrt(num_nodes * avg_degree) / avg_degree * weights.mean())
+    elif distribution == "poisson":
+        weights = np.ones(num_nodes)
+    else:
+        raise ValueError(f"Unknown degree distribution '{distribution}'")
+    return weights * avg_degree / weights.mean()
+
+
+def _draw_within_groups(groups, weights, sources, rng):
+    """For every source, a node of the source's group drawn proportionally to the weights."""
+    order = np.argsort(groups, kind="stable")
+    cumulative = np.cumsum(weights[order])
+    ends = np.searchsorted(groups[order], np.arange(groups.max() + 1), side="right")
+    starts = np.concatenate(([0], ends[:-1]))
+    lower = np.where(starts > 0, cumulative[starts - 1], 0.0)
+    upper = cumulative[ends - 1]
+    group = groups[sources]
+    targets = np.searchsorted(cumulative, lower[group] + rng.random(len(sources)) * (upper[group] - lower[group]),
+                              side="right")
+    return order[np.minimum(targets, len(order) - 1)]
+
+
+def synthetic_arrays(num_nodes, avg_degree=1.5, genre_homophily=0.4, label_homophily=0.05,
+                     degree_distribution="powerlaw", exponent=2.5, num_genres=len(GENRES), seed=None):
+    """
+    Draw the attributes and edges of a synthetic collaboration graph.
+
+    Args:
+        num_nodes (int): Number of artists
+        avg_degree (float): Target average degree (before duplicate edges and
+            self-loops are dropped); the crawled graphs have about 1.4
+        genre_homophily (float): Probability that an edge is drawn inside the
+            genre of its first endpoint
+        label_homophily (float): Probability that an edge is drawn inside the
+            label of its first endpoint
+        degree_distribution (str): 'powerlaw' or 'poisson' (see degree_weights)
+        exponent (float): Power-law exponent
+        num_genres (int): Number of genres (taken from GENRES, then numbered)
+        seed (int, optional): Random seed
+
+    Returns:
+        dict: 'genres' and 'labels' (value names), 'genre_codes' and
+              'label_codes' (one per node), 'weights', 'src' and 'dst' (unique
+              undirected edges, src < dst)
+    """
+    if genre_homophily + label_homophily > 1:
+        raise ValueError("genre_homophily + label_homophily must not exceed 1")
+    rng = np.random.default_rng(seed)
+    genres = list(GENRES[:num_genres]) + [f"Genre {i}" for i in range(len(GENRES), num_genres)]
+    # Zipf-like genre sizes, like the crawled data where Pop and Hip-Hop dominate
+    genre_shares = 1 / np.arange(1, num_genres + 1)
+    genre_codes = rng.choice(num_genres, size=num_nodes, p=genre_shares / genre_shares.sum())
+    label_codes = rng.choice(len(LABELS), size=num_nodes, p=LABEL_SHARES)
+    weights = degree_weights(num_nodes, avg_degree, degree_distribution, exponent, rng)
+
+    num_edges = int(round(num_nodes * avg_degree / 2))
+    probabilities = weights / weights.sum()
+    src = rng.choice(num_nodes, size=num_edges, p=probabilities)
+    dst = rng.choice(num_nodes, size=num_edges, p=probabilities)
+    kind = rng.random(num_edges)
+    in_genre = kind < genre_homophily
+    in_label = (kind >= genre_homophily) & (kind < genre_homophily + label_homophily)
+    dst[in_genre] = _draw_within_groups(genre_codes, weights, src[in_genre], rng)
+    dst[in_label] = _draw_within_groups(label_codes, weights, src[in_label], rng)
+
+    keep = src != dst
+    pairs = np.unique(np.stack([np.minimum(src, dst)[keep], np.maximum(src, dst)[keep]], axis=1), axis=0)
+    return {
+        'genres': genres,
+        'labels': list(LABELS),
+        'genre_codes': genre_codes,
+        'label_codes': label_codes,
+        'weights': weights,
+        'src': pairs[:, 0],
+        'dst': pairs[:, 1],
+    }
+
+
+def synthetic_genre_weights(arrays, num_tags=3, rng=None):
+    """
+    Genre weights like GenreMapper.genre_weights: the main genre plus a few
+    random secondary genres with smaller weights.
+
+    Returns:
+        list: One {genre: weight} dict per node, weights summing to 1
+    """
+    rng = rng or np.random.default_rng()
+    genres = arrays['genres']
+    weights = []
+    for code in arrays['genre_codes']:
+        extra = rng.choice(len(genres), size=num_tags - 1)
+        raw = {genres[code]: 1.0}
+        for other, weight in zip(extra, rng.random(num_tags - 1) * 0.5):
+            raw[genres[other]] = raw.get(genres[other], 0.0) + weight
+        total = sum(raw.values())
+        weights.append({genre: round(weight / total, 4) for genre, weight in raw.items()})
+    return weights
+
+
+def synthetic_graph(num_nodes, genre_weights=False, seed=None, **kwargs):
+    """
+    Synthetic collaboration graph with the node attributes the analysis expects.
+
+    Args:
+        num_nodes (int): Number of artists
+        genre_weights (bool): Also store genre_weights (JSON strings, as
+            written by genreGraph.py)
+        seed (int, optional): Random seed
+        **kwargs: Passed to synthetic_arrays
+
+    Returns:
+        networkx.Graph: Nodes 'Artist <i>' with main_genre and major_label
+    """
+    arrays = synthetic_arrays(num_nodes, seed=seed, **kwargs)
+    names = [f"Artist {i}" for i in range(num_nodes)]
+    genres, labels = arrays['genres'], arrays['labels']
+    G = nx.Graph()
+    attributes = [{'main_genre': genres[g], 'major_label': labels[l]}
+                  for g, l in zip(arrays['genre_codes'].tolist(), arrays['label_codes'].tolist())]
+    if genre_weights:
+        for data, weights in zip(attributes, synthetic_genre_weights(arrays, rng=np.random.default_rng(seed))):
+            data['genre_weights'] = json.dumps(weights)
+    G.add_nodes_from(zip(names, attributes))
+    G.add_edges_from(zip([names[i] for i in arrays['src'].tolist()], [names[j] for j in arrays['dst'].tolist()]))
+    return G
+
+
+def write_synthetic(path, num_nodes, **kwargs):
+    """
+    Generate a synthetic graph and save it as GraphML (readable by graphLoader.load_graph).
+
+    Returns:
+        networkx.Graph: The generated graph
+    """
+    G = synthetic_graph(num_nodes, **kwargs)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    nx.write_graphml(G, path)
+    print(f"Synthetic graph with {G.number_of_nodes()} nodes and {G.number_of_edges()} edges saved to {path}")
+    return G
+
+
+if __name__ == "__main__":
+    # python synthetic.py <num_nodes> [output.graphml]
+    if len(sys.argv) < 2:
+        print("Usage: python synthetic.py <num_nodes> [output.graphml]")
+        sys.exit(1)
+    size = int(sys.argv[1])
+    output = sys.argv[2] if len(sys.argv) > 2 else os.path.join("synthetic", f"synthetic_{size}.graphml")
+    write_synthetic(output, size, genre_weights=True, seed=0)
@@ -0,0 +1,188 @@
+"""
+Crawl telemetry - Request, throttling and throughput metrics for the API crawlers
+
+A CrawlTelemetry instance counts requests per endpoint and status code, keeps
+a latency histogram per endpoint, and accounts for the time spent in
+politeness delays and in Retry-After backoff. It also tracks how many
+artists were processed per minute. The metrics are exported every
+export_interval seconds, and at the end of a crawl, to <path>.json and to
+<path>.prom in the Prometheus textfile format (node_exporter's textfile
+collector can scrape it).
+"""
+import json
+import math
+import os
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+
+class CrawlTelemetry:
+    """
+    Metrics of one crawler run.
+
+    Args:
+        crawler (str): Crawler name, used as a label ('spotify', 'lastfm')
+        path (str): Export path without extension
+        export_interval (float): Minimum seconds between two periodic exports
+    """
+
+    def __init__(self, crawler, path, export_interval=30):
+        self.crawler = crawler
+        self.path = path
+        self.export_interval = export_interval
+        self.started = time.time()
+        self.last_export = 0.0
+        self.requests = Counter()  # (endpoint, status) -> count
+        self.latency_buckets = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))
+        self.latency_sum = Counter()
+        self.retries = Counter()
+        self.backoff_seconds = Counter()
+        self.sleep_seconds = 0.0
+        self.items = Counter()  # 'ok' / 'failed'
+
+    def get(self, endpoint, url, **kwargs):
+        """
+        requests.get that records its latency and status under the given endpoint.
+
+        Connection errors are counted with status 'error' and re-raised.
+        """
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = requests.get(url, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            self.record_request(endpoint, status, time.perf_counter() - start)
+
+    def record_request(self, endpoint, status, latency):
+        self.requests[(endpoint, status)] += 1
+        self.latency_sum[endpoint] += latency
+        buckets = self.latency_buckets[endpoint]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                buckets[i] += 1
+                break
+
+    def record_retry(self, endpoint, wait_seconds):
+        """A throttled request retried after waiting wait_seconds (Retry-After)."""
+        self.retries[endpoint] += 1
+        self.backoff_seconds[endpoint] += wait_seconds
+
+    def record_sleep(self, seconds):
+        """Politeness delay between requests."""
+        self.sleep_seconds += seconds
+
+    def record_item(self, ok=True):
+        """One artist processed."""
+        self.items["ok" if ok else "failed"] += 1
+
+    def snapshot(self):
+        """
+        Current metrics as a dict.
+
+        Returns:
+            dict: Totals, per-endpoint counts, latency histograms (cumulative,
+            keyed by bucket bound), retries and backoff, and throughput
+        """
+        elapsed = time.time() - self.started
+        endpoints = sorted(set(endpoint for endpoint, _ in self.requests))
+        per_endpoint = {}
+        for endpoint in endpoints:
+            count = sum(n for (e, _), n in self.requests.items() if e == endpoint)
+            cumulative, histogram = 0, {}
+            for bound, n in zip(LATENCY_BUCKETS, self.latency_buckets[endpoint]):
+                cumulative += n
+                histogram["+Inf" if bound == math.inf else str(bound)] = cumulative
+            per_endpoint[endpoint] = {
+                'requests': count,
+                'status_codes': {status: n for (e, status), n in sorted(self.requests.items()) if e == endpoint},
+                'latency_seconds_sum': self.latency_sum[endpoint],
+                'latency_seconds_mean': self.latency_sum[endpoint] / count if count else None,
+                'latency_histogram': histogram,
+                'retries': self.retries[endpoint],
+                'backoff_seconds': self.backoff_seconds[endpoint],
+            }
+        items = sum(self.items.values())
+        return {
+            'crawler': self.crawler,
+            'elapsed_seconds': elapsed,
+            'requests': sum(self.requests.values()),
+            'network_seconds': sum(self.latency_sum.values()),
+            'sleep_seconds': self.sleep_seconds,
+            'backoff_seconds': sum(self.backoff_seconds.values()),
+            'artists_ok': self.items['ok'],
+            'artists_failed': self.items['failed'],
+            'artists_per_minute': items / (elapsed / 60) if elapsed > 0 else None,
+            'endpoints': per_endpoint,
+        }
+
+    def prometheus_text(self, snapshot=None):
+        """The metrics in the Prometheus text exposition format."""
+        snapshot = snapshot or self.snapshot()
+        crawler = f'crawler="{self.crawler}"'
+        lines = [
+            "# HELP crawl_requests_total HTTP requests by endpoint and status code.",
+            "# TYPE crawl_requests_total counter",
+        ]
+        for endpoint, metrics in snapshot['endpoints'].items():
+            for status, n in metrics['status_codes'].items():
+                lines.append(f'crawl_requests_total{{{crawler},endpoint="{endpoint}",status="{status}"}} {n}')
+        lines += ["# HELP crawl_request_latency_seconds Request latency by endpoint.",
+                  "# TYPE crawl_request_latency_seconds histogram"]
+        for endpoint, metrics in snapshot['endpoints'].items():
+            labels = f'{crawler},endpoint="{endpoint}"'
+            for bound, n in metrics['latency_histogram'].items():
+                lines.append(f'crawl_request_latency_seconds_bucket{{{labels},le="{bound}"}} {n}')
+            lines.append(f"crawl_request_latency_seconds_sum{{{labels}}} {metrics['latency_seconds_sum']}")
+            lines.append(f"crawl_request_latency_seconds_count{{{labels}}} {metrics['requests']}")
+        lines += ["# HELP crawl_retries_total Requests retried after a 429.",
+                  "# TYPE crawl_retries_total counter"]
+        lines += [f'crawl_retries_total{{{crawler},endpoint="{endpoint}"}} {metrics["retries"]}'
+                  for endpoint, metrics in snapshot['endpoints'].items()]
+        lines += ["# HELP crawl_backoff_seconds_total Time waited for Retry-After.",
+                  "# TYPE crawl_backoff_seconds_total counter"]
+        lines += [f'crawl_backoff_seconds_total{{{crawler},endpoint="{endpoint}"}} {metrics["backoff_seconds"]}'
+                  for endpoint, metrics in snapshot['endpoints'].items()]
+        lines += ["# HELP crawl_sleep_seconds_total Time spent in politeness delays.",
+                  "# TYPE crawl_sleep_seconds_total counter",
+                  f"crawl_sleep_seconds_total{{{crawler}}} {snapshot['sleep_seconds']}",
+                  "# HELP crawl_artists_total Artists processed.",
+                  "# TYPE crawl_artists_total counter",
+                  f'crawl_artists_total{{{crawler},result="ok"}} {snapshot["artists_ok"]}',
+                  f'crawl_artists_total{{{crawler},result="failed"}} {snapshot["artists_failed"]}',
+                  "# HELP crawl_artists_per_minute Artists processed per minute since the start.",
+                  "# TYPE crawl_artists_per_minute gauge",
+                  f"crawl_artists_per_minute{{{crawler}}} {snapshot['artists_per_minute'] or 0}",
+                  "# HELP crawl_elapsed_seconds Time since the start of the crawl.",
+                  "# TYPE crawl_elapsed_seconds gauge",
+                  f"crawl_elapsed_seconds{{{crawler}}} {snapshot['elapsed_seconds']}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self):
+        """Write <path>.json and <path>.prom (each replaced atomically)."""
+        snapshot = self.snapshot()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        for extension, text in ((".json", json.dumps(snapshot, indent=4)), (".prom", self.prometheus_text(snapshot))):
+            tmp_path = self.path + extension + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, self.path + extension)
+        self.last_export = time.time()
+
+    def maybe_export(self):
+        """Export if export_interval seconds have passed since the last export."""
+        if time.time() - self.last_export >= self.export_interval:
+            self.export()
+
+    def summary_line(self):
+        snapshot = self.snapshot()
+        return (f"Telemetry: {snapshot['requests']} requests, {snapshot['network_seconds']:.0f}s on the network, "
+                f"{snapshot['sleep_seconds']:.0f}s in delays, {snapshot['backoff_seconds']:.0f}s in 429 backoff, "
+                f"{snapshot['artists_per_minute'] or 0:.1f} artists/min")
@@ -9,8 +9,15 @@ MIN_DATE = "2023-01-01"
 
 # File paths
 input_file = "data/latest_albums_details_labels_normalized.json"  # <-- use the updated normalized file
-safe_genre = TARGET_GENRE.replace(" ", "_") if TARGET_GENRE else 'all_genres'
-output_file = f"data/{safe_genre}_post_{MIN_DATE}_albums.json"
+
+
+def filtered_output_file(target_genre=TARGET_GENRE, min_date=MIN_DATE):
+    """Output path for a genre / date filter, e.g. data/all_genres_post_2023-01-01_albums.json"""
+    safe_genre = target_genre.replace(" ", "_") if target_genre else 'all_genres'
+    return f"data/{safe_genre}_post_{min_date}_albums.json"
+
+
+output_file = filtered_output_file()
 
 def is_after_min_date(date_str, min_date_str):
     """
@@ -23,7 +30,9 @@ def is_after_min_date(date_str, min_date_str):
     except ValueError:
         return False
 
-def main():
+def main(target_genre=TARGET_GENRE, min_date=MIN_DATE, input_file=input_file, output_file=None):
+    output_file = output_file or filtered_output_file(target_genre, min_date)
+
     # Check if input file exists
     if not os.path.exists(input_file):
         raise FileNotFoundError(f"Input file not found at {input_file}")
@@ -40,12 +49,12 @@ def main():
         pub_date = album.get("date_of_publication", "")
 
         # Check publication date
-        if not is_after_min_date(pub_date, MIN_DATE):
+        if not is_after_min_date(pub_date, min_date):
             continue
 
         # If genre filtering is ON
-        if TARGET_GENRE:
-            if TARGET_GENRE.lower() in artist_genre.lower():  # Compare the genre, case-insensitive
+        if target_genre:
+            if target_genre.lower() in artist_genre.lower():  # Compare the genre, case-insensitive
                 filtered_albums.append(album)
         else:
             # No genre filtering
@@ -63,8 +72,9 @@ def main():
             "data": filtered_albums
         }, f, indent=4, ensure_ascii=False)
 
-    print(f"Filtered albums published after {MIN_DATE}: {len(filtered_albums)} results")
+    print(f"Filtered albums published after {min_date}: {len(filtered_albums)} results")
     print(f"Data saved to {output_file}")
+    return output_file
 
 if __name__ == "__main__":
     main()
@@ -21,6 +21,7 @@ def create_genre_graph(processed_data_file):
     G = nx.Graph()
 
     artist_to_attr = {}
+    artist_to_weights = {}
     all_artists = set()
     albums = []
 
@@ -34,6 +35,8 @@ def create_genre_graph(processed_data_file):
         # Use artist_genre field, but save it under the name "main_genre" in the graph
         artist_genre = entry.get("artist_genre", "Unknown")
         artist_to_attr[artist_name] = artist_genre
+        if entry.get("genre_weights"):
+            artist_to_weights[artist_name] = entry["genre_weights"]
 
         albums.append({
             "artist": artist_name,
@@ -44,6 +47,9 @@ def create_genre_graph(processed_data_file):
     for artist in all_artists:
         genre = artist_to_attr.get(artist, "Unknown")
         G.add_node(artist, main_genre=genre)
+        # Last.fm genre weights for the soft homophily analysis (GraphML needs a string)
+        if artist in artist_to_weights:
+            G.nodes[artist]["genre_weights"] = json.dumps(artist_to_weights[artist], sort_keys=True)
 
     # Add edges
     added_edges = set()
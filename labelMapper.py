@@ -103,7 +103,7 @@ class LabelMapper:
         
         if non_other_labels:
             # Return unique non-other labels (remove duplicates)
-            return list(set(non_other_labels))
+            return sorted(set(non_other_labels))
         else:
             # If all labels mapped to "Other", return ["Other"]
             return ["Other"]
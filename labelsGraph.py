@@ -20,6 +20,7 @@ def create_label_graph(processed_data_file):
     
     # Extract artists and their labels
     artist_to_label = {}
+    artist_to_genre = {}
     all_artists = set()
     artists_with_multiple_labels = set()  # Track artists with multiple labels
     
@@ -42,15 +43,17 @@ def create_label_graph(processed_data_file):
         
         all_artists.add(artist_name)
         artist_to_label[artist_name] = major_label
+        artist_to_genre[artist_name] = entry.get("artist_genre", "Unknown")
     
     # Remove artists with multiple labels from the graph
     artists_to_remove = artists_with_multiple_labels
     
     # Add nodes with major_label attribute for artists not in the removal list
+    # (main_genre is kept too, for the stratified genre x label analysis)
     for artist in all_artists:
         if artist not in artists_to_remove:
             label = artist_to_label.get(artist, "Independent")
-            G.add_node(artist, major_label=label)
+            G.add_node(artist, major_label=label, main_genre=artist_to_genre.get(artist, "Unknown"))
     
     # Process albums to find connections
     featured_connections = []
@@ -1,7 +1,7 @@
-import requests
 import json
 import os
 from dotenv import load_dotenv
+from crawlTelemetry import CrawlTelemetry
 
 # Load environment variables
 load_dotenv()
@@ -12,6 +12,8 @@ API_KEY = os.getenv("LAST_FM")
 # Define the base URL for the Last.fm API
 BASE_URL = 'http://ws.audioscrobbler.com/2.0/'
 
+TELEMETRY = CrawlTelemetry("lastfm", "data/crawl_metrics_lastfm")  # Exported to .json and .prom during the crawl
+
 class GenreMapper:
     def __init__(self):
         self.genre_mapping = {
@@ -224,6 +226,27 @@ class GenreMapper:
                 return self.genre_mapping[tag_lower]
         return "unknown"
 
+    def genre_weights(self, tag_counts):
+        """
+        Spread an artist over normalized genres using all its tags.
+
+        The Last.fm count of every recognized tag goes to its genre, and the
+        totals are scaled to sum to 1. Unrecognized tags are ignored.
+
+        Args:
+            tag_counts (list): List of (tag, count) pairs
+
+        Returns:
+            dict: Normalized genre -> weight (empty if no known genre is found)
+        """
+        weights = {}
+        for tag, count in tag_counts:
+            genre = self.genre_mapping.get(tag.lower())
+            if genre and count > 0:
+                weights[genre] = weights.get(genre, 0) + count
+        total = sum(weights.values())
+        return {genre: round(weight / total, 4) for genre, weight in weights.items()} if total else {}
+
 
 def get_top_artists(total_artists=100):
     """Fetches top artists from Last.fm"""
@@ -241,7 +264,7 @@ def get_top_artists(total_artists=100):
             'page': page
         }
 
-        response = requests.get(BASE_URL, params=params)
+        response = TELEMETRY.get(params['method'], BASE_URL, params=params)
 
         if response.status_code == 200:
             data = response.json()
@@ -264,8 +287,8 @@ def get_top_artists(total_artists=100):
     return artists
 
 
-def get_artist_tags(artist_name):
-    """Fetches the top tags for a given artist"""
+def get_artist_tag_counts(artist_name):
+    """Fetches all top tags for a given artist with their Last.fm counts"""
     params = {
         'method': 'artist.gettoptags',
         'artist': artist_name,
@@ -273,19 +296,23 @@ def get_artist_tags(artist_name):
         'format': 'json'
     }
 
-    response = requests.get(BASE_URL, params=params)
+    response = TELEMETRY.get(params['method'], BASE_URL, params=params)
 
     if response.status_code == 200:
         data = response.json()
         tags = data.get('toptags', {}).get('tag', [])
-        # Return top 5 tags (or fewer if not available)
-        top_tags = [tag['name'] for tag in tags[:5]]  # You can adjust number of tags here
-        return top_tags
+        return [(tag['name'], int(tag.get('count', 0))) for tag in tags]
     else:
         print(f"Warning: Unable to fetch tags for {artist_name}. Status code {response.status_code}")
         return []
 
 
+def get_artist_tags(artist_name):
+    """Fetches the top tags for a given artist"""
+    # Return top 5 tags (or fewer if not available)
+    return [tag for tag, _ in get_artist_tag_counts(artist_name)[:5]]  # You can adjust number of tags here
+
+
 def save_to_json(artists, filename="data/artists_with_normalized_genres.json"):
     """Saves artist data to a JSON file"""
     output_dir = os.path.dirname(filename)
@@ -319,22 +346,28 @@ def main(num_artists=100, output_file="data/artists_with_normalized_genres.json"
         name = artist["name"]
         listeners = artist["listeners"]
         
-        # Get tags for this artist
-        tags = get_artist_tags(name)
+        # Get tags (with counts) for this artist
+        tag_counts = get_artist_tag_counts(name)
         
-        # Normalize the genre based on tags
-        normalized_genre = mapper.normalize_first_genre(tags)
+        # Normalize the genre based on the top 5 tags, and keep the weights of all of them
+        normalized_genre = mapper.normalize_first_genre([tag for tag, _ in tag_counts[:5]])
+        genre_weights = mapper.genre_weights(tag_counts)
+        TELEMETRY.record_item(ok=bool(tag_counts))
+        TELEMETRY.maybe_export()
         
         # Create enriched artist object
         enriched_artists.append({
             "name": name,
             "listeners": listeners,
-            "normalized_genre": normalized_genre
+            "normalized_genre": normalized_genre,
+            "genre_weights": genre_weights
         })
     
     # Save combined data to JSON
     save_to_json(enriched_artists, output_file)
     print(f"Successfully processed {len(enriched_artists)} artists with normalized genres")
+    TELEMETRY.export()
+    print(TELEMETRY.summary_line())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,209 @@
+"""
+Pipeline driver - runs the ingestion-to-graph scripts and skips stages whose outputs are still valid.
+
+Every stage is keyed by a hash of its script (and of the local modules it
+imports), its configuration and the content of its input files. The key and the hashes of the outputs are kept
+in a manifest; a stage is skipped when its key is unchanged and its outputs
+are still on disk unmodified. Because keys depend on input *content*, a
+stage that re-runs but writes identical output does not invalidate the
+stages after it.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from filterGenresAndTimePeriod import filtered_output_file
+
+# The profiler and the code hashing live with the analysis modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "analysis"))
+import profiler
+from resultCache import code_digest
+
+# Configuration
+NUM_ARTISTS = 2000
+TARGET_GENRE = None  # Set to None if you don't want genre filtering
+MIN_DATE = "2023-01-01"
+
+MANIFEST_FILE = "data/.pipeline_manifest.json"
+ARTISTS_FILE = "data/artists_with_normalized_genres.json"
+ALBUMS_FILE = "data/latest_albums_details.json"
+LABELS_CSV = "labelshierarchystuffrelated/label_hierarchy.csv"
+NORMALIZED_FILE = "data/latest_albums_details_labels_normalized.json"
+
+
+# The other stage scripts are imported when their stage runs: the API scripts
+# read credentials and the graph scripts pull in plotting on import.
+
+def _run_lastfm(config):
+    import lastfmApiGetArtistandNormalizeGenre
+    lastfmApiGetArtistandNormalizeGenre.main(num_artists=config["num_artists"], output_file=ARTISTS_FILE)
+
+
+def _run_spotify(config):
+    import SpotifyApiGetAlbumData
+    SpotifyApiGetAlbumData.main()
+
+
+def _run_labels(config):
+    import labelMapper
+    labelMapper.process_labels(spotify_json=ALBUMS_FILE, labels_csv=LABELS_CSV, output_json=NORMALIZED_FILE)
+
+
+def _run_filter(config):
+    import filterGenresAndTimePeriod
+    filterGenresAndTimePeriod.main(config["target_genre"], config["min_date"], NORMALIZED_FILE, config["output"])
+
+
+def _run_genre_graph(config):
+    import genreGraph
+    genreGraph.create_genre_graph(config["input"])
+
+
+def _run_labels_graph(config):
+    import labelsGraph
+    labelsGraph.create_label_graph(config["input"])
+
+
+def pipeline_stages(num_artists=NUM_ARTISTS, target_genre=TARGET_GENRE, min_date=MIN_DATE):
+    """
+    The stages in execution order.
+
+    Returns:
+        list: One dict per stage with 'name', 'code' (scripts whose content,
+              with the local modules they import, is part of the key), 'inputs', 'outputs', 'config', 'run' and
+              'external' (stages that call the web APIs)
+    """
+    filtered = filtered_output_file(target_genre, min_date)
+    return [
+        {"name": "lastfm", "code": ["lastfmApiGetArtistandNormalizeGenre.py"], "inputs": [],
+         "outputs": [ARTISTS_FILE], "config": {"num_artists": num_artists}, "run": _run_lastfm, "external": True},
+        {"name": "spotify", "code": ["SpotifyApiGetAlbumData.py"], "inputs": [ARTISTS_FILE],
+         "outputs": [ALBUMS_FILE], "config": {}, "run": _run_spotify, "external": True},
+        {"name": "labels", "code": ["labelMapper.py"], "inputs": [ALBUMS_FILE, LABELS_CSV],
+         "outputs": [NORMALIZED_FILE], "config": {}, "run": _run_labels},
+        {"name": "filter", "code": ["filterGenresAndTimePeriod.py"], "inputs": [NORMALIZED_FILE],
+         "outputs": [filtered], "config": {"target_genre": target_genre, "min_date": min_date, "output": filtered},
+         "run": _run_filter},
+        {"name": "genre_graph", "code": ["genreGraph.py"], "inputs": [filtered],
+         "outputs": ["graph_genre/genre_graph.graphml"], "config": {"input": filtered}, "run": _run_genre_graph},
+        {"name": "labels_graph", "code": ["labelsGraph.py"], "inputs": [filtered],
+         "outputs": ["graph_labels/label_graph.graphml"], "config": {"input": filtered}, "run": _run_labels_graph},
+    ]
+
+
+def file_digest(path):
+    """SHA-256 of a file's content, None if it does not exist."""
+    if not os.path.isfile(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stage_key(stage):
+    """
+    Hash of everything a stage's output depends on: its code, config and input content.
+
+    The code hash covers the stage scripts and, recursively, the modules they
+    import from the project folder (e.g. crawlTelemetry.py), as for the
+    analysis cache.
+
+    Raises:
+        FileNotFoundError: If a script or input file is missing
+    """
+    key = hashlib.sha256(stage["name"].encode())
+    for path in stage["code"] + stage["inputs"]:
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Input of stage '{stage['name']}' not found: {path}")
+        digest = code_digest(path) if path in stage["code"] else file_digest(path)
+        key.update(f"{path}:{digest}".encode())
+    key.update(json.dumps(stage["config"], sort_keys=True).encode())
+    return key.hexdigest()
+
+
+def load_manifest(path=MANIFEST_FILE):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(manifest, path=MANIFEST_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+
+
+def is_up_to_date(stage, key, manifest):
+    """True if the stage ran with this key and its outputs are unchanged since."""
+    entry = manifest.get(stage["name"])
+    if not entry or entry["key"] != key:
+        return False
+    return all(file_digest(path) == entry["outputs"].get(path) for path in stage["outputs"])
+
+
+def run_pipeline(stages=None, force=(), dry_run=False):
+    """
+    Run the stages in order, skipping the ones that are up to date.
+
+    Args:
+        stages (list, optional): Stages to run (pipeline_stages() by default)
+        force (iterable): Stage names to run even if up to date (e.g. to
+            refresh the API data)
+        dry_run (bool): Only report what would run; stops at the first stage
+            that would run, since later keys depend on its output
+
+    Returns:
+        list: (stage name, status) pairs, status being 'cached', 'ran' or 'would run'
+    """
+    stages = pipeline_stages() if stages is None else stages
+    manifest = load_manifest()
+    report = []
+
+    for stage in stages:
+        key = stage_key(stage)
+        # Data fetched before the manifest existed is adopted rather than crawled again
+        adopt = (stage.get("external") and stage["name"] not in manifest
+                 and all(os.path.isfile(path) for path in stage["outputs"]))
+        if stage["name"] not in force and (adopt or is_up_to_date(stage, key, manifest)):
+            if adopt:
+                manifest[stage["name"]] = {"key": key, "outputs": {path: file_digest(path) for path in stage["outputs"]}}
+                save_manifest(manifest)
+            print(f"[{stage['name']}] up to date, skipped")
+            report.append((stage["name"], "cached"))
+            continue
+        if dry_run:
+            print(f"[{stage['name']}] would run (and possibly everything after it)")
+            report.append((stage["name"], "would run"))
+            break
+
+        print(f"[{stage['name']}] running...")
+        with profiler.span(f"pipeline {stage['name']}", "stage"):
+            stage["run"](stage["config"])
+        missing = [path for path in stage["outputs"] if not os.path.isfile(path)]
+        if missing:
+            raise RuntimeError(f"Stage '{stage['name']}' did not produce {', '.join(missing)}")
+        manifest[stage["name"]] = {"key": key, "outputs": {path: file_digest(path) for path in stage["outputs"]}}
+        save_manifest(manifest)
+        report.append((stage["name"], "ran"))
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the data pipeline, skipping stages whose outputs are valid.")
+    parser.add_argument("--force", nargs="+", default=[], help="stages to re-run anyway (e.g. spotify to crawl again)")
+    parser.add_argument("--dry-run", action="store_true", help="only show what would run")
+    parser.add_argument("--genre", default=TARGET_GENRE, help="genre filter (default: all genres)")
+    parser.add_argument("--min-date", default=MIN_DATE, help="keep albums published on or after this date")
+    parser.add_argument("--num-artists", type=int, default=NUM_ARTISTS, help="number of Last.fm top artists")
+    parser.add_argument("--profile", metavar="DIR", help="write a timing/memory trace of the stages to DIR")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiler.enable(args.profile)
+
+    run_pipeline(pipeline_stages(args.num_artists, args.genre, args.min_date), force=args.force, dry_run=args.dry_run)
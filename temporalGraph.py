@@ -0,0 +1,406 @@
+import json
+import os
+import sys
+import csv
+from collections import defaultdict, Counter
+from datetime import datetime
+
+import networkx as nx
+
+# Configuration
+WINDOW_MONTHS = 12  # Width of the sliding window
+STEP_MONTHS = 1  # Distance between consecutive snapshots
+
+input_file = "data/latest_albums_details_labels_normalized.json"
+
+
+def parse_release_date(date_str):
+    """
+    Parse a Spotify release date, which may only carry a year or a month.
+
+    Returns:
+        datetime or None: Parsed date, None if it cannot be read
+    """
+    for fmt in ("%Y-%m-%d", "%Y-%m", "%Y"):
+        try:
+            return datetime.strptime(date_str, fmt)
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def add_months(date, months):
+    """First day of the month `months` after the month of `date`."""
+    index = date.year * 12 + date.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def node_attribute(entry, attribute):
+    """
+    Attribute value of an album's artist, using the same rules as the graph scripts.
+
+    Returns:
+        str or None: The value, None if the artist is left out of the graph
+        (labelsGraph drops artists with multiple major labels)
+    """
+    if attribute == "main_genre":
+        return entry.get("artist_genre", "Unknown")
+    major_labels = entry.get("major_labels", [])
+    if len(major_labels) > 1:
+        return None
+    return major_labels[0] if major_labels else "Independent"
+
+
+class UnionFind:
+    """Disjoint sets with path halving and union by size."""
+
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+
+    def add(self, item):
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        return True
+
+
+class IncrementalCollabGraph:
+    """
+    Artist collaboration graph maintained under album insertions and removals.
+
+    Follows genreGraph/labelsGraph: every album record makes its artist a node,
+    and an edge joins the artist to each featured artist who is also a node.
+    An edge may be produced by both artists' albums, so edges carry a
+    multiplicity and disappear only when no active album produces them.
+    Same-attribute edge, mixing, and degree counters are updated on every change.
+    """
+
+    def __init__(self, attribute="main_genre"):
+        self.attribute = attribute
+        self.values = {}  # active artist -> attribute value
+        self.feats = {}  # active artist -> featured artists on their album
+        self.records = {}  # active artist -> the album record that made it a node
+        self.listed_by = defaultdict(set)  # featured artist -> active artists listing them
+        self.multiplicity = {}
+        self.adjacency = defaultdict(set)
+        self.same_edges = 0
+        self.mixing = Counter()  # (value, value) sorted pair -> number of edges
+        self.degree_counts = Counter()  # degree -> number of active artists
+
+    def _edge_key(self, a, b):
+        return (a, b) if a < b else (b, a)
+
+    def _set_degree(self, artist, old, new):
+        self.degree_counts[old] -= 1
+        if not self.degree_counts[old]:
+            del self.degree_counts[old]
+        self.degree_counts[new] += 1
+
+    def _count_edge(self, a, b, delta):
+        value_a, value_b = self.values[a], self.values[b]
+        if value_a == value_b:
+            self.same_edges += delta
+        pair = self._edge_key(value_a, value_b)
+        self.mixing[pair] += delta
+        if not self.mixing[pair]:
+            del self.mixing[pair]
+
+    def _add_edge(self, a, b):
+        key = self._edge_key(a, b)
+        self.multiplicity[key] = self.multiplicity.get(key, 0) + 1
+        if self.multiplicity[key] == 1:
+            for u, v in ((a, b), (b, a)):
+                self._set_degree(u, len(self.adjacency[u]), len(self.adjacency[u]) + 1)
+                self.adjacency[u].add(v)
+            self._count_edge(a, b, 1)
+            self._on_edge_added(a, b)
+
+    def _remove_edge(self, a, b):
+        key = self._edge_key(a, b)
+        self.multiplicity[key] -= 1
+        if self.multiplicity[key] == 0:
+            del self.multiplicity[key]
+            for u, v in ((a, b), (b, a)):
+                self._set_degree(u, len(self.adjacency[u]), len(self.adjacency[u]) - 1)
+                self.adjacency[u].discard(v)
+            self._count_edge(a, b, -1)
+
+    def _on_edge_added(self, a, b):
+        """Hook for subclasses that track more structure."""
+
+    def add_album(self, entry):
+        """
+        Activate an album record: its artist becomes a node with its collaborations.
+
+        Returns:
+            bool: False if the record was skipped (no artist or no usable attribute)
+        """
+        artist = entry.get("artist")
+        value = node_attribute(entry, self.attribute)
+        if not artist or value is None:
+            return False
+        if artist in self.records:
+            self.remove_album(self.records[artist])
+
+        self.records[artist] = entry
+        self.values[artist] = value
+        self.feats[artist] = set(f for f in entry.get("feat", []) if f != artist)
+        self.degree_counts[0] += 1
+        self._on_node_added(artist)
+
+        for featured in self.feats[artist]:
+            self.listed_by[featured].add(artist)
+            if featured in self.values:
+                self._add_edge(artist, featured)
+        for other in self.listed_by.get(artist, ()):
+            if other != artist:
+                self._add_edge(other, artist)
+        return True
+
+    def _on_node_added(self, artist):
+        """Hook for subclasses that track more structure."""
+
+    def remove_album(self, entry):
+        """
+        Deactivate an album record and the collaborations it produced.
+
+        A record that was already replaced by a later album of the same artist
+        is ignored.
+        """
+        artist = entry.get("artist")
+        if self.records.get(artist) is not entry:
+            return
+        for featured in self.feats[artist]:
+            self.listed_by[featured].discard(artist)
+            if not self.listed_by[featured]:
+                del self.listed_by[featured]
+            if featured in self.values:
+                self._remove_edge(artist, featured)
+        for other in list(self.listed_by.get(artist, ())):
+            self._remove_edge(other, artist)
+
+        self.degree_counts[0] -= 1
+        if not self.degree_counts[0]:
+            del self.degree_counts[0]
+        del self.records[artist]
+        del self.values[artist]
+        del self.feats[artist]
+        self.adjacency.pop(artist, None)
+
+    def components(self):
+        """
+        Connected components of the current graph as (count, largest size).
+
+        Rebuilt from the current edges with a union-find, which is linear in
+        the window's edges; deletions rule out maintaining it across steps.
+        """
+        forest = UnionFind()
+        for artist in self.values:
+            forest.add(artist)
+        for a, b in self.multiplicity:
+            forest.union(a, b)
+        sizes = Counter(forest.find(artist) for artist in self.values)
+        return len(sizes), max(sizes.values(), default=0)
+
+    def metrics(self):
+        """Snapshot of the current graph statistics."""
+        num_nodes = len(self.values)
+        num_edges = len(self.multiplicity)
+        num_components, largest = self.components()
+        return {
+            "nodes": num_nodes,
+            "edges": num_edges,
+            "homophily_ratio": self.same_edges / num_edges if num_edges else 0,
+            "avg_degree": 2 * num_edges / num_nodes if num_nodes else 0,
+            "max_degree": max(self.degree_counts, default=0),
+            "isolated": self.degree_counts.get(0, 0),
+            "components": num_components,
+            "largest_component": largest,
+            "mixing": {f"{a}|{b}": count for (a, b), count in sorted(self.mixing.items())},
+        }
+
+
+class LiveCollabGraph(IncrementalCollabGraph):
+    """
+    Collaboration graph grown one album at a time while the crawler runs.
+
+    Albums are only ever added, so components are kept in a union-find that
+    is updated on every new node and edge instead of being recounted. If an
+    album is replaced (same artist crawled twice), the union-find is rebuilt
+    at the next query.
+    """
+
+    def __init__(self, attribute="main_genre"):
+        super().__init__(attribute)
+        self.forest = UnionFind()
+        self.num_components = 0
+        self.largest_component = 0
+        self.stale = False
+
+    def _on_node_added(self, artist):
+        if self.stale:
+            return
+        self.forest.add(artist)
+        self.num_components += 1
+        self.largest_component = max(self.largest_component, 1)
+
+    def _on_edge_added(self, a, b):
+        if self.stale:
+            return
+        if self.forest.union(a, b):
+            self.num_components -= 1
+            self.largest_component = max(self.largest_component, self.forest.size[self.forest.find(a)])
+
+    def remove_album(self, entry):
+        super().remove_album(entry)
+        self.stale = True
+
+    def components(self):
+        if self.stale:
+            self.forest = UnionFind()
+            self.num_components = self.largest_component = 0
+            self.stale = False
+            for artist in self.values:
+                self._on_node_added(artist)
+            for a, b in self.multiplicity:
+                self._on_edge_added(a, b)
+        return self.num_components, self.largest_component
+
+    def to_networkx(self):
+        """Current graph with the attribute on each node, as genreGraph/labelsGraph build it."""
+        G = nx.Graph()
+        for artist, value in self.values.items():
+            G.add_node(artist, **{self.attribute: value})
+        G.add_edges_from(self.multiplicity)
+        return G
+
+    def dump(self, path):
+        """Save the current metrics, node attributes and edge list to a JSON file."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        snapshot = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "attribute": self.attribute,
+            "metrics": self.metrics(),
+            "nodes": self.values,
+            "edges": [list(edge) for edge in self.multiplicity],
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=4, ensure_ascii=False)
+
+
+def sliding_window_metrics(records, attribute="main_genre", window_months=WINDOW_MONTHS, step_months=STEP_MONTHS):
+    """
+    Slide a time window across the album records and emit a metric time series.
+
+    Records are sorted by date once; at every step the albums entering the
+    window are added and the ones leaving it removed, so each snapshot only
+    costs the changes since the previous one.
+
+    Args:
+        records (list): Album records (as in the normalized JSON 'data' list)
+        attribute (str): 'main_genre' or 'major_label'
+        window_months (int or None): Window width; None keeps every album since
+            the start (growing window)
+        step_months (int): Months between snapshots
+
+    Returns:
+        list: One metrics dict per snapshot, with 'window_start' and 'window_end'
+    """
+    dated = []
+    for entry in records:
+        date = parse_release_date(entry.get("date_of_publication", ""))
+        if date is not None:
+            dated.append((date, entry))
+    dated.sort(key=lambda item: item[0])
+    if not dated:
+        return []
+
+    graph = IncrementalCollabGraph(attribute)
+    first = datetime(dated[0][0].year, dated[0][0].month, 1)
+    end = add_months(first, window_months or step_months)
+    last = add_months(dated[-1][0], 1)
+
+    series = []
+    entering = leaving = 0
+    while True:
+        start = add_months(end, -window_months) if window_months else first
+        while entering < len(dated) and dated[entering][0] < end:
+            graph.add_album(dated[entering][1])
+            entering += 1
+        while window_months and leaving < entering and dated[leaving][0] < start:
+            graph.remove_album(dated[leaving][1])
+            leaving += 1
+
+        snapshot = {"window_start": start.strftime("%Y-%m-%d"), "window_end": end.strftime("%Y-%m-%d")}
+        snapshot.update(graph.metrics())
+        series.append(snapshot)
+        if end >= last:
+            break
+        end = add_months(end, step_months)
+
+    return series
+
+
+def main(attribute="main_genre", window_months=WINDOW_MONTHS):
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"Input file not found at {input_file}")
+
+    with open(input_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    series = sliding_window_metrics(data.get("data", []), attribute, window_months)
+
+    output_dir = "temporal"
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, f"{attribute}_window_{window_months}m")
+
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump(series, f, indent=4, ensure_ascii=False)
+
+    columns = [key for key in series[0] if key != "mixing"] if series else []
+    with open(base + ".csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(series)
+
+    # Time series plot (pyplot is imported here: the crawler imports this module
+    # for the live graph and never plots)
+    import matplotlib.pyplot as plt
+
+    ends = [datetime.strptime(s["window_end"], "%Y-%m-%d") for s in series]
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.plot(ends, [s["homophily_ratio"] for s in series], color="tab:red", label="Homophily ratio")
+    ax.set_ylabel("Homophily ratio")
+    ax2 = ax.twinx()
+    ax2.plot(ends, [s["edges"] for s in series], color="tab:blue", alpha=0.6, label="Edges")
+    ax2.set_ylabel("Edges")
+    ax.set_title(f"{attribute} homophily over a {window_months}-month sliding window")
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+    plt.savefig(base + ".png", dpi=300, bbox_inches="tight")
+    plt.close()
+
+    print(f"{len(series)} snapshots saved to {base}.json / .csv / .png")
+
+
+if __name__ == "__main__":
+    attribute = sys.argv[1] if len(sys.argv) > 1 else "main_genre"
+    window = int(sys.argv[2]) if len(sys.argv) > 2 else WINDOW_MONTHS
+    main(attribute, window)